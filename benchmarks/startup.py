@@ -0,0 +1,48 @@
+"""
+Benchmark del tempo di avvio della CLI
+Misura (processo nuovo a ogni ripetizione) i comandi che non eseguono
+scansioni e il costo di import dei moduli principali.
+
+python benchmarks/startup.py [-n 20]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "python (baseline)": [sys.executable, "-c", "pass"],
+    "main.py --list-steps": [sys.executable, "main.py", "--list-steps"],
+    "main.py --validate": [sys.executable, "main.py", "--validate"],
+    "import core.registry": [sys.executable, "-c", "import core.registry; core.registry.get_registry()"],
+    "import core.orchestrator": [sys.executable, "-c", "import core.orchestrator"],
+    "import modules.network.network": [sys.executable, "-c", "import modules.network.network"],
+}
+
+
+def measure(argv, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(argv, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark avvio CLI")
+    parser.add_argument("-n", "--runs", type=int, default=10, help="Ripetizioni per caso")
+    args = parser.parse_args()
+
+    print(f"{'caso':<34} {'min ms':>8} {'mediana ms':>11}")
+    for name, argv in CASES.items():
+        timings = measure(argv, args.runs)
+        print(f"{name:<34} {min(timings):>8.1f} {statistics.median(timings):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Artifact store dei raw output
+Gli output raw grandi (stdout nmap, JSON Metasploit, ping, ...) non
+restano nel dict dei risultati per tutto il run: vengono scritti come
+blob gzip content-addressed (SHA-256 del contenuto) nella cartella del
+run e sostituiti da un riferimento leggero (ArtifactRef).
+Output identici (es. scansioni ripetute dello stesso host) sono
+salvati una volta sola. A fine run restano solo gli store degli ultimi
+DEFAULT_KEEP_RUNS run (prune_runs).
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+SPILL_THRESHOLD = 4 * 1024
+COMPRESS_LEVEL = 6
+CHUNK_CHARS = 64 * 1024
+REF_KEY = "__artifact__"
+RUN_PREFIX = "artifacts_"
+DEFAULT_KEEP_RUNS = 10
+
+
+class ArtifactRef(dict):
+    """
+    Riferimento a un raw nello store: resta un dict (JSON/pickle/YAML
+    serializzabile così com'è) con digest, path, formato e dimensioni.
+    """
+
+    @property
+    def digest(self):
+        return self[REF_KEY]
+
+    @property
+    def path(self):
+        return self["path"]
+
+    def open(self):
+        """Stream testuale del raw decompresso."""
+        return gzip.open(self["path"], "rt", encoding="utf-8")
+
+    def chunks(self, size=CHUNK_CHARS):
+        with self.open() as f:
+            while True:
+                chunk = f.read(size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def load(self):
+        """Raw originale (stringa oppure dict/list per il formato json)."""
+        with self.open() as f:
+            return json.load(f) if self["format"] == "json" else f.read()
+
+
+def is_artifact(value):
+    return isinstance(value, dict) and REF_KEY in value and "path" in value
+
+
+def as_ref(value):
+    """ArtifactRef anche da un dict riletto da JSON (result.json, log)."""
+    return value if isinstance(value, ArtifactRef) else ArtifactRef(value)
+
+
+def load_raw(raw):
+    """Raw completo: carica dallo store se è un riferimento, altrimenti lo restituisce."""
+    return as_ref(raw).load() if is_artifact(raw) else raw
+
+
+def prune_runs(log_folder, keep=DEFAULT_KEEP_RUNS, current=None):
+    """
+    Retention degli store per-run: restano le `keep` cartelle
+    <log_folder>/artifacts_<timestamp> più recenti, quella del run in corso
+    non viene mai rimossa. I report non ne dipendono (write_reports copia
+    i raw in <report>_artifacts/ durante il run); i log dei run rimossi
+    mantengono i riferimenti, ma i blob non sono più disponibili.
+
+    :param keep: run da conservare (0/None = nessuna pulizia)
+    :return: cartelle rimosse
+    """
+    if not keep or not os.path.isdir(log_folder):
+        return []
+    # Timestamp %Y%m%d_%H%M%S: ordine alfabetico = ordine cronologico
+    runs = sorted(
+        name for name in os.listdir(log_folder)
+        if name.startswith(RUN_PREFIX) and os.path.isdir(os.path.join(log_folder, name))
+    )
+    current = os.path.abspath(current) if current else None
+    removed = []
+    for name in runs[:-keep]:
+        path = os.path.join(log_folder, name)
+        if os.path.abspath(path) == current:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(path)
+    return removed
+
+
+class ArtifactStore:
+    """
+    Store per-run di blob gzip: <directory>/<ab>/<sha256>.gz
+    """
+
+    def __init__(self, directory, threshold=SPILL_THRESHOLD, level=COMPRESS_LEVEL):
+        """
+        :param directory: cartella dello store
+        :param threshold: raw più piccoli (byte serializzati) restano inline
+        :param level: livello di compressione gzip
+        """
+        self.directory = directory
+        self.threshold = threshold
+        self.level = level
+        self.stats = {"blobs": 0, "deduplicated": 0, "bytes": 0, "stored_bytes": 0}
+        self._known = {}
+        self._lock = threading.Lock()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], f"{digest}.gz")
+
+    @staticmethod
+    def _serialize(raw):
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8", errors="replace")
+        if isinstance(raw, str):
+            return "text", raw.encode("utf-8")
+        # indent: l'artefatto resta leggibile (zcat), gzip ne annulla il costo
+        return "json", json.dumps(raw, indent=2, ensure_ascii=False, default=str).encode("utf-8")
+
+    def put(self, raw):
+        """
+        Salva un raw se supera la soglia.
+
+        :return: ArtifactRef, oppure il raw invariato se piccolo/vuoto
+        """
+        if not raw or is_artifact(raw):
+            return raw
+        fmt, data = self._serialize(raw)
+        if len(data) < self.threshold:
+            return raw
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        with self._lock:
+            stored = self._known.get(digest)
+        new = stored is None
+        if new:
+            blob = gzip.compress(data, compresslevel=self.level, mtime=0)
+            with self._lock:
+                # Un altro step può aver scritto lo stesso blob nel frattempo
+                new = digest not in self._known
+                if new:
+                    self._write(path, blob)
+                    self._known[digest] = len(blob)
+                stored = self._known[digest]
+
+        with self._lock:
+            self.stats["bytes"] += len(data)
+            if new:
+                self.stats["blobs"] += 1
+                self.stats["stored_bytes"] += stored
+            else:
+                self.stats["deduplicated"] += 1
+        return ArtifactRef({REF_KEY: digest, "path": path, "format": fmt, "size": len(data), "stored": stored})
+
+    @staticmethod
+    def _write(path, blob):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def spill(self, step_result):
+        """Copia dello step_result con il raw spostato nello store."""
+        raw = step_result.get("raw")
+        ref = self.put(raw)
+        if ref is raw:
+            return step_result
+        return {**step_result, "raw": ref}
@@ -0,0 +1,173 @@
+"""
+Knowledge base MITRE ATT&CK locale
+Caricata da un bundle STIX 2.x offline (enterprise-attack.json) in
+strutture indicizzate:
+  - tecnica → (nome, tattiche)
+  - tattica → tecniche
+  - sotto-tecnica → tecnica padre
+e serializzata in una cache binaria (pickle) invalidata quando il bundle cambia.
+Senza bundle viene usata una tabella minima integrata con le tecniche
+referenziate da core/mitre_mapping.py.
+
+Bundle: variabile ATTACK_STIX_BUNDLE oppure data/attack/enterprise-attack.json
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUNDLE = os.path.join(ROOT, "data", "attack", "enterprise-attack.json")
+DEFAULT_CACHE_DIR = ".cache"
+KB_VERSION = 1
+
+# Tecniche usate dal mapping degli step (ATT&CK Enterprise)
+BUILTIN_TECHNIQUES = {
+    "T1016": ("System Network Configuration Discovery", ("Discovery",)),
+    "T1021": ("Remote Services", ("Lateral Movement",)),
+    "T1041": ("Exfiltration Over C2 Channel", ("Exfiltration",)),
+    "T1046": ("Network Service Discovery", ("Discovery",)),
+    "T1071": ("Application Layer Protocol", ("Command and Control",)),
+    "T1078": ("Valid Accounts", ("Defense Evasion", "Persistence", "Privilege Escalation", "Initial Access")),
+    "T1082": ("System Information Discovery", ("Discovery",)),
+    "T1190": ("Exploit Public-Facing Application", ("Initial Access",)),
+    "T1203": ("Exploitation for Client Execution", ("Execution",)),
+    "T1490": ("Inhibit System Recovery", ("Impact",)),
+    "T1557": ("Adversary-in-the-Middle", ("Credential Access", "Collection")),
+    "T1570": ("Lateral Tool Transfer", ("Lateral Movement",)),
+}
+
+
+class AttackKB:
+    """
+    Indici ATT&CK con lookup O(1).
+    """
+
+    def __init__(self, techniques, source="builtin"):
+        """
+        :param techniques: dict {technique_id: (nome, tuple di tattiche)}
+        """
+        self.source = source
+        self.techniques = techniques
+        self.parents = {tid: tid.split(".")[0] for tid in techniques if "." in tid}
+
+        index = {}
+        for tid, (_, tactics) in techniques.items():
+            for tactic in tactics:
+                index.setdefault(tactic, set()).add(tid)
+        self.tactic_index = {tactic: frozenset(tids) for tactic, tids in index.items()}
+
+    def __contains__(self, technique_id):
+        return technique_id in self.techniques
+
+    def __len__(self):
+        return len(self.techniques)
+
+    def parent(self, technique_id):
+        """Tecnica padre di una sotto-tecnica (T1059.001 → T1059), altrimenti sé stessa."""
+        return self.parents.get(technique_id) or technique_id.split(".")[0]
+
+    def _entry(self, technique_id):
+        return self.techniques.get(technique_id) or self.techniques.get(self.parent(technique_id))
+
+    def name(self, technique_id):
+        entry = self._entry(technique_id)
+        return entry[0] if entry else None
+
+    def tactics(self, technique_id):
+        """Tattiche della tecnica (ereditate dal padre se sotto-tecnica sconosciuta)."""
+        entry = self._entry(technique_id)
+        return entry[1] if entry else ()
+
+    def techniques_for(self, tactic):
+        return self.tactic_index.get(tactic, frozenset())
+
+
+def parse_stix(bundle):
+    """
+    Estrae le tecniche attive (non revocate/deprecate) da un bundle STIX.
+
+    :param bundle: dict del bundle ({"type": "bundle", "objects": [...]})
+    :return: dict {technique_id: (nome, tuple di tattiche)}
+    """
+    objects = bundle.get("objects", [])
+    tactic_names = {
+        o["x_mitre_shortname"]: o["name"]
+        for o in objects
+        if o.get("type") == "x-mitre-tactic" and "x_mitre_shortname" in o
+    }
+
+    techniques = {}
+    for o in objects:
+        if o.get("type") != "attack-pattern" or o.get("revoked") or o.get("x_mitre_deprecated"):
+            continue
+        tid = next(
+            (r["external_id"] for r in o.get("external_references", [])
+             if r.get("source_name") == "mitre-attack" and "external_id" in r),
+            None
+        )
+        if tid is None:
+            continue
+        tactics = tuple(
+            tactic_names.get(p["phase_name"], p["phase_name"].replace("-", " ").title())
+            for p in o.get("kill_chain_phases", [])
+            if p.get("kill_chain_name") == "mitre-attack"
+        )
+        techniques[tid] = (o.get("name", tid), tactics)
+    return techniques
+
+
+def _cache_path(bundle_path, cache_dir):
+    stat = os.stat(bundle_path)
+    key = hashlib.sha256(
+        f"{os.path.abspath(bundle_path)}|{stat.st_size}|{stat.st_mtime_ns}|{KB_VERSION}".encode()
+    ).hexdigest()[:16]
+    return os.path.join(cache_dir, f"attack_kb_{key}.pickle")
+
+
+def load_kb(bundle_path=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Carica la knowledge base: cache binaria → bundle STIX → tabella integrata.
+    """
+    bundle_path = bundle_path or os.environ.get("ATTACK_STIX_BUNDLE") or DEFAULT_BUNDLE
+    if not os.path.exists(bundle_path):
+        return AttackKB(dict(BUILTIN_TECHNIQUES))
+
+    cache_path = _cache_path(bundle_path, cache_dir)
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError):
+        pass
+
+    with open(bundle_path, "r", encoding="utf-8") as f:
+        techniques = parse_stix(json.load(f))
+    # Le tecniche del mapping restano risolvibili anche con bundle parziali
+    for tid, entry in BUILTIN_TECHNIQUES.items():
+        techniques.setdefault(tid, entry)
+    kb = AttackKB(techniques, source=bundle_path)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(kb, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass
+    return kb
+
+
+_kb = None
+_kb_lock = threading.Lock()
+
+
+def get_kb():
+    """Restituisce la knowledge base condivisa dal processo (caricata al primo uso)."""
+    global _kb
+    with _kb_lock:
+        if _kb is None:
+            _kb = load_kb()
+        return _kb
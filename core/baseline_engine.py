@@ -1,3 +1,17 @@
+"""
+Baseline Engine
+Confronto tra assessment successivi e archivio dei risultati per host/porta
+usato dalla reassessment incrementale.
+"""
+import json
+import os
+import re
+import tempfile
+from datetime import datetime
+
+DEFAULT_STORE_DIR = "baselines"
+
+
 def compare_baseline(old_techniques, new_techniques):
     """
     Confronta due set di tecniche MITRE osservate
@@ -9,4 +23,70 @@ def compare_baseline(old_techniques, new_techniques):
     return {
         "improved": improved,
         "new_risks": new_risks
-    }
\ No newline at end of file
+    }
+
+
+def diff_hosts(baseline_hosts, fingerprints):
+    """
+    Confronta gli host della baseline con le fingerprint del pass rapido.
+
+    :param baseline_hosts: dict ip -> record baseline (con chiave "fingerprint")
+    :param fingerprints: dict ip -> fingerprint attuale (porte aperte + banner)
+    :return: dict con liste new / changed / gone / unchanged
+    """
+    new, changed, unchanged = [], [], []
+    for ip, fingerprint in fingerprints.items():
+        previous = baseline_hosts.get(ip)
+        if previous is None:
+            new.append(ip)
+        elif previous.get("fingerprint") != fingerprint:
+            changed.append(ip)
+        else:
+            unchanged.append(ip)
+    gone = [ip for ip in baseline_hosts if ip not in fingerprints]
+    return {
+        "new": new,
+        "changed": changed,
+        "gone": gone,
+        "unchanged": unchanged
+    }
+
+
+class RunStore:
+    """
+    Archivio su disco dei risultati per host/porta dell'ultimo assessment
+    di ogni cliente: <directory>/<cliente>.json
+    """
+
+    def __init__(self, directory=DEFAULT_STORE_DIR):
+        self.directory = directory
+
+    def _path(self, client):
+        slug = re.sub(r"[^a-z0-9]+", "_", str(client).lower()).strip("_") or "unknown"
+        return os.path.join(self.directory, f"{slug}.json")
+
+    def load(self, client):
+        """
+        Restituisce la baseline del cliente: {"timestamp", "hosts": {ip: record}}
+        """
+        try:
+            with open(self._path(client), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"timestamp": None, "hosts": {}}
+
+    def save(self, client, hosts):
+        """
+        Sostituisce la baseline del cliente (scrittura atomica).
+
+        :param hosts: dict ip -> {"fingerprint": {...}, "phases": {fase: record nmap}}
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        data = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "hosts": hosts
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._path(client))
@@ -0,0 +1,376 @@
+"""
+Batch mode: più assessment cliente in un unico processo padre
+  - input da cartella (*.yaml) o da manifest YAML
+  - workflow scelto per categoria cliente (mappa workflows)
+  - pool di processi riusati (startup Python e parsing YAML pagati una volta)
+  - budget di concorrenza per segmento di rete / uplink condiviso
+  - un bundle di risultati per cliente + riepilogo consolidato
+
+Manifest:
+  workers: 4
+  output: results/batch
+  workflows:                      # categoria → workflow ("default" come fallback)
+    negozio: workflows/negozio.yaml
+    default: workflows/quick_check.yaml
+  segments:                       # assessment concorrenti per uplink
+    default: 2
+    uplink-napoli: 1
+  clients:
+    - input: inputs/shop_01.yaml
+      segment: uplink-napoli      # opzionale (default: assets.network.uplink)
+      workflow: workflows/pos_hardening.yaml   # opzionale
+"""
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+import yaml
+from core.context import Context
+from core.plan import load_workflow
+
+DEFAULT_WORKERS = 4
+DEFAULT_SEGMENT_BUDGET = 2
+DEFAULT_OUTPUT_DIR = "results"
+DEFAULT_REPORT_FORMATS = ("md",)
+EXPLOIT_STEP_PREFIX = "exploits."
+
+
+def _load_yaml(path):
+    with open(path, "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", "_", str(name).lower()).strip("_") or "unknown"
+
+
+def load_manifest(source, workflow=None, workflow_map=None):
+    """
+    Carica il manifest batch da una cartella di input o da un file YAML.
+
+    :param source: cartella con gli input cliente oppure manifest YAML
+    :param workflow: workflow di default (--workflow)
+    :param workflow_map: dict categoria → workflow che integra quello del manifest
+    :return: dict normalizzato {"workers", "output", "workflows", "segments", "clients"}
+    """
+    if os.path.isdir(source):
+        manifest = {
+            "clients": [
+                {"input": os.path.join(source, name)}
+                for name in sorted(os.listdir(source))
+                if name.endswith((".yaml", ".yml"))
+            ]
+        }
+        base = "."
+    else:
+        manifest = _load_yaml(source)
+        base = os.path.dirname(os.path.abspath(source))
+
+    workflows = dict(manifest.get("workflows") or {})
+    workflows.update(workflow_map or {})
+    if workflow:
+        workflows.setdefault("default", workflow)
+
+    clients = []
+    for entry in manifest.get("clients") or []:
+        if isinstance(entry, str):
+            entry = {"input": entry}
+        path = entry["input"]
+        if not os.path.isabs(path) and not os.path.exists(path):
+            path = os.path.join(base, path)
+        clients.append(dict(entry, input=path))
+
+    return {
+        "workers": manifest.get("workers", DEFAULT_WORKERS),
+        "output": manifest.get("output", DEFAULT_OUTPUT_DIR),
+        "workflows": workflows,
+        "segments": manifest.get("segments") or {},
+        "clients": clients
+    }
+
+
+def plan_jobs(manifest, output_dir):
+    """
+    Risolve per ogni cliente input, workflow, segmento e cartella bundle.
+    I workflow vengono compilati una sola volta (core.plan) e passati ai worker.
+
+    :return: lista di job (dict) nell'ordine del manifest
+    """
+    workflows = {}
+    jobs = []
+    used = Counter()
+
+    for entry in manifest["clients"]:
+        raw = _load_yaml(entry["input"])
+        context = Context.from_input(raw)
+
+        workflow_path = (
+            entry.get("workflow")
+            or manifest["workflows"].get(context.category)
+            or manifest["workflows"].get("default")
+        )
+        if not workflow_path:
+            raise ValueError(
+                f"Nessun workflow per '{context.name}' (categoria '{context.category}')"
+            )
+        if workflow_path not in workflows:
+            try:
+                workflows[workflow_path] = load_workflow(workflow_path)
+            except ValueError as e:
+                raise ValueError(f"{workflow_path}: {e}") from None
+
+        slug = _slug(context.name)
+        used[slug] += 1
+        if used[slug] > 1:
+            slug = f"{slug}_{used[slug]}"
+
+        jobs.append({
+            "client": context.name,
+            "category": context.category,
+            "input": entry["input"],
+            "raw": raw,
+            "workflow_path": workflow_path,
+            "workflow": workflows[workflow_path],
+            "segment": entry.get("segment") or context.network_uplink(),
+            "bundle": os.path.join(output_dir, slug)
+        })
+    return jobs
+
+
+def _uses_exploits(jobs):
+    for job in jobs:
+        for step in job["workflow"].get("steps", []):
+            step_id = step if isinstance(step, str) else step.get("step") or step.get("id", "")
+            if step_id.startswith(EXPLOIT_STEP_PREFIX):
+                return True
+    return False
+
+
+def _step_status(statuses):
+    """
+    Status del cliente dagli status degli step: "error" se nessuno step
+    è riuscito, "partial" se alcuni sono falliti o parziali.
+    """
+    failed = statuses.get("error", 0)
+    if failed and failed == sum(statuses.values()) - statuses.get("skipped", 0):
+        return "error"
+    if failed or statuses.get("partial"):
+        return "partial"
+    return "success"
+
+
+def _init_worker(msf):
+    """
+    Inizializzazione dei processi worker: le credenziali RPC del container
+    condiviso restano nei worker, l'ambiente del processo padre non cambia.
+    """
+    if msf:
+        os.environ["MSF_RPC_PASSWORD"] = msf["rpc_password"]
+        os.environ["MSF_KEEP_CONTAINER"] = "1"
+        # Modulo già importato (fork): valori letti all'import da aggiornare
+        from modules.exploits import exploits
+        exploits.configure(rpc_password=msf["rpc_password"], keep_container=True)
+
+
+def run_client(job, settings):
+    """
+    Esegue un assessment nel processo worker e scrive il bundle del cliente:
+      <bundle>/result.json, <bundle>/report.<formato>, <bundle>/console.log, <bundle>/logs/
+
+    :return: riga di riepilogo per il report consolidato
+    """
+    # Import qui: i worker li caricano una volta sola e li riusano
+    from core import cache, executor, scheduler
+    from core.orchestrator import Orchestrator
+    from core.report_engine import write_reports
+
+    executor.configure(settings["max_procs"])
+    cache.configure(**settings["cache"])
+    scheduler.configure(**settings.get("scheduler", {}))
+    if "pdf" in settings.get("report_formats", ()):
+        from core import report_charts
+        # Già in un processo worker: grafici disegnati qui, cache su disco condivisa
+        if report_charts.get_chart_renderer().workers:
+            report_charts.configure(workers=0)
+
+    os.makedirs(job["bundle"], exist_ok=True)
+    summary = {
+        "client": job["client"],
+        "category": job["category"],
+        "input": job["input"],
+        "workflow": job["workflow_path"],
+        "segment": job["segment"],
+        "bundle": job["bundle"],
+        "status": "error"
+    }
+    started = time.monotonic()
+
+    console = os.path.join(job["bundle"], "console.log")
+    with open(console, "w", encoding="utf-8") as out, \
+            contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        try:
+            context = Context.from_input(job["raw"])
+            orchestrator = Orchestrator(context, log_folder=os.path.join(job["bundle"], "logs"))
+            output = orchestrator.run(job["workflow"])
+
+            with open(os.path.join(job["bundle"], "result.json"), "w", encoding="utf-8") as f:
+                json.dump(output, f, indent=2, ensure_ascii=False, default=str)
+            try:
+                write_reports(
+                    context, output, directory=job["bundle"],
+                    formats=settings.get("report_formats", DEFAULT_REPORT_FORMATS), name="report",
+                    run_log=orchestrator.run_log
+                )
+            finally:
+                orchestrator.run_log.close()
+
+            statuses = Counter(r.get("status", "unknown") for r in output["results"].values())
+            summary.update({
+                "status": _step_status(statuses),
+                "steps": dict(statuses),
+                "mitre_observed": len(output["mitre_observed"]),
+                "risk_score": output["risk_score"]["score"],
+                "risk_level": output["risk_score"]["level"]
+            })
+        except Exception as e:
+            summary["error"] = f"{type(e).__name__}: {e}"
+            print(f"[ERRORE] {summary['error']}")
+
+    summary["duration"] = round(time.monotonic() - started, 1)
+    return summary
+
+
+class BatchRunner:
+    """
+    Esegue gli assessment di più clienti su un pool di processi,
+    rispettando il budget di concorrenza di ogni segmento.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, segments=None,
+                 default_budget=DEFAULT_SEGMENT_BUDGET, settings=None):
+        self.workers = max(1, int(workers))
+        self.segments = segments or {}
+        self.default_budget = default_budget
+        self.settings = settings or {}
+
+    def budget(self, segment):
+        return max(1, int(self.segments.get(segment, self.default_budget)))
+
+    def run(self, jobs, on_done=None):
+        """
+        Sottomette i job appena c'è un worker libero e il loro segmento
+        ha ancora budget disponibile.
+
+        :param on_done: callback(summary) a ogni cliente completato
+        :return: riepiloghi nell'ordine dei job
+        """
+        # Container Metasploit e credenziali RPC condivisi tra i worker:
+        # avviato una volta qui, fermato a fine batch
+        exploits = None
+        msf = None
+        if _uses_exploits(jobs):
+            from modules.exploits import exploits
+            exploits.ensure_msf_container(
+                container_name=exploits.MSF_CONTAINER, image_name=exploits.MSF_IMAGE
+            )
+            # MSF_RPC_PASSWORD del padre se impostata, altrimenti quella salvata/generata
+            msf = {"rpc_password": exploits.rpc_password()}
+
+        pending = deque(range(len(jobs)))
+        in_flight = Counter()
+        summaries = {}
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(msf,)) as pool:
+            running = {}
+            while pending or running:
+                for index in list(pending):
+                    if len(running) >= self.workers:
+                        break
+                    segment = jobs[index]["segment"]
+                    if in_flight[segment] >= self.budget(segment):
+                        continue
+                    pending.remove(index)
+                    in_flight[segment] += 1
+                    running[pool.submit(run_client, jobs[index], self.settings)] = index
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = running.pop(future)
+                    job = jobs[index]
+                    in_flight[job["segment"]] -= 1
+                    try:
+                        summaries[index] = future.result()
+                    except Exception as e:
+                        summaries[index] = {
+                            "client": job["client"],
+                            "segment": job["segment"],
+                            "bundle": job["bundle"],
+                            "status": "error",
+                            "error": f"{type(e).__name__}: {e}"
+                        }
+                    if on_done is not None:
+                        on_done(summaries[index])
+
+        if exploits is not None:
+            exploits.stop_msf_container(container_name=exploits.MSF_CONTAINER)
+        return [summaries[i] for i in range(len(jobs))]
+
+
+def write_summary(output_dir, summaries, started):
+    """
+    Scrive il riepilogo consolidato (summary.json) del batch.
+
+    :return: path del file
+    """
+    path = os.path.join(output_dir, "summary.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "started": started.isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "clients": len(summaries),
+            "failed": sum(1 for s in summaries if s["status"] == "error"),
+            "partial": sum(1 for s in summaries if s["status"] == "partial"),
+            "results": summaries
+        }, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def run_batch(source, workflow=None, workflow_map=None, workers=None, output_dir=None,
+              default_budget=DEFAULT_SEGMENT_BUDGET, settings=None):
+    """
+    Entry point del batch mode (main.py --batch).
+
+    :return: lista dei riepiloghi per cliente
+    """
+    started = datetime.now()
+    manifest = load_manifest(source, workflow, workflow_map)
+    output_dir = os.path.join(
+        output_dir or manifest["output"], f"batch_{started.strftime('%Y%m%d_%H%M%S')}"
+    )
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = plan_jobs(manifest, output_dir)
+    runner = BatchRunner(
+        workers=workers or manifest["workers"],
+        segments=manifest["segments"],
+        default_budget=default_budget,
+        settings=settings
+    )
+
+    print(f"[*] Batch: {len(jobs)} clienti, {runner.workers} worker → {output_dir}")
+
+    def _on_done(summary):
+        outcome = summary.get("risk_level") or summary.get("error", "")
+        print(f"  [{summary['status']}] {summary['client']} ({summary['segment']}) {outcome}")
+        sys.stdout.flush()
+
+    summaries = runner.run(jobs, on_done=_on_done)
+    path = write_summary(output_dir, summaries, started)
+    print(f"[+] Riepilogo consolidato: {path}")
+    return summaries
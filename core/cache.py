@@ -0,0 +1,166 @@
+"""
+Cache persistente dei risultati (comandi di scansione e step)
+Content-addressed: la chiave è l'hash SHA-256 del materiale che identifica
+il risultato (comando, target normalizzati, versione scanner, ...).
+  - TTL configurabile
+  - eviction LRU basata sulla dimensione su disco
+  - --no-cache / --refresh da CLI
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+DEFAULT_CACHE_DIR = ".cache/results"
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ResultCache:
+    """
+    Cache su disco: un file per chiave in <directory>/<ab>/<chiave>.pkl
+    L'mtime del file viene aggiornato a ogni lettura e usato per l'LRU.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL,
+                 max_bytes=DEFAULT_MAX_BYTES, enabled=True, refresh=False):
+        """
+        :param directory: cartella della cache
+        :param ttl: validità delle voci in secondi
+        :param max_bytes: dimensione massima su disco prima dell'eviction
+        :param enabled: False disattiva lettura e scrittura (--no-cache)
+        :param refresh: True ignora le voci esistenti ma salva i nuovi risultati (--refresh)
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.refresh = refresh
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(namespace, payload):
+        """
+        Chiave content-addressed per namespace ("cmd", "step", ...) e payload JSON-serializzabile
+        """
+        material = json.dumps([namespace, payload], sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    # =========================
+    # Lettura / scrittura
+    # =========================
+    def get(self, key, default=None):
+        """Restituisce il valore in cache o default se assente / scaduto."""
+        if not self.enabled or self.refresh:
+            return default
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                created, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return default
+
+        if self.ttl is not None and time.time() - created > self.ttl:
+            self._remove(path)
+            return default
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        """Salva un valore (scrittura atomica) e applica l'eviction se necessario."""
+        if not self.enabled:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((time.time(), value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except Exception:
+            self._remove(tmp)
+            raise
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        """Svuota completamente la cache."""
+        with self._lock:
+            for path, _, _ in self._entries():
+                self._remove(path)
+            self._size = 0
+
+    # =========================
+    # Eviction LRU
+    # =========================
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, st.st_mtime, st.st_size))
+        return entries
+
+    def _disk_usage(self):
+        return sum(size for _, _, size in self._entries())
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self._size = total
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_cache = ResultCache()
+
+
+def get_cache():
+    """Restituisce la cache condivisa dal processo."""
+    return _cache
+
+
+def configure(enabled=True, refresh=False, ttl=DEFAULT_TTL,
+              directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """Riconfigura la cache condivisa (opzioni CLI)."""
+    global _cache
+    _cache = ResultCache(directory, ttl, max_bytes, enabled, refresh)
+    return _cache
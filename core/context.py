@@ -14,6 +14,25 @@ class Context:
         self.assets = assets or {}
         self.extra = extra or {}
 
+    @classmethod
+    def from_input(cls, raw):
+        """
+        Costruisce il contesto da un file input YAML già caricato
+        (stesso formato di inputs/input_master.yaml).
+        """
+        raw = raw or {}
+        client = raw.get("client", {})
+        return cls(
+            name=client.get("name", "UNKNOWN"),
+            category=client.get("category", "generic"),
+            assets=raw.get("assets", {}),
+            extra={
+                "assessment": raw.get("assessment", {}),
+                "constraints": raw.get("security_constraints", {}),
+                "notes": raw.get("notes", {})
+            }
+        )
+
     def get_asset(self, key, default=None):
         """Restituisce l'asset specificato."""
         return self.assets.get(key, default)
@@ -42,6 +61,9 @@ class Context:
     def network_wifi(self):
         return self.assets.get("network", {}).get("wifi", {})
 
+    def network_uplink(self):
+        return self.assets.get("network", {}).get("uplink") or "default"
+
     # =========================
     # Endpoints helpers
     # =========================
@@ -60,6 +82,12 @@ class Context:
     def web_login_areas(self):
         return self.assets.get("web", {}).get("login_areas", {})
 
+    def web_enum_options(self):
+        return self.assets.get("web", {}).get("enum", {})
+
+    def web_tls_options(self):
+        return self.assets.get("web", {}).get("tls", {})
+
     # =========================
     # POS helpers
     # =========================
@@ -69,6 +97,12 @@ class Context:
     def pos_list(self):
         return self.assets.get("pos_systems", {}).get("list", [])
 
+    def pos_probe_options(self):
+        return self.assets.get("pos_systems", {}).get("probe", {})
+
+    def pos_sensitive_ports(self):
+        return self.assets.get("pos_systems", {}).get("sensitive_ports", [])
+
     # =========================
     # Third party services
     # =========================
@@ -84,6 +118,39 @@ class Context:
     def excluded_assets(self):
         return self.extra.get("constraints", {}).get("excluded_assets", [])
 
+    def excluded_targets(self):
+        """IP/nomi degli asset esclusi (stringhe o dict con ip/name)."""
+        targets = set()
+        for asset in self.excluded_assets() or []:
+            if isinstance(asset, dict):
+                targets.update(str(asset[k]) for k in ("ip", "name") if asset.get(k))
+            elif asset:
+                targets.add(str(asset))
+        return targets
+
+    def without_excluded(self):
+        """
+        Copia del contesto senza gli asset esclusi: gli step la ricevono al
+        posto del contesto completo, così non scansionano gli asset esclusi.
+        """
+        excluded = self.excluded_targets()
+        if not excluded:
+            return self
+
+        def _excluded(value):
+            if isinstance(value, dict):
+                return any(str(value.get(k)) in excluded for k in ("ip", "name") if value.get(k))
+            return isinstance(value, str) and value in excluded
+
+        def _filter(value):
+            if isinstance(value, dict):
+                return {k: _filter(v) for k, v in value.items() if not _excluded(v)}
+            if isinstance(value, list):
+                return [_filter(v) for v in value if not _excluded(v)]
+            return value
+
+        return Context(self.name, self.category, _filter(self.assets), self.extra)
+
     def is_social_engineering_allowed(self):
         return self.extra.get("constraints", {}).get("social_engineering_allowed", False)
 
@@ -0,0 +1,427 @@
+"""
+Executor condiviso per i comandi esterni (nmap, docker, ping, ...)
+Basato su subprocess asyncio, senza shell:
+  - timeout per singola chiamata
+  - limite globale di processi concorrenti
+  - cancellazione che termina l'intero albero di processi
+  - stdout/stderr catturati come bytes
+  - cache opzionale dei risultati (vedi core.cache)
+  - finestra oraria e budget di rete dello scheduler (vedi core.scheduler)
+"""
+import asyncio
+import concurrent.futures
+import functools
+import ipaddress
+import os
+import signal
+import subprocess
+import threading
+import time
+from core.cache import get_cache
+from core.scheduler import get_scheduler, WINDOW_POLL
+
+DEFAULT_MAX_CONCURRENCY = 8
+READ_CHUNK = 64 * 1024
+
+
+class CommandResult:
+    """
+    Esito di un comando eseguito dall'Executor
+    """
+
+    def __init__(self, argv, returncode, stdout=b"", stderr=b"",
+                 timed_out=False, duration=0.0):
+        self.argv = list(argv)
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.duration = duration
+
+    @property
+    def command(self):
+        return " ".join(self.argv)
+
+    @property
+    def stdout_text(self):
+        return self.stdout.decode("utf-8", errors="replace")
+
+    @property
+    def stderr_text(self):
+        return self.stderr.decode("utf-8", errors="replace")
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def __repr__(self):
+        return f"CommandResult({self.command!r}, rc={self.returncode})"
+
+
+def _kill_tree(proc):
+    """
+    Termina il processo e tutti i suoi figli (process group / job tree)
+    """
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError):
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+def _signal_tree(proc, sig):
+    """Sospende/riprende l'intero process group (solo POSIX)."""
+    try:
+        os.killpg(proc.pid, sig)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version(tool):
+    """
+    Prima riga di "<tool> --version" (memoizzata), usata nelle chiavi di cache
+    """
+    try:
+        res = subprocess.run([tool, "--version"], capture_output=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return "unknown"
+    lines = res.stdout.decode("utf-8", errors="replace").strip().splitlines()
+    return lines[0] if lines else "unknown"
+
+
+def normalize_targets(targets):
+    """
+    Insieme ordinato e normalizzato dei target (IP/CIDR canonici, hostname minuscoli)
+    """
+    normalized = set()
+    for target in targets:
+        target = str(target).strip()
+        try:
+            normalized.add(str(ipaddress.ip_network(target, strict=False)))
+        except ValueError:
+            normalized.add(target.lower())
+    return sorted(normalized)
+
+
+def cache_key(argv, targets):
+    """
+    Chiave di cache: comando senza target + target normalizzati + versione scanner
+    """
+    argv = [str(a) for a in argv]
+    target_set = {str(t) for t in targets}
+    return get_cache().make_key("cmd", {
+        "argv": [a for a in argv if a not in target_set],
+        "targets": normalize_targets(targets),
+        "version": tool_version(argv[0])
+    })
+
+
+async def _drain(stream, buffer, on_line=None):
+    """
+    Legge lo stream nel buffer; se on_line è indicato viene invocato
+    per ogni riga completa (str) appena disponibile.
+    """
+    pending = b""
+    while True:
+        chunk = await stream.read(READ_CHUNK)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if on_line is None:
+            continue
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            _notify(on_line, line)
+    if on_line is not None and pending:
+        _notify(on_line, pending)
+
+
+def _notify(on_line, line):
+    try:
+        on_line(line.decode("utf-8", errors="replace").rstrip("\r"))
+    except Exception:
+        pass
+
+
+class Executor:
+    """
+    Esegue comandi esterni su un event loop asyncio dedicato.
+    Utilizzabile sia da codice sincrono (thread degli step) sia da coroutine.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    # =========================
+    # Event loop di background
+    # =========================
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="cybertoolkit-executor",
+                    daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def shutdown(self):
+        """Ferma l'event loop di background (i processi in corso vengono terminati)."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+            self._semaphore = None
+        if loop is None:
+            return
+
+        async def _cancel_all():
+            current = asyncio.current_task()
+            tasks = [t for t in asyncio.all_tasks() if t is not current]
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(_cancel_all(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+    # =========================
+    # API asincrona
+    # =========================
+    async def run_async(self, argv, timeout=None, stdin=None, on_line=None, bounded=True):
+        """
+        Esegue argv (lista, nessuna shell) rispettando il limite di concorrenza.
+
+        :param argv: comando come lista di argomenti
+        :param timeout: secondi massimi di esecuzione (None = nessun limite)
+        :param stdin: bytes opzionali da inviare al processo
+        :param on_line: callback opzionale per ogni riga di stdout (es. progress nmap)
+        :param bounded: False = fuori dal limite di processi (processi brevi con
+                        parallelismo proprio, es. ping del prober POS); finestra
+                        e budget dello scheduler restano applicati. Può girare
+                        sull'event loop del chiamante.
+        :return: CommandResult
+        """
+        if not bounded:
+            async with get_scheduler().slot(argv) as argv:
+                return await self._spawn(argv, timeout, stdin, on_line)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        # Finestra e quota prima dello slot: chi attende non blocca un processo
+        async with get_scheduler().slot(argv) as argv:
+            async with self._semaphore:
+                return await self._spawn(argv, timeout, stdin, on_line)
+
+    async def _spawn(self, argv, timeout, stdin, on_line=None):
+        argv = [str(a) for a in argv]
+        started = time.monotonic()
+        kwargs = {}
+        if os.name == "nt":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
+
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **kwargs
+            )
+        except FileNotFoundError:
+            return CommandResult(
+                argv, 127, stderr=f"command not found: {argv[0]}".encode(),
+                duration=time.monotonic() - started
+            )
+
+        out, err = bytearray(), bytearray()
+        timed_out = False
+
+        async def _communicate():
+            if stdin is not None:
+                proc.stdin.write(stdin)
+                await proc.stdin.drain()
+                proc.stdin.close()
+            await asyncio.gather(_drain(proc.stdout, out, on_line), _drain(proc.stderr, err))
+            await proc.wait()
+
+        task = asyncio.ensure_future(_communicate())
+        try:
+            await self._supervise(proc, task, timeout, get_scheduler().is_scan(argv))
+        except asyncio.TimeoutError:
+            timed_out = True
+            task.cancel()
+            _kill_tree(proc)
+            await proc.wait()
+        except asyncio.CancelledError:
+            task.cancel()
+            _kill_tree(proc)
+            await proc.wait()
+            raise
+
+        return CommandResult(
+            argv, proc.returncode, bytes(out), bytes(err),
+            timed_out=timed_out, duration=time.monotonic() - started
+        )
+
+    @staticmethod
+    async def _supervise(proc, task, timeout, pausable):
+        """
+        Attende il processo applicando il timeout.
+        Le scansioni fuori finestra vengono sospese (SIGSTOP) e riprese
+        alla riapertura; il tempo in pausa non conta nel timeout.
+        """
+        scheduler = get_scheduler()
+        pausable = pausable and os.name != "nt" and not scheduler.window.always_open
+        if not pausable:
+            await asyncio.wait_for(task, timeout)
+            return
+
+        remaining = timeout
+        paused = False
+        while True:
+            step = WINDOW_POLL if remaining is None else min(WINDOW_POLL, remaining)
+            started = time.monotonic()
+            done, _ = await asyncio.wait({task}, timeout=step)
+            if done:
+                task.result()
+                return
+
+            open_now = scheduler.is_open()
+            if paused:
+                if open_now:
+                    _signal_tree(proc, signal.SIGCONT)
+                    paused = False
+                continue
+
+            if remaining is not None:
+                remaining -= time.monotonic() - started
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+            if not open_now:
+                _signal_tree(proc, signal.SIGSTOP)
+                paused = True
+
+    # =========================
+    # API sincrona (thread-safe)
+    # =========================
+    def submit(self, argv, timeout=None, stdin=None, targets=None, on_line=None):
+        """
+        Pianifica un comando e restituisce un concurrent.futures.Future.
+        future.cancel() termina l'intero albero di processi.
+
+        :param targets: se indicato il comando è cacheabile; i target
+                        vengono normalizzati nella chiave di cache
+        :param on_line: callback per ogni riga di stdout (eseguita sul thread dell'executor)
+        """
+        key = None
+        cache = get_cache()
+        if targets is not None and stdin is None and cache.enabled:
+            key = cache_key(argv, targets)
+            cached = cache.get(key)
+            if cached is not None:
+                future = concurrent.futures.Future()
+                future.set_result(cached)
+                return future
+
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self.run_async(argv, timeout, stdin, on_line), loop
+        )
+
+        if key is not None:
+            def _store(f):
+                if not f.cancelled() and f.exception() is None and f.result().ok:
+                    get_cache().set(key, f.result())
+            future.add_done_callback(_store)
+        return future
+
+    def run(self, argv, timeout=None, stdin=None, targets=None, on_line=None):
+        """
+        Esegue un comando e attende il risultato.
+        Se il chiamante viene interrotto il processo viene terminato.
+        """
+        future = self.submit(argv, timeout, stdin, targets, on_line)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def run_many(self, commands, timeout=None, targets=None):
+        """
+        Esegue più comandi in parallelo (entro il limite globale).
+
+        :param commands: lista di argv
+        :param targets: lista opzionale (parallela a commands) dei target da usare per la cache
+        :return: lista di CommandResult nello stesso ordine
+        """
+        targets = targets or [None] * len(commands)
+        futures = [self.submit(argv, timeout, targets=t) for argv, t in zip(commands, targets)]
+        try:
+            return [f.result() for f in futures]
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Restituisce l'Executor condiviso dal processo."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = Executor()
+        return _executor
+
+
+def _reset_after_fork():
+    """
+    Nei processi figli (batch mode) il thread dell'event loop del padre
+    non esiste: si riparte con un Executor nuovo con lo stesso limite.
+    """
+    global _executor, _executor_lock
+    _executor_lock = threading.Lock()
+    if _executor is not None:
+        _executor = Executor(_executor.max_concurrency)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def configure(max_concurrency):
+    """Imposta il limite globale di processi concorrenti."""
+    executor = get_executor()
+    executor.max_concurrency = max(1, int(max_concurrency))
+    executor._semaphore = None
+
+
+def run_command(argv, timeout=None, stdin=None, targets=None, on_line=None):
+    """Scorciatoia: esegue argv sull'Executor condiviso."""
+    return get_executor().run(argv, timeout=timeout, stdin=stdin, targets=targets, on_line=on_line)
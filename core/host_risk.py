@@ -0,0 +1,206 @@
+"""
+Risk scoring per host (NumPy)
+Costruisce dai risultati degli step una matrice host × tecnica e la
+proietta sulle tattiche ATT&CK (core.attack_kb):
+  - pesi per tattica come vettore
+  - moltiplicatori di criticità dall'inventario asset (criticality)
+  - bonus per tattiche critiche come maschere booleane
+Le matrici vengono costruite una volta: score() con pesi diversi
+è solo algebra su array (rescoring immediato).
+"""
+import json
+import numpy as np
+from core.artifacts import load_raw
+from core.attack_kb import get_kb
+from core.risk_engine import MITRE_TACTIC_WEIGHTS, RISK_LEVELS
+
+CRITICALITY_MULTIPLIERS = {
+    "low": 0.75,
+    "medium": 1.0,
+    "high": 1.5,
+    "critical": 2.0
+}
+DEFAULT_CRITICALITY = "medium"
+CRITICAL_TACTICS = ("Impact", "Command and Control", "Lateral Movement")
+CRITICAL_BONUS = 5.0
+MAX_SCORE = 100.0
+
+# Chiavi dei record (raw degli step) che identificano un host
+HOST_KEYS = ("address", "host", "domain", "ip", "target")
+
+# Porte aperte → sotto-tecnica Remote Services osservata sull'host
+PORT_TECHNIQUES = {
+    22: "T1021.004",
+    445: "T1021.002",
+    3389: "T1021.001",
+    5900: "T1021.005"
+}
+
+
+def _level(score):
+    level = "NONE"
+    for threshold, name in RISK_LEVELS:
+        if score >= threshold:
+            level = name
+    return level
+
+
+def _walk_hosts(raw, found):
+    """
+    Host citati in un raw di step (dict/list annidati) e porte aperte.
+    I raw testuali in JSON (es. report di metasploit_check) vengono
+    decodificati prima della visita.
+    """
+    if isinstance(raw, str):
+        if raw.lstrip()[:1] not in ("{", "["):
+            return found
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return found
+    if isinstance(raw, dict):
+        host = next((raw[k] for k in HOST_KEYS if isinstance(raw.get(k), str) and raw.get(k)), None)
+        if host:
+            ports = found.setdefault(host, set())
+            for port in raw.get("ports", []) or []:
+                if isinstance(port, dict) and port.get("state") == "open":
+                    ports.add(port.get("port"))
+        for value in raw.values():
+            if isinstance(value, (dict, list)):
+                _walk_hosts(value, found)
+    elif isinstance(raw, list):
+        for item in raw:
+            _walk_hosts(item, found)
+    return found
+
+
+def asset_inventory(context):
+    """
+    Host dell'inventario con classe e criticità.
+
+    :return: dict {host: (asset_class, criticality)}
+    """
+    inventory = {}
+    for domain in context.web_domains():
+        inventory[domain] = ("web", DEFAULT_CRITICALITY)
+    for pos in context.pos_list():
+        if pos.get("ip"):
+            criticality = pos.get("criticality") or ("high" if pos.get("pci_scope") else DEFAULT_CRITICALITY)
+            inventory[pos["ip"]] = ("pos", criticality)
+    for asset_class, entries in (("workstation", context.workstations()), ("server", context.servers())):
+        for entry in entries:
+            if entry.get("ip"):
+                inventory[entry["ip"]] = (asset_class, entry.get("criticality") or DEFAULT_CRITICALITY)
+    return inventory
+
+
+class HostRiskModel:
+    """
+    Matrici host × tecnica e tecnica × tattica per un assessment.
+    """
+
+    def __init__(self, hosts, techniques, observations, inventory=None):
+        """
+        :param hosts: lista di host (righe)
+        :param techniques: lista di technique ID (colonne)
+        :param observations: iterabile di (host, technique)
+        :param inventory: dict {host: (asset_class, criticality)}
+        """
+        inventory = inventory or {}
+        kb = get_kb()
+        self.hosts = list(hosts)
+        self.techniques = list(techniques)
+        host_index = {h: i for i, h in enumerate(self.hosts)}
+        technique_index = {t: j for j, t in enumerate(self.techniques)}
+
+        self.observed = np.zeros((len(self.hosts), len(self.techniques)), dtype=bool)
+        for host, technique in observations:
+            self.observed[host_index[host], technique_index[technique]] = True
+
+        self.tactics = sorted({t for tech in self.techniques for t in kb.tactics(tech)})
+        tactic_index = {t: k for k, t in enumerate(self.tactics)}
+        self.incidence = np.zeros((len(self.techniques), len(self.tactics)), dtype=bool)
+        for j, technique in enumerate(self.techniques):
+            for tactic in kb.tactics(technique):
+                self.incidence[j, tactic_index[tactic]] = True
+
+        self.asset_classes = np.array(
+            [inventory.get(h, ("network", None))[0] for h in self.hosts], dtype=object
+        )
+        self.criticality = np.array(
+            [inventory.get(h, (None, DEFAULT_CRITICALITY))[1] or DEFAULT_CRITICALITY for h in self.hosts],
+            dtype=object
+        )
+
+    @classmethod
+    def from_results(cls, results, step_techniques, context):
+        """
+        :param results: output degli step {step_id: step_result}
+        :param step_techniques: {step_id: tecniche} degli step completati
+        """
+        inventory = asset_inventory(context)
+        observations = set()
+        for step, techniques in step_techniques.items():
+            # Un raw alla volta dallo store: la memoria non cresce con la scansione
+            raw = load_raw(results.get(step, {}).get("raw"))
+            for host, ports in _walk_hosts(raw, {}).items():
+                observations.update((host, t) for t in techniques)
+                observations.update((host, PORT_TECHNIQUES[p]) for p in ports if p in PORT_TECHNIQUES)
+
+        hosts = list(dict.fromkeys([*inventory, *(h for h, _ in observations)]))
+        techniques = sorted({t for _, t in observations})
+        return cls(hosts, techniques, observations, inventory)
+
+    def score(self, tactic_weights=None, multipliers=None,
+              critical_tactics=CRITICAL_TACTICS, bonus=CRITICAL_BONUS):
+        """
+        Calcola i punteggi (ricalcolabile con pesi diversi senza ricostruire le matrici).
+
+        :return: dict {"hosts": [...], "classes": {...}, "overall": {...}}
+        """
+        tactic_weights = tactic_weights or MITRE_TACTIC_WEIGHTS
+        multipliers = multipliers or CRITICALITY_MULTIPLIERS
+
+        weights = np.array([tactic_weights.get(t, 1) for t in self.tactics], dtype=float)
+        # Peso di una tecnica = tattica più grave (1 se senza tattiche note)
+        per_technique = np.where(self.incidence, weights, 0.0).max(axis=1, initial=0.0)
+        per_technique[~self.incidence.any(axis=1)] = 1.0
+
+        observed = self.observed.astype(float)
+        base = observed @ per_technique
+        host_tactics = (observed @ self.incidence.astype(float)) > 0
+
+        critical = np.isin(self.tactics, critical_tactics)
+        base += host_tactics[:, critical].any(axis=1) * bonus
+
+        factor = np.array(
+            [multipliers.get(str(c).lower(), 1.0) for c in self.criticality], dtype=float
+        )
+        scores = np.minimum(base * factor, MAX_SCORE)
+
+        order = np.argsort(-scores, kind="stable")
+        hosts = [{
+            "host": self.hosts[i],
+            "asset_class": self.asset_classes[i],
+            "criticality": self.criticality[i],
+            "score": round(float(scores[i]), 1),
+            "level": _level(scores[i]),
+            "techniques": [t for t, seen in zip(self.techniques, self.observed[i]) if seen],
+            "tactics": [t for t, seen in zip(self.tactics, host_tactics[i]) if seen]
+        } for i in order]
+
+        classes = {}
+        for asset_class in dict.fromkeys(self.asset_classes):
+            mask = self.asset_classes == asset_class
+            classes[asset_class] = {
+                "hosts": int(mask.sum()),
+                "max": round(float(scores[mask].max()), 1),
+                "mean": round(float(scores[mask].mean()), 1)
+            }
+
+        overall = float(scores.max()) if scores.size else 0.0
+        return {
+            "hosts": hosts,
+            "classes": classes,
+            "overall": {"score": round(overall, 1), "level": _level(overall)}
+        }
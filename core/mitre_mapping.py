@@ -8,6 +8,10 @@ MITRE_MAPPING = {
        "tactics": ["Discovery"],
        "techniques": ["T1046", "T1016"]
    },
+   "network.network.reassessment": {
+       "tactics": ["Discovery"],
+       "techniques": ["T1046", "T1016"]
+   },
    "network.network.portscan": {
        "tactics": ["Discovery"],
        "techniques": ["T1046"]
@@ -16,7 +20,7 @@ MITRE_MAPPING = {
        "tactics": ["Defense Evasion", "Lateral Movement"],
        "techniques": ["T1021", "T1570"]
    },
-   "network.egress": {
+   "network.network.egress": {
        "tactics": ["Command and Control"],
        "techniques": ["T1071", "T1041"]
    },
@@ -0,0 +1,108 @@
+"""
+Parser nmap XML (-oX -)
+Lettura in streaming (iterparse) dell'output XML di nmap in record compatti
+host/porta/servizio, con memoria limitata anche su output di reti /16.
+"""
+import io
+import xml.etree.ElementTree as ET
+
+
+def _open_source(source):
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source), True
+    if isinstance(source, str):
+        return open(source, "rb"), True
+    return source, False
+
+
+def _host_record(elem):
+    """
+    Converte un elemento <host> in un dict compatto
+    """
+    record = {
+        "address": None,
+        "mac": None,
+        "hostnames": [],
+        "status": "unknown",
+        "ports": [],
+        "os": []
+    }
+
+    status = elem.find("status")
+    if status is not None:
+        record["status"] = status.get("state", "unknown")
+
+    for addr in elem.findall("address"):
+        if addr.get("addrtype") == "mac":
+            record["mac"] = addr.get("addr")
+        elif record["address"] is None:
+            record["address"] = addr.get("addr")
+
+    for hostname in elem.findall("hostnames/hostname"):
+        name = hostname.get("name")
+        if name and name not in record["hostnames"]:
+            record["hostnames"].append(name)
+
+    for port in elem.findall("ports/port"):
+        state = port.find("state")
+        service = port.find("service")
+        entry = {
+            "port": int(port.get("portid")),
+            "protocol": port.get("protocol"),
+            "state": state.get("state") if state is not None else "unknown",
+            "service": service.get("name") if service is not None else None,
+            "product": service.get("product") if service is not None else None,
+            "version": service.get("version") if service is not None else None
+        }
+        scripts = {s.get("id"): s.get("output") for s in port.findall("script")}
+        if scripts:
+            entry["scripts"] = scripts
+        record["ports"].append(entry)
+
+    for match in elem.findall("os/osmatch"):
+        record["os"].append({
+            "name": match.get("name"),
+            "accuracy": int(match.get("accuracy", 0))
+        })
+
+    return record
+
+
+def iter_hosts(source):
+    """
+    Restituisce in streaming i record host presenti nell'XML di nmap.
+    Un XML troncato (es. scan interrotto per timeout) produce gli host
+    completi letti fino al punto di interruzione.
+
+    :param source: bytes, path del file o file object binario
+    """
+    stream, owned = _open_source(source)
+    try:
+        context = ET.iterparse(stream, events=("start", "end"))
+        root = None
+        for event, elem in context:
+            if root is None:
+                root = elem
+            if event == "end" and elem.tag == "host":
+                yield _host_record(elem)
+                root.clear()
+    except ET.ParseError:
+        return
+    finally:
+        if owned:
+            stream.close()
+
+
+def parse_hosts(source):
+    """Lista di tutti i record host dell'XML."""
+    return list(iter_hosts(source))
+
+
+def live_hosts(records):
+    """Indirizzi degli host risultati attivi."""
+    return [r["address"] for r in records if r["status"] == "up" and r["address"]]
+
+
+def open_ports(record):
+    """Porte aperte di un record host."""
+    return [p for p in record["ports"] if p["state"] == "open"]
@@ -1,11 +1,19 @@
-import importlib
-from core.mitre_engine import get_mitre_for_step
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from core.risk_engine import calculate_risk
-from core.report_engine import generate_report
+from core.host_risk import HostRiskModel
+from core.risk_history import get_history, DEFAULT_DB_PATH
+from sqlalchemy.exc import SQLAlchemyError
 from core.context import Context
+from core.cache import get_cache
+from core.plan import as_plan
+from core.run_log import RunLog
+from core.artifacts import ArtifactStore, DEFAULT_KEEP_RUNS, prune_runs
+from core.progress import get_bus
+from core.executor import get_executor, tool_version
+from core import scheduler
 import os
-import yaml
-import json
 from datetime import datetime
 
 class Orchestrator:
@@ -14,109 +22,263 @@ class Orchestrator:
     Esegue un workflow passo-passo usando il Context del cliente.
     """
 
-    def __init__(self, context: Context, log_folder="logs"):
+    def __init__(self, context: Context, log_folder="logs", history_path=DEFAULT_DB_PATH,
+                 keep_artifacts=DEFAULT_KEEP_RUNS):
         """
         :param context: oggetto Context con assets, client, extra
         :param log_folder: cartella dove salvare i log passo-passo
+        :param history_path: database dello storico rischio (None = non registrare)
+        :param keep_artifacts: store degli artefatti conservati a fine run (0 = tutti)
+
+        I raw output grandi vengono spostati in <log_folder>/artifacts_<timestamp>/
+        (blob gzip deduplicati): i risultati contengono solo i riferimenti.
         """
         self.context = context
+        # Gli step ricevono il contesto senza gli asset in excluded_assets
+        self.scan_context = context.without_excluded()
         self.log_folder = log_folder
+        self.history_path = history_path
+        self.keep_artifacts = keep_artifacts
         os.makedirs(self.log_folder, exist_ok=True)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_file = os.path.join(self.log_folder, f"log_{timestamp}.txt")
+        self.run_id = timestamp
+        self.run_log = RunLog(
+            self.log_folder, f"log_{timestamp}",
+            fields={"run_id": timestamp, "client": context.name}
+        )
+        self.log_file = self.run_log.text_path
+        self.artifacts = ArtifactStore(os.path.join(self.log_folder, f"artifacts_{timestamp}"))
 
     def _write_step_log(self, step_name, step_result):
-        """Scrive il risultato di uno step direttamente a log file"""
-        with open(self.log_file, "a", encoding="utf-8") as f:
-            f.write(f"[STEP] {step_name}\n")
-            f.write(f"Status : {step_result.get('status', 'unknown')}\n")
-            f.write(f"Summary: {step_result.get('summary', '')}\n")
-            raw = step_result.get("raw", None)
-            if raw:
-                f.write("Raw output:\n")
-                # ============================
-                # 1️⃣ Caso: RAW = Dizionario
-                # ============================
-                if isinstance(raw, dict):
-                    for key, value in raw.items():
-                        f.write(f"\n- {key}:\n")
-                        try:
-                            f.write(yaml.dump(value, sort_keys=False, allow_unicode=True))
-                        except:
-                            f.write(str(value) + "\n")
-                # ============================
-                # 2️⃣ Caso: RAW = Lista
-                # ============================
-                elif isinstance(raw, list):
-                    for i, item in enumerate(raw, 1):
-                        f.write(f"\n[{i}] ")
-                        if isinstance(item, dict):
-                            f.write("\n")
-                            f.write(yaml.dump(item, sort_keys=False, allow_unicode=True))
-                        else:
-                            f.write(str(item) + "\n")
-                # ============================
-                # 3️⃣ Qualsiasi altra cosa
-                # ============================
-                else:
-                    f.write(str(raw) + "\n")
-            f.write("-" * 50 + "\n")
+        """Accoda il risultato di uno step al run log (scrittura in background)"""
+        self.run_log.write_step(step_name, step_result)
 
-    def run(self, workflow: dict) -> dict:
+    def _execute_step(self, planned):
         """
-        Esegue il workflow passo-passo e scrive i log live.
+        Esegue un singolo step del piano e ne standardizza l'output.
+        Non solleva eccezioni: gli errori diventano uno step_result "error".
 
-        :param workflow: dict YAML con chiave "steps"
-        :return: dict con risultati, MITRE osservato, risk score e report
+        :return: tupla (step_result, completed) dove completed è False se lo step è fallito
         """
-        results = {}
-        mitre_observed = []
+        step = planned.id
+        cache = get_cache()
+        key = None
+        # Step con stato (baseline, exploit): sempre eseguiti
+        if planned.cacheable:
+            key = cache.make_key("step", {
+                "step": step,
+                "assets": self.context.assets,
+                "constraints": self.context.extra.get("constraints", {}),
+                "tools": {tool: tool_version(tool) for tool in planned.tools}
+            })
+            cached = cache.get(key)
+            if cached is not None:
+                return cached, True
 
-        for step in workflow.get("steps", []):
-            try:
-                # Import dinamico del modulo e funzione
-                module_name, func_name = step.rsplit(".", 1)
-                module = importlib.import_module(f"modules.{module_name}")
-                func = getattr(module, func_name)
-
-                # Esecuzione step
-                step_result = func(self.context)
-
-                # Standardizza output
-                if not isinstance(step_result, dict):
-                    step_result = {
-                        "status": "success",
-                        "raw": str(step_result),
-                        "summary": ""
-                    }
-
-                results[step] = step_result
+        # Lo step parte solo dentro la finestra di test consentita
+        def _on_wait(seconds, opens_at):
+            print(f"[*] Fuori finestra di test: {step} in attesa fino alle {opens_at:%H:%M}")
+            self.run_log.write_event(
+                "window_wait", step=step, seconds=round(seconds), opens_at=opens_at.isoformat()
+            )
+        scheduler.get_scheduler().wait_open(step, on_wait=_on_wait)
 
-                # Log immediato
-                self._write_step_log(step, step_result)
+        try:
+            # Il modulo viene importato alla prima esecuzione dello step
+            func = planned.func
 
-                # MITRE mapping
-                mitre = get_mitre_for_step(step)
-                if mitre:
-                    for t in mitre:
-                        if t not in mitre_observed:
-                            mitre_observed.append(t)
+            # Esecuzione step
+            step_result = func(self.scan_context)
 
-            except Exception as e:
+            # Standardizza output
+            if not isinstance(step_result, dict):
                 step_result = {
-                    "status": "error",
-                    "raw": "",
-                    "summary": f"Step fallito: {str(e)}"
+                    "status": "success",
+                    "raw": str(step_result),
+                    "summary": ""
                 }
+            if key is not None and step_result.get("status") == "success":
+                cache.set(key, step_result)
+            return step_result, True
+
+        except Exception as e:
+            return {
+                "status": "error",
+                "raw": "",
+                "summary": f"Step fallito: {str(e)}"
+            }, False
+
+    def _execute_and_store(self, planned):
+        """Esegue lo step nel thread worker e sposta subito il raw nello store."""
+        step_result, ok = self._execute_step(planned)
+        return self.artifacts.spill(step_result), ok
+
+    def _iter_steps(self, steps, workers):
+        """
+        Esegue gli step rispettando le dipendenze su un pool di thread.
+        I log vengono scritti nell'ordine del workflow non appena
+        tutti gli step precedenti sono completati.
+
+        :return: generatore di (step, step_result, completed) nell'ordine di
+                 completamento; completed è False se lo step è fallito
+        """
+        order = [s.id for s in steps]
+        by_id = {s.id: s for s in steps}
+        pending = {s.id: set(s.depends_on) for s in steps}
+        done = {}
+        next_to_log = 0
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            while pending or running:
+                ready = [sid for sid in order
+                         if sid in pending and pending[sid].issubset(done)]
+                available = []
+                for sid in ready:
+                    del pending[sid]
+                    if by_id[sid].runnable:
+                        running[pool.submit(self._execute_and_store, by_id[sid])] = sid
+                    else:
+                        # Step potato dal piano: nessun processo avviato
+                        done[sid] = {"status": "skipped", "raw": "", "summary": by_id[sid].skip}
+                        available.append((sid, done[sid], False))
+
+                finished = wait(running, return_when=FIRST_COMPLETED)[0] if running else ()
+                for future in finished:
+                    step = running.pop(future)
+                    done[step], ok = future.result()
+                    available.append((step, done[step], ok))
+
+                # Log immediato, in ordine deterministico
+                while next_to_log < len(order) and order[next_to_log] in done:
+                    step = order[next_to_log]
+                    self._write_step_log(step, done[step])
+                    next_to_log += 1
+
+                yield from available
+
+    @staticmethod
+    def _observed(steps, completed):
+        """Tecniche MITRE degli step completati, nell'ordine del workflow."""
+        # dict come insieme ordinato: deduplica O(1) per tecnica
+        observed = {}
+        for planned in steps:
+            if planned.id in completed:
+                observed.update(dict.fromkeys(planned.techniques))
+        return list(observed)
+
+    def run_iter(self, workflow):
+        """
+        Esegue il workflow restituendo gli eventi man mano che sono disponibili:
+          {"event": "run_start", "workflow", "steps", "skipped"}
+          {"event": "step", "step", "result", "completed", "total",
+           "mitre_observed", "risk_score"}   (MITRE e rischio aggiornati)
+          {"event": "run_end", "output"}     (stesso dict di run())
+        Se il consumer interrompe l'iterazione, gli step in corso vengono
+        completati, il run log chiuso e lo storico non viene aggiornato.
+
+        :param workflow: ExecutionPlan, workflow compilato (core.plan) o dict YAML
+        """
+        # Step sconosciuti o grafo non valido: errore prima di qualsiasi scansione
+        plan = as_plan(workflow, self.context)
+        steps = plan.steps
+        limits = scheduler.for_context(self.context, slots=get_executor().max_concurrency)
+        skipped = {s.id: s.skip for s in steps if not s.runnable}
+        try:
+            self.run_log.write_event(
+                "run_start",
+                category=self.context.category,
+                workflow=plan.name,
+                steps=[s.id for s in steps],
+                skipped=skipped,
+                testing_window=repr(limits.window),
+                max_rate=limits.rate
+            )
+            yield {
+                "event": "run_start",
+                "workflow": plan.name,
+                "steps": [s.id for s in steps],
+                "skipped": skipped
+            }
+        except BaseException:
+            scheduler.release()
+            raise
+
+        # Progress delle scansioni concorrenti → stream JSONL
+        def _on_progress(event):
+            self.run_log.write_event("progress", **event)
+
+        progress = get_bus()
+        progress.subscribe(_on_progress)
+        results = {}
+        completed = set()
+        step_events = self._iter_steps(steps, plan.max_workers)
+        aborted = True
+        try:
+            for step, step_result, ok in step_events:
                 results[step] = step_result
-                # Log errore subito
-                self._write_step_log(step, step_result)
+                if ok:
+                    completed.add(step)
+                mitre_observed = self._observed(steps, completed)
+                yield {
+                    "event": "step",
+                    "step": step,
+                    "result": step_result,
+                    "completed": len(results),
+                    "total": len(steps),
+                    "mitre_observed": mitre_observed,
+                    "risk_score": calculate_risk(mitre_observed, results)
+                }
+            aborted = False
+        finally:
+            step_events.close()
+            progress.unsubscribe(_on_progress)
+            scheduler.release()
+            if aborted:
+                self.run_log.write_event("run_aborted", completed=sorted(results))
+                self.run_log.close()
+
+        # Risultati nell'ordine del workflow
+        results = {s.id: results[s.id] for s in steps}
+
+        # MITRE mapping (ordine del workflow)
+        mitre_observed = self._observed(steps, completed)
 
         # Calcolo rischio
         risk_score = calculate_risk(mitre_observed, results)
 
-        # Generazione report
-        report = generate_report(self.context, results, mitre_observed, risk_score)
+        # Rischio per host / classe di asset (matrice host × tecnica)
+        host_risk = HostRiskModel.from_results(
+            results,
+            {s.id: s.techniques for s in steps if s.id in completed},
+            self.context
+        ).score()
+
+        self.run_log.write_event(
+            "run_end",
+            mitre_observed=mitre_observed,
+            risk_score=risk_score,
+            host_risk={"classes": host_risk["classes"], "overall": host_risk["overall"]},
+            artifacts=self.artifacts.stats
+        )
+        self.run_log.close()
+
+        # Retention degli artefatti dei run precedenti
+        removed = prune_runs(self.log_folder, self.keep_artifacts, current=self.artifacts.directory)
+        if removed:
+            print(f"[*] Artefatti di {len(removed)} run precedenti rimossi (conservati gli ultimi {self.keep_artifacts})")
+
+        # Storico rischio (append-only) per i trend tra assessment
+        if self.history_path:
+            try:
+                get_history(self.history_path).record(
+                    self.context.name, self.run_id, risk_score,
+                    techniques=mitre_observed,
+                    workflow=plan.name,
+                    host_score=host_risk["overall"]["score"]
+                )
+            except SQLAlchemyError as e:
+                print(f"[WARN] Storico rischio non aggiornato: {e}")
 
         # Informazioni extra dai metodi helper del Context
         summary_info = {
@@ -127,10 +289,63 @@ class Orchestrator:
             "pos_list": self.context.pos_list()
         }
 
-        return {
-            "results": results,
-            "mitre_observed": mitre_observed,
-            "risk_score": risk_score,
-            "report": report,
-            "summary_info": summary_info
+        yield {
+            "event": "run_end",
+            "output": {
+                "results": results,
+                "mitre_observed": mitre_observed,
+                "risk_score": risk_score,
+                "host_risk": host_risk,
+                "summary_info": summary_info
+            }
         }
+
+    async def arun_iter(self, workflow):
+        """
+        Variante async di run_iter per dashboard/wrapper asyncio: gli step
+        girano in un thread, gli eventi arrivano sull'event loop del chiamante.
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        stop = threading.Event()
+        end = object()
+
+        def _produce():
+            iterator = self.run_iter(workflow)
+            try:
+                for event in iterator:
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+                    if stop.is_set():
+                        break
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait, e)
+            finally:
+                iterator.close()
+                loop.call_soon_threadsafe(events.put_nowait, end)
+
+        producer = loop.run_in_executor(None, _produce)
+        try:
+            while True:
+                event = await events.get()
+                if event is end:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            stop.set()
+            await producer
+
+    def run(self, workflow: dict) -> dict:
+        """
+        Esegue il workflow e scrive i log live.
+        Gli step indipendenti (hint depends_on / parallel nel YAML)
+        vengono eseguiti in parallelo, fino a max_workers alla volta.
+
+        :param workflow: ExecutionPlan, workflow compilato (core.plan) o dict YAML
+        :return: dict con risultati, MITRE osservato, risk score e rischio per host
+                 (il report è scritto a parte da core.report_engine.write_reports)
+        """
+        for event in self.run_iter(workflow):
+            if event["event"] == "run_end":
+                return event["output"]
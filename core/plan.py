@@ -0,0 +1,185 @@
+"""
+Piani di esecuzione
+Un workflow YAML viene compilato una volta (validazione, grafo delle
+dipendenze, metadati dal registry) e il risultato viene messo in cache
+su disco con chiave hash del file + manifest degli step.
+Il workflow compilato viene poi legato al Context del cliente in un
+ExecutionPlan immutabile: target per step, tecniche/tattiche MITRE,
+callable risolti e step saltati per asset mancanti (nessun processo
+avviato per step che fallirebbero comunque).
+"""
+import hashlib
+from collections import namedtuple
+from core.cache import ResultCache, DEFAULT_MAX_BYTES
+from core.registry import get_registry, sources_fingerprint
+from core.workflow import normalize_steps, max_workers
+
+PLAN_CACHE_DIR = ".cache/plans"
+PLAN_CACHE_TTL = 30 * 24 * 3600
+PLAN_VERSION = 2
+
+# Asset richiesti da ciascuno step: helper del Context che devono restituire
+# un valore non vuoto, altrimenti lo step viene saltato
+PREREQUISITES = {
+    "network.network.discovery": ["network_ranges"],
+    "network.network.reassessment": ["network_ranges"],
+    "exploits.exploits.metasploit_check": ["network_gateways"],
+    "web.web.web_enum": ["web_domains"],
+    "web.web.tls_enum": ["web_domains"],
+    "pos.pos.pos_enum": ["pos_list"],
+    "pos.pos.pos_validation": ["pos_list"],
+}
+
+
+class PlannedStep(namedtuple("PlannedStep", [
+    "id", "depends_on", "module", "function", "tools",
+    "techniques", "tactics", "targets", "skip", "cacheable"
+], defaults=(True,))):
+    """
+    Step di un ExecutionPlan. skip è None oppure il motivo dell'esclusione;
+    cacheable è False per gli step con stato (UNCACHEABLE_STEPS nel modulo).
+    """
+    __slots__ = ()
+
+    @property
+    def func(self):
+        """Callable dello step (import del modulo alla prima richiesta)."""
+        return get_registry().resolve(self.id)
+
+    @property
+    def runnable(self):
+        return self.skip is None
+
+
+ExecutionPlan = namedtuple("ExecutionPlan", [
+    "name", "source", "mitre_scope", "max_workers", "steps"
+])
+
+
+def compile_workflow(workflow, source=None):
+    """
+    Compila un workflow (dict YAML) indipendentemente dal cliente.
+
+    :raise ValueError: step sconosciuti o grafo delle dipendenze non valido
+    :return: dict serializzabile (cacheabile e passabile ai worker del batch)
+    """
+    registry = get_registry()
+    errors, _ = registry.validate(workflow, check_tools=False)
+    if errors:
+        raise ValueError("Workflow non valido: " + "; ".join(errors))
+
+    steps = []
+    for step in normalize_steps(workflow):
+        entry = registry.get(step["id"])
+        steps.append({
+            "id": step["id"],
+            "depends_on": step["depends_on"],
+            "module": entry["module"],
+            "function": entry["function"],
+            "tools": entry["tools"],
+            "cacheable": entry.get("cacheable", True),
+            "techniques": entry["mitre"]["techniques"],
+            "tactics": entry["mitre"]["tactics"],
+            "requires": PREREQUISITES.get(step["id"], [])
+        })
+
+    return {
+        "plan_version": PLAN_VERSION,
+        "name": workflow.get("name"),
+        "source": source,
+        "mitre_scope": workflow.get("mitre_scope", []),
+        "max_workers": max_workers(workflow),
+        "steps": steps
+    }
+
+
+def _plan_cache():
+    return ResultCache(PLAN_CACHE_DIR, ttl=PLAN_CACHE_TTL, max_bytes=DEFAULT_MAX_BYTES)
+
+
+def load_workflow(path):
+    """
+    Workflow compilato da file, dalla cache se il file (e il manifest
+    degli step) non sono cambiati dall'ultima compilazione.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+
+    cache = _plan_cache()
+    key = cache.make_key("plan", {
+        "workflow": hashlib.sha256(content).hexdigest(),
+        "steps": sources_fingerprint(),
+        "version": PLAN_VERSION
+    })
+    compiled = cache.get(key)
+    if compiled is None:
+        import yaml
+        compiled = compile_workflow(yaml.safe_load(content) or {}, source=path)
+        cache.set(key, compiled)
+    return compiled
+
+
+def _values(value):
+    """Target leggibili da un valore di asset (stringhe o dict con ip/name)."""
+    if isinstance(value, dict):
+        target = value.get("ip") or value.get("name")
+        return [str(target)] if target else []
+    if isinstance(value, (list, tuple)):
+        return [t for item in value if item for t in _values(item)]
+    return [str(value)] if value else []
+
+
+def build_plan(compiled, context):
+    """
+    Lega un workflow compilato al contesto del cliente.
+
+    :return: ExecutionPlan (immutabile)
+    """
+    excluded = context.excluded_targets()
+
+    steps = []
+    for step in compiled["steps"]:
+        targets, missing = [], []
+        for helper in step["requires"]:
+            values = _values(getattr(context, helper)())
+            if not values:
+                missing.append(helper)
+            targets.extend(v for v in values if v not in excluded)
+
+        skip = None
+        if missing:
+            skip = "Asset mancanti: " + ", ".join(missing)
+        elif step["requires"] and not targets:
+            skip = "Tutti i target sono in excluded_assets"
+
+        steps.append(PlannedStep(
+            id=step["id"],
+            depends_on=tuple(step["depends_on"]),
+            module=step["module"],
+            function=step["function"],
+            tools=tuple(step["tools"]),
+            techniques=tuple(step["techniques"]),
+            tactics=tuple(step["tactics"]),
+            targets=tuple(targets),
+            skip=skip,
+            cacheable=step["cacheable"]
+        ))
+
+    return ExecutionPlan(
+        name=compiled["name"],
+        source=compiled["source"],
+        mitre_scope=tuple(compiled["mitre_scope"]),
+        max_workers=compiled["max_workers"],
+        steps=tuple(steps)
+    )
+
+
+def as_plan(workflow, context):
+    """
+    Accetta un ExecutionPlan, un workflow compilato o un workflow YAML (dict).
+    """
+    if isinstance(workflow, ExecutionPlan):
+        return workflow
+    if workflow.get("plan_version") != PLAN_VERSION:
+        workflow = compile_workflow(workflow)
+    return build_plan(workflow, context)
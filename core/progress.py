@@ -0,0 +1,161 @@
+"""
+Progress delle scansioni
+Parsing delle statistiche di nmap (--stats-every) e bus di eventi
+che l'orchestrator può aggregare tra più scansioni concorrenti.
+"""
+import itertools
+import re
+import threading
+import time
+
+# Intervallo statistiche passato a nmap
+STATS_EVERY = "5s"
+
+# XML (-oX -): <taskprogress task="SYN Stealth Scan" percent="45.50" remaining="6" etc="..."/>
+_XML_PROGRESS = re.compile(
+    r'<taskprogress\s+task="(?P<task>[^"]*)".*?percent="(?P<percent>[\d.]+)"'
+    r'(?:.*?remaining="(?P<remaining>\d+)")?(?:.*?etc="(?P<etc>\d+)")?'
+)
+# Output normale: "SYN Stealth Scan Timing: About 45.50% done; ETC: 14:32 (0:00:06 remaining)"
+_TEXT_PROGRESS = re.compile(
+    r"^(?P<task>.+?) Timing: About (?P<percent>[\d.]+)% done"
+    r"(?:; ETC: (?P<etc>\d+:\d+) \((?P<remaining>\d+:\d+:\d+) remaining\))?"
+)
+_TASK_END = re.compile(r'<taskend\s+task="(?P<task>[^"]*)"|^Completed (?P<text>.+?) at ')
+
+
+def stats_args():
+    """Argomenti nmap per ottenere statistiche periodiche."""
+    return ["--stats-every", STATS_EVERY]
+
+
+def _seconds(hms):
+    h, m, s = (int(x) for x in hms.split(":"))
+    return h * 3600 + m * 60 + s
+
+
+def parse_progress(line):
+    """
+    Estrae il progresso da una riga di output nmap (XML o testo).
+
+    :return: dict {"task", "percent", "remaining", "etc"} oppure None
+    """
+    match = _XML_PROGRESS.search(line)
+    if match:
+        remaining = match.group("remaining")
+        etc = match.group("etc")
+        return {
+            "task": match.group("task"),
+            "percent": float(match.group("percent")),
+            "remaining": int(remaining) if remaining else None,
+            "etc": time.strftime("%H:%M", time.localtime(int(etc))) if etc else None
+        }
+
+    match = _TEXT_PROGRESS.search(line.strip())
+    if match:
+        remaining = match.group("remaining")
+        return {
+            "task": match.group("task"),
+            "percent": float(match.group("percent")),
+            "remaining": _seconds(remaining) if remaining else None,
+            "etc": match.group("etc")
+        }
+
+    match = _TASK_END.search(line.strip())
+    if match:
+        return {
+            "task": match.group("task") or match.group("text"),
+            "percent": 100.0,
+            "remaining": 0,
+            "etc": None
+        }
+    return None
+
+
+class ProgressBus:
+    """
+    Raccoglie gli eventi di progresso di tutte le scansioni in corso
+    e li inoltra ai subscriber (barre tqdm, orchestrator, dashboard).
+    Evento: {"id", "description", "task", "percent", "remaining", "etc", "done"}
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._state = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def new_id(self):
+        return next(self._ids)
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, event):
+        with self._lock:
+            if event.get("done"):
+                self._state.pop(event["id"], None)
+            else:
+                self._state[event["id"]] = event
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception:
+                pass
+
+    def snapshot(self):
+        """Ultimo evento di ciascuna scansione ancora attiva."""
+        with self._lock:
+            return dict(self._state)
+
+    def overall(self):
+        """Percentuale media delle scansioni attive (None se nessuna)."""
+        state = self.snapshot()
+        if not state:
+            return None
+        return sum(e["percent"] for e in state.values()) / len(state)
+
+
+class ProgressTracker:
+    """
+    Traccia una singola scansione: da usare come callback on_line dell'executor.
+    """
+
+    def __init__(self, description, bus=None, on_update=None):
+        self.bus = bus or get_bus()
+        self.id = self.bus.new_id()
+        self.description = description
+        self.on_update = on_update
+        self.last = {"task": None, "percent": 0.0, "remaining": None, "etc": None}
+
+    def __call__(self, line):
+        progress = parse_progress(line)
+        if progress is None:
+            return
+        self.last = progress
+        self._emit(done=False)
+
+    def finish(self):
+        self.last = dict(self.last, percent=100.0, remaining=0)
+        self._emit(done=True)
+
+    def _emit(self, done):
+        event = {"id": self.id, "description": self.description, "done": done, **self.last}
+        if self.on_update is not None:
+            self.on_update(event)
+        self.bus.publish(event)
+
+
+_bus = ProgressBus()
+
+
+def get_bus():
+    """Restituisce il bus di progresso condiviso dal processo."""
+    return _bus
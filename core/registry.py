@@ -0,0 +1,274 @@
+"""
+Registry degli step
+Mappa gli step ID dei workflow (es. "network.network.discovery") su
+modulo/funzione, metadati MITRE e tool esterni richiesti, a partire da
+un manifest precalcolato (core/step_manifest.json).
+  - i moduli vengono importati solo alla prima esecuzione dello step
+  - validazione dei workflow prima di avviare qualsiasi scansione
+  - il manifest si rigenera con: python -m core.registry
+
+Gli step con stato (baseline, finding che cambiano nel tempo) si dichiarano
+nel proprio modulo con UNCACHEABLE_STEPS = ("nome_funzione", ...): il loro
+risultato non viene mai riusato dalla cache degli step.
+
+Il manifest contiene l'hash dei sorgenti da cui è stato generato: se un
+file in modules/ cambia viene ricostruito al volo (analisi statica, nessun import).
+"""
+import ast
+import difflib
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES_DIR = os.path.join(ROOT, "modules")
+MANIFEST_PATH = os.path.join(ROOT, "core", "step_manifest.json")
+
+# Eseguibili esterni rilevati negli argv dei moduli
+KNOWN_TOOLS = {"nmap", "ping", "docker", "traceroute", "powershell"}
+# Costante di modulo con gli step da non mettere in cache
+UNCACHEABLE_NAME = "UNCACHEABLE_STEPS"
+
+
+class UnknownStepError(KeyError):
+    """Step ID non presente nel registry."""
+
+
+# =========================
+# Costruzione del manifest (analisi statica)
+# =========================
+def _module_files():
+    for package in sorted(os.listdir(MODULES_DIR)):
+        folder = os.path.join(MODULES_DIR, package)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".py") and name != "__init__.py":
+                yield f"{package}.{name[:-3]}", os.path.join(folder, name)
+
+
+def _analyse(path):
+    """
+    Funzioni top-level di un file: argomenti, docstring, tool usati
+    direttamente, funzioni chiamate (risolte sugli import del modulo)
+    e cacheabilità (UNCACHEABLE_STEPS).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    imports = {}
+    uncacheable = set()
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module and node.module.startswith("modules."):
+            for alias in node.names:
+                imports[alias.asname or alias.name] = f"{node.module[len('modules.'):]}.{alias.name}"
+        elif isinstance(node, ast.Assign) and any(
+                isinstance(t, ast.Name) and t.id == UNCACHEABLE_NAME for t in node.targets):
+            uncacheable.update(ast.literal_eval(node.value))
+
+    functions = {}
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        tools, calls = set(), set()
+        for child in ast.walk(node):
+            if isinstance(child, ast.List) and child.elts:
+                first = child.elts[0]
+                if isinstance(first, ast.Constant) and first.value in KNOWN_TOOLS:
+                    tools.add(first.value)
+            elif isinstance(child, ast.Call):
+                func = child.func
+                if isinstance(func, ast.Name):
+                    calls.add(imports.get(func.id, func.id))
+                elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+                    target = imports.get(func.value.id)
+                    if target:
+                        calls.add(f"{target}.{func.attr}")
+        functions[node.name] = {
+            "args": [a.arg for a in node.args.args],
+            "doc": ast.get_docstring(node) or "",
+            "tools": tools,
+            "calls": calls,
+            "cacheable": node.name not in uncacheable
+        }
+    return functions
+
+
+def build_manifest():
+    """
+    Ricostruisce il manifest analizzando i sorgenti di modules/.
+    Step = funzione pubblica top-level con unico argomento "context".
+
+    :return: dict {step_id: {"module", "function", "summary", "tools", "cacheable", "mitre"}}
+    """
+    from core.mitre_mapping import MITRE_MAPPING
+
+    graph = {}
+    candidates = []
+    for module, path in _module_files():
+        for name, info in _analyse(path).items():
+            qualified = f"{module}.{name}"
+            # Chiamate interne al modulo → nome qualificato
+            info["calls"] = {c if "." in c else f"{module}.{c}" for c in info["calls"]}
+            graph[qualified] = info
+            if not name.startswith("_") and info["args"] == ["context"]:
+                candidates.append((module, name))
+
+    def _tools(qualified, seen):
+        if qualified in seen or qualified not in graph:
+            return set()
+        seen.add(qualified)
+        tools = set(graph[qualified]["tools"])
+        for call in graph[qualified]["calls"]:
+            tools |= _tools(call, seen)
+        return tools
+
+    manifest = {}
+    for module, name in candidates:
+        step = f"{module}.{name}"
+        doc_lines = [l.strip() for l in graph[step]["doc"].splitlines() if l.strip()]
+        # La prima riga della docstring è spesso lo step stesso
+        summary = next((l for l in doc_lines if not step.endswith(l)), "")
+        mitre = MITRE_MAPPING.get(step, {})
+        manifest[step] = {
+            "module": f"modules.{module}",
+            "function": name,
+            "summary": summary,
+            "tools": sorted(_tools(step, set())),
+            "cacheable": graph[step]["cacheable"],
+            "mitre": {
+                "tactics": mitre.get("tactics", []),
+                "techniques": mitre.get("techniques", [])
+            }
+        }
+    return manifest
+
+
+def sources_fingerprint():
+    """Hash dei sorgenti da cui dipende il manifest."""
+    digest = hashlib.sha256()
+    sources = [p for _, p in _module_files()]
+    sources.append(os.path.join(ROOT, "core", "mitre_mapping.py"))
+    for path in sources:
+        digest.update(os.path.relpath(path, ROOT).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def write_manifest(path=MANIFEST_PATH):
+    steps = build_manifest()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": sources_fingerprint(), "steps": steps},
+                  f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    return steps
+
+
+# =========================
+# Registry
+# =========================
+class StepRegistry:
+    """
+    Step disponibili e risoluzione lazy dei callable.
+    """
+
+    def __init__(self, manifest=None):
+        self.manifest = manifest if manifest is not None else self._load()
+        self._callables = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load():
+        try:
+            with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("fingerprint") != sources_fingerprint():
+            return build_manifest()
+        return data["steps"]
+
+    def steps(self):
+        return sorted(self.manifest)
+
+    def suggest(self, step_id):
+        return difflib.get_close_matches(step_id, self.manifest, n=3, cutoff=0.6)
+
+    def get(self, step_id):
+        """
+        :raise UnknownStepError: con eventuali suggerimenti nel messaggio
+        """
+        try:
+            return self.manifest[step_id]
+        except KeyError:
+            hint = self.suggest(step_id)
+            message = f"Step sconosciuto: {step_id}"
+            if hint:
+                message += f" (forse: {', '.join(hint)})"
+            raise UnknownStepError(message) from None
+
+    def resolve(self, step_id):
+        """Callable dello step; il modulo viene importato solo la prima volta."""
+        func = self._callables.get(step_id)
+        if func is not None:
+            return func
+        entry = self.get(step_id)
+        with self._lock:
+            if step_id not in self._callables:
+                module = importlib.import_module(entry["module"])
+                self._callables[step_id] = getattr(module, entry["function"])
+            return self._callables[step_id]
+
+    def missing_tools(self, step_id):
+        return [t for t in self.get(step_id)["tools"] if shutil.which(t) is None]
+
+    def validate(self, workflow, check_tools=True):
+        """
+        Verifica un workflow senza eseguire nulla.
+
+        :return: (errors, warnings) come liste di stringhe
+        """
+        from core.workflow import normalize_steps
+
+        errors, warnings = [], []
+        try:
+            steps = normalize_steps(workflow)
+        except ValueError as e:
+            return [str(e)], warnings
+
+        if not steps:
+            errors.append("Workflow senza step")
+        for step in steps:
+            try:
+                self.get(step["id"])
+            except UnknownStepError as e:
+                errors.append(e.args[0])
+                continue
+            if check_tools:
+                for tool in self.missing_tools(step["id"]):
+                    warnings.append(f"{step['id']}: tool non trovato nel PATH: {tool}")
+            if not self.manifest[step["id"]]["mitre"]["techniques"]:
+                warnings.append(f"{step['id']}: nessun mapping MITRE")
+        return errors, warnings
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Restituisce il registry condiviso dal processo (caricato al primo uso)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = StepRegistry()
+        return _registry
+
+
+if __name__ == "__main__":
+    steps = write_manifest()
+    print(f"[+] {len(steps)} step scritti in {MANIFEST_PATH}")
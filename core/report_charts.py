@@ -0,0 +1,210 @@
+"""
+Grafici del report PDF (matplotlib)
+I grafici vengono disegnati in un processo separato (la CLI continua
+a stampare i risultati) e messi in cache come PNG con chiave hash dei
+dati del grafico: report successivi con gli stessi dati (es. batch di
+clienti con lo stesso profilo) non ridisegnano nulla.
+Il pool viene chiuso dopo la scrittura dei report (e comunque all'uscita).
+"""
+import atexit
+import io
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from core.cache import ResultCache, DEFAULT_MAX_BYTES
+from core.risk_engine import RISK_LEVELS
+
+CHART_CACHE_DIR = ".cache/charts"
+CHART_CACHE_TTL = 30 * 24 * 3600
+CHART_VERSION = 1
+CHART_DPI = 150
+TOP_HOSTS = 15
+
+LEVEL_COLORS = {
+    "NONE": "#9e9e9e",
+    "LOW": "#4caf50",
+    "MEDIUM": "#ffb300",
+    "HIGH": "#f4511e",
+    "CRITICAL": "#b71c1c"
+}
+
+
+def chart_data(output):
+    """
+    Dati dei grafici di un assessment (solo ciò che il grafico disegna,
+    così la chiave di cache non dipende da raw, timestamp, ...).
+
+    :return: dict {nome: (tipo, dati)} - solo i grafici con dati
+    """
+    charts = {}
+    risk = output["risk_score"]
+    charts["risk_gauge"] = ("gauge", {"score": risk["score"], "level": risk["level"]})
+
+    breakdown = risk.get("breakdown") or {}
+    if breakdown:
+        tactics = sorted(breakdown, key=lambda t: (-breakdown[t], t))
+        charts["tactics"] = ("barh", {
+            "title": "Tecniche osservate per tattica ATT&CK",
+            "labels": tactics,
+            "values": [breakdown[t] for t in tactics]
+        })
+
+    host_risk = output.get("host_risk") or {}
+    hosts = [h for h in host_risk.get("hosts", []) if h["score"] > 0][:TOP_HOSTS]
+    if hosts:
+        charts["hosts"] = ("barh", {
+            "title": f"Host a rischio più alto (top {TOP_HOSTS})",
+            "labels": [h["host"] for h in hosts],
+            "values": [h["score"] for h in hosts],
+            "levels": [h["level"] for h in hosts]
+        })
+    return charts
+
+
+# =========================
+# Disegno (processo worker)
+# =========================
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _gauge(plt, data):
+    fig, ax = plt.subplots(figsize=(6, 1.4))
+    bounds = [threshold for threshold, _ in RISK_LEVELS[1:]] + [100]
+    start = 0
+    for (_, level), end in zip(RISK_LEVELS, bounds):
+        ax.barh(0, end - start, left=start, color=LEVEL_COLORS.get(level), alpha=0.35, height=0.6)
+        start = end
+    ax.barh(0, data["score"], color=LEVEL_COLORS.get(data["level"]), height=0.3)
+    ax.set_xlim(0, 100)
+    ax.set_yticks([])
+    ax.set_title(f"Risk score {data['score']} - {data['level']}", fontsize=10)
+    return fig
+
+
+def _barh(plt, data):
+    labels = data["labels"]
+    fig, ax = plt.subplots(figsize=(6, max(1.5, 0.32 * len(labels) + 0.8)))
+    colors = [LEVEL_COLORS.get(level, "#1565c0") for level in data.get("levels") or []] or "#1565c0"
+    ax.barh(range(len(labels)), data["values"], color=colors)
+    ax.set_yticks(range(len(labels)))
+    ax.set_yticklabels(labels, fontsize=8)
+    ax.invert_yaxis()
+    if all(isinstance(v, int) for v in data["values"]):
+        from matplotlib.ticker import MaxNLocator
+        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+    ax.set_title(data["title"], fontsize=10)
+    ax.spines[["top", "right"]].set_visible(False)
+    return fig
+
+
+CHART_KINDS = {
+    "gauge": _gauge,
+    "barh": _barh
+}
+
+
+def render_chart(kind, data):
+    """Disegna un grafico e restituisce il PNG (eseguita nel worker)."""
+    plt = _pyplot()
+    fig = CHART_KINDS[kind](plt, data)
+    try:
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=CHART_DPI)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+# =========================
+# Renderer con cache
+# =========================
+class ChartRenderer:
+    """
+    Rendering asincrono dei grafici: cache hit → Future già completato,
+    altrimenti il grafico viene disegnato nel processo worker.
+    """
+
+    def __init__(self, workers=1, cache_dir=CHART_CACHE_DIR):
+        """
+        :param workers: processi di rendering (0 = nel processo chiamante,
+                        es. worker del batch mode)
+        """
+        self.workers = workers
+        self.cache = ResultCache(cache_dir, ttl=CHART_CACHE_TTL, max_bytes=DEFAULT_MAX_BYTES)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def submit(self, kind, data):
+        """:return: Future con il PNG del grafico"""
+        key = self.cache.make_key("chart", {"kind": kind, "data": data, "version": CHART_VERSION})
+        png = self.cache.get(key)
+        if png is not None or not self.workers:
+            future = Future()
+            try:
+                if png is None:
+                    png = render_chart(kind, data)
+                    self.cache.set(key, png)
+                future.set_result(png)
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        future = self._get_pool().submit(render_chart, kind, data)
+
+        def _store(f):
+            if not f.cancelled() and f.exception() is None:
+                self.cache.set(key, f.result())
+
+        future.add_done_callback(_store)
+        return future
+
+    def render_all(self, output):
+        """Avvia il rendering di tutti i grafici dell'assessment: {nome: Future}"""
+        return {name: self.submit(kind, data) for name, (kind, data) in chart_data(output).items()}
+
+    def shutdown(self):
+        """Chiude il pool: i grafici non ancora avviati vengono annullati."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_chart_renderer():
+    """Restituisce il ChartRenderer condiviso dal processo."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer()
+        return _renderer
+
+
+def configure(workers=1, cache_dir=CHART_CACHE_DIR):
+    """Riconfigura il renderer condiviso (batch mode: workers=0)."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is not None:
+            _renderer.shutdown()
+        _renderer = ChartRenderer(workers, cache_dir)
+        return _renderer
+
+
+@atexit.register
+def _shutdown():
+    """Chiude il pool del renderer condiviso all'uscita del processo."""
+    if _renderer is not None:
+        _renderer.shutdown()
@@ -1,11 +1,425 @@
+"""
+Report Engine
+Renderer in streaming (Markdown, HTML, JSON): il report viene scritto
+direttamente sul file handle, step per step, con template precompilati.
+Gli output raw non vengono incorporati per intero: il report ne contiene
+un'anteprima troncata e un link all'artefatto completo, scritto accanto
+al report (anche i blob dell'ArtifactStore vengono decompressi lì, così
+il report non dipende dai log). I raw sotto la soglia dello store restano
+interamente nel report.
+"""
+import abc
+import html
+import io
+import json
+import os
+import re
+from datetime import datetime
+from string import Template
+from core.artifacts import SPILL_THRESHOLD, as_ref, is_artifact
+
+FORMATS = ("md", "html", "json", "pdf")
+RAW_PREVIEW_CHARS = 2000
+MAX_HOST_ROWS = 1000
+CHUNK_CHARS = 64 * 1024
+
+_encoder = json.JSONEncoder(indent=2, ensure_ascii=False, default=str)
+_compact = json.JSONEncoder(ensure_ascii=False, default=str)
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", "_", str(name).lower()).strip("_") or "step"
+
+
+class _Preview:
+    """Accumula al massimo `limit` caratteri di uno stream di chunk."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.truncated = False
+
+    def write(self, chunk):
+        if self.size >= self.limit:
+            self.truncated = True
+            return
+        room = self.limit - self.size
+        if len(chunk) > room:
+            chunk = chunk[:room]
+            self.truncated = True
+        self.parts.append(chunk)
+        self.size += len(chunk)
+
+    def text(self):
+        return "".join(self.parts)
+
+
+def _chunks(raw):
+    """Serializzazione incrementale di un raw (str/bytes/dict/list/ArtifactRef)."""
+    if is_artifact(raw):
+        yield from as_ref(raw).chunks(CHUNK_CHARS)
+        return
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="replace")
+    if isinstance(raw, str):
+        for start in range(0, len(raw), CHUNK_CHARS):
+            yield raw[start:start + CHUNK_CHARS]
+        return
+    yield from _encoder.iterencode(raw)
+
+
+def export_raw(raw, limit=RAW_PREVIEW_CHARS, artifact_path=None, threshold=SPILL_THRESHOLD):
+    """
+    Anteprima del raw e, se indicato, artefatto completo su disco.
+    Con artifact_path:
+      - raw sotto `threshold` caratteri: interamente nell'anteprima, nessun file
+      - altrimenti scritto a chunk (senza costruire la stringa intera); un
+        ArtifactRef viene decompresso dallo store
+
+    :return: (anteprima, troncato, path dell'artefatto o None)
+    """
+    if is_artifact(raw) and not os.path.exists(raw["path"]):
+        return f"[artefatto non disponibile: {raw['path']}]", False, None
+    preview = _Preview(limit)
+    if artifact_path is None:
+        for chunk in _chunks(raw):
+            preview.write(chunk)
+            if preview.truncated:
+                break
+        return preview.text(), preview.truncated, None
+
+    chunks = _chunks(raw)
+    head, size = [], 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= threshold:
+            break
+    else:
+        return "".join(head), False, None
+
+    os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+    with open(artifact_path, "w", encoding="utf-8") as f:
+        for chunk in (*head, *chunks):
+            f.write(chunk)
+            preview.write(chunk)
+    return preview.text(), preview.truncated, artifact_path
+
+
+class ReportRenderer(abc.ABC):
+    """
+    Renderer base: sequenza fissa di sezioni scritte in streaming.
+    """
+    extension = None
+
+    def __init__(self, fh, artifacts_dir=None, raw_limit=RAW_PREVIEW_CHARS, artifacts=None):
+        """
+        :param artifacts: dict {step: link} condiviso tra renderer dello
+                          stesso run, per scrivere ogni artefatto una sola volta
+        """
+        self.fh = fh
+        self.artifacts_dir = artifacts_dir
+        self.raw_limit = raw_limit
+        self.artifacts = artifacts if artifacts is not None else {}
+
+    def _raw(self, step, raw):
+        if not self.artifacts_dir:
+            return export_raw(raw, self.raw_limit)
+        if step in self.artifacts:
+            link = self.artifacts[step]
+            # Senza artefatto il raw è sotto soglia: completo nel report
+            preview, truncated, _ = export_raw(raw, self.raw_limit if link else SPILL_THRESHOLD)
+            return preview, truncated, link
+
+        if is_artifact(raw):
+            ext = "json" if raw["format"] == "json" else "txt"
+        else:
+            ext = "txt" if isinstance(raw, (str, bytes)) else "json"
+        path = os.path.join(self.artifacts_dir, f"{_slug(step)}.{ext}")
+        preview, truncated, path = export_raw(raw, self.raw_limit, path)
+        link = None
+        if path is not None:
+            link = os.path.relpath(path, os.path.dirname(self.artifacts_dir)).replace(os.sep, "/")
+        self.artifacts[step] = link
+        return preview, truncated, link
+
+    def render(self, context, output, generated=None):
+        generated = generated or datetime.now()
+        self.begin(context, output, generated)
+        for step, result in output["results"].items():
+            self.step(step, result)
+        self.mitre(output.get("mitre_observed", []))
+        self.risk(output["risk_score"], output.get("host_risk"))
+        self.end()
+
+    @abc.abstractmethod
+    def begin(self, context, output, generated):
+        ...
+
+    @abc.abstractmethod
+    def step(self, step, result):
+        ...
+
+    @abc.abstractmethod
+    def mitre(self, techniques):
+        ...
+
+    @abc.abstractmethod
+    def risk(self, risk_score, host_risk):
+        ...
+
+    def end(self):
+        pass
+
+
+# =========================
+# Markdown
+# =========================
+_MD_HEADER = Template(
+    "# Cybersecurity Assessment Report - $client\n\n"
+    "- Categoria: $category\n"
+    "- Generato: $generated\n\n"
+    "## Findings\n\n"
+)
+_MD_STEP = Template("### $step\n\n- Status: **$status**\n- Summary: $summary\n\n")
+_MD_RAW = Template("```\n$preview\n```\n$note\n")
+_MD_RISK = Template("## Risk Summary\n\n- Score: **$score**\n- Level: **$level**\n\n")
+_MD_HOST_ROW = Template("| $host | $asset_class | $criticality | $score | $level | $tactics |\n")
+
+
+class MarkdownRenderer(ReportRenderer):
+    extension = "md"
+
+    def begin(self, context, output, generated):
+        self.fh.write(_MD_HEADER.substitute(
+            client=context.name, category=context.category,
+            generated=generated.isoformat(timespec="seconds")
+        ))
+
+    def step(self, step, result):
+        self.fh.write(_MD_STEP.substitute(
+            step=step, status=result.get("status", "unknown"), summary=result.get("summary", "")
+        ))
+        raw = result.get("raw")
+        if not raw:
+            return
+        preview, truncated, link = self._raw(step, raw)
+        note = ""
+        if truncated:
+            note = "_Output troncato_" + (f" - completo: [{link}]({link})" if link else "")
+        elif link:
+            note = f"Artefatto: [{link}]({link})"
+        self.fh.write(_MD_RAW.substitute(preview=preview.replace("```", "ʼʼʼ"), note=note + "\n"))
+
+    def mitre(self, techniques):
+        self.fh.write("## MITRE Techniques Observed\n\n")
+        self.fh.write(", ".join(techniques) or "-")
+        self.fh.write("\n\n")
+
+    def risk(self, risk_score, host_risk):
+        self.fh.write(_MD_RISK.substitute(score=risk_score["score"], level=risk_score["level"]))
+        if not host_risk or not host_risk["hosts"]:
+            return
+        self.fh.write("### Rischio per host\n\n")
+        self.fh.write("| Host | Classe | Criticità | Score | Livello | Tattiche |\n")
+        self.fh.write("|---|---|---|---|---|---|\n")
+        for row in host_risk["hosts"][:MAX_HOST_ROWS]:
+            self.fh.write(_MD_HOST_ROW.substitute(row, tactics=", ".join(row["tactics"])))
+        hidden = len(host_risk["hosts"]) - MAX_HOST_ROWS
+        if hidden > 0:
+            self.fh.write(f"\n_Altri {hidden} host non mostrati_\n")
+        self.fh.write("\n")
+
+
+# =========================
+# HTML
+# =========================
+_HTML_HEADER = Template(
+    "<!DOCTYPE html>\n<html lang=\"it\"><head><meta charset=\"utf-8\">"
+    "<title>Assessment - $client</title>"
+    "<style>body{font-family:sans-serif;max-width:1100px;margin:auto}"
+    "pre{background:#f4f4f4;padding:8px;overflow:auto;max-height:400px}"
+    "table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:2px 6px}"
+    ".success{color:#2a7}.error{color:#c33}.skipped,.partial{color:#b80}</style>"
+    "</head><body>\n<h1>Cybersecurity Assessment Report - $client</h1>\n"
+    "<p>Categoria: $category<br>Generato: $generated</p>\n<h2>Findings</h2>\n"
+)
+_HTML_STEP = Template(
+    "<section><h3>$step</h3><p>Status: <b class=\"$status\">$status</b><br>Summary: $summary</p>\n"
+)
+_HTML_RAW = Template("<pre>$preview</pre>$note</section>\n")
+_HTML_RISK = Template("<h2>Risk Summary</h2>\n<p>Score: <b>$score</b><br>Level: <b>$level</b></p>\n")
+_HTML_HOST_ROW = Template(
+    "<tr><td>$host</td><td>$asset_class</td><td>$criticality</td>"
+    "<td>$score</td><td>$level</td><td>$tactics</td></tr>\n"
+)
+
+
+def _esc(value):
+    return html.escape(str(value))
+
+
+class HtmlRenderer(ReportRenderer):
+    extension = "html"
+
+    def begin(self, context, output, generated):
+        self.fh.write(_HTML_HEADER.substitute(
+            client=_esc(context.name), category=_esc(context.category),
+            generated=generated.isoformat(timespec="seconds")
+        ))
+
+    def step(self, step, result):
+        self.fh.write(_HTML_STEP.substitute(
+            step=_esc(step), status=_esc(result.get("status", "unknown")),
+            summary=_esc(result.get("summary", ""))
+        ))
+        raw = result.get("raw")
+        if not raw:
+            self.fh.write("</section>\n")
+            return
+        preview, truncated, link = self._raw(step, raw)
+        note = ""
+        if link:
+            label = "Output troncato - completo" if truncated else "Artefatto"
+            note = f"<p>{label}: <a href=\"{_esc(link)}\">{_esc(link)}</a></p>"
+        elif truncated:
+            note = "<p><i>Output troncato</i></p>"
+        self.fh.write(_HTML_RAW.substitute(preview=_esc(preview), note=note))
+
+    def mitre(self, techniques):
+        self.fh.write(f"<h2>MITRE Techniques Observed</h2>\n<p>{_esc(', '.join(techniques) or '-')}</p>\n")
+
+    def risk(self, risk_score, host_risk):
+        self.fh.write(_HTML_RISK.substitute(score=risk_score["score"], level=_esc(risk_score["level"])))
+        if not host_risk or not host_risk["hosts"]:
+            return
+        self.fh.write(
+            "<h3>Rischio per host</h3>\n<table><tr><th>Host</th><th>Classe</th>"
+            "<th>Criticità</th><th>Score</th><th>Livello</th><th>Tattiche</th></tr>\n"
+        )
+        for row in host_risk["hosts"][:MAX_HOST_ROWS]:
+            self.fh.write(_HTML_HOST_ROW.substitute(
+                {k: _esc(v) for k, v in row.items() if k not in ("tactics", "techniques")},
+                tactics=_esc(", ".join(row["tactics"]))
+            ))
+        self.fh.write("</table>\n")
+        hidden = len(host_risk["hosts"]) - MAX_HOST_ROWS
+        if hidden > 0:
+            self.fh.write(f"<p><i>Altri {hidden} host non mostrati</i></p>\n")
+
+    def end(self):
+        self.fh.write("</body></html>\n")
+
+
+# =========================
+# JSON
+# =========================
+class JsonRenderer(ReportRenderer):
+    """
+    Oggetto JSON scritto per campi: i raw diventano
+    {"preview", "truncated", "artifact"}.
+    """
+    extension = "json"
+
+    def _field(self, name, value, first=False):
+        self.fh.write(("" if first else ",\n") + f"  {json.dumps(name)}: ")
+        for chunk in _compact.iterencode(value):
+            self.fh.write(chunk)
+
+    def begin(self, context, output, generated):
+        self.fh.write("{\n")
+        self._field("client", context.name, first=True)
+        self._field("category", context.category)
+        self._field("generated", generated.isoformat(timespec="seconds"))
+        self.fh.write(',\n  "results": {')
+        self._first_step = True
+
+    def step(self, step, result):
+        raw = result.get("raw")
+        entry = {k: v for k, v in result.items() if k != "raw"}
+        if raw:
+            preview, truncated, link = self._raw(step, raw)
+            entry["raw"] = {"preview": preview, "truncated": truncated, "artifact": link}
+        self.fh.write(("" if self._first_step else ",") + f"\n    {json.dumps(step)}: ")
+        for chunk in _compact.iterencode(entry):
+            self.fh.write(chunk)
+        self._first_step = False
+
+    def mitre(self, techniques):
+        self.fh.write("\n  }")
+        self._field("mitre_observed", list(techniques))
+
+    def risk(self, risk_score, host_risk):
+        self._field("risk_score", risk_score)
+        if host_risk is not None:
+            self._field("host_risk", host_risk)
+
+    def end(self):
+        self.fh.write("\n}\n")
+
+
+RENDERERS = {
+    "md": MarkdownRenderer,
+    "html": HtmlRenderer,
+    "json": JsonRenderer
+}
+
+
+def render_report(fh, fmt, context, output, artifacts_dir=None, raw_limit=RAW_PREVIEW_CHARS):
+    """
+    Scrive il report nel formato indicato sul file handle.
+
+    :param output: dict restituito da Orchestrator.run
+    :param artifacts_dir: cartella per gli output raw completi (None = solo anteprima)
+    """
+    if fmt not in RENDERERS:
+        raise ValueError(f"Formato report non supportato: {fmt} ({', '.join(RENDERERS)})")
+    RENDERERS[fmt](fh, artifacts_dir, raw_limit).render(context, output)
+
+
+def write_reports(context, output, directory="reports", formats=("md",), name=None, charts=None, run_log=None):
+    """
+    Scrive il report in uno o più formati; gli artefatti raw completi
+    vengono salvati una sola volta in <directory>/<name>_artifacts/.
+
+    :param charts: grafici del PDF già avviati (ChartRenderer.render_all)
+    :param run_log: RunLog del run, per i grafici del PDF non disponibili
+    :return: dict {formato: path}
+    """
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        raise ValueError(f"Formato report non supportato: {', '.join(unknown)} ({', '.join(FORMATS)})")
+    os.makedirs(directory, exist_ok=True)
+    name = name or f"report_{_slug(context.name)}_{datetime.now():%Y%m%d_%H%M%S}"
+    artifacts_dir = os.path.join(directory, f"{name}_artifacts")
+
+    artifacts = {}
+    paths = {}
+    for fmt in formats:
+        path = os.path.join(directory, f"{name}.{fmt}")
+        paths[fmt] = path
+        if fmt == "pdf":
+            continue
+        with open(path, "w", encoding="utf-8") as fh:
+            RENDERERS[fmt](fh, artifacts_dir, artifacts=artifacts).render(context, output)
+    if "pdf" in paths:
+        # Per ultimo: il PDF cita gli artefatti solo se gli altri formati li hanno scritti.
+        # reportlab/matplotlib caricati solo se serve il PDF
+        from core.report_pdf import write_pdf
+        written = artifacts_dir if any(artifacts.values()) else None
+        write_pdf(paths["pdf"], context, output, charts=charts, run_log=run_log, artifacts_dir=written)
+    return paths
+
+
 def generate_report(client, results, mitre_techniques, risk_score):
-   report = f"Cybersecurity Assessment Report - {client.name}\n"
-   report += f"Category: {client.category}\n\n"
-   report += "Findings:\n"
-   for step, output in results.items():
-       report += f"{step}:\n{output}\n\n"
-   report += "MITRE Techniques Observed:\n"
-   report += ", ".join(mitre_techniques) + "\n\n"
-   report += f"Risk Score: {risk_score['score']}\n"
-   report += f"Risk Level: {risk_score['level']}\n"
-   return report
\ No newline at end of file
+    """
+    Report Markdown in memoria (compatibilità): anteprime troncate, nessun artefatto.
+    """
+    buffer = io.StringIO()
+    MarkdownRenderer(buffer).render(client, {
+        "results": results,
+        "mitre_observed": mitre_techniques,
+        "risk_score": risk_score
+    })
+    return buffer.getvalue()
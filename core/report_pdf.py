@@ -0,0 +1,261 @@
+"""
+Report PDF (reportlab)
+Assemblato da risultati degli step, tecniche MITRE osservate e breakdown
+del rischio; i grafici arrivano da core.report_charts (Future già avviati
+o PNG; quelli non disponibili finiscono nel run log). Font, stili e
+template di pagina vengono preparati una volta per processo e riusati da
+tutti i report (batch mode).
+"""
+import io
+import os
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+from functools import lru_cache
+from core.attack_kb import get_kb
+
+FONT_DIRS = (
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/dejavu",
+    "/Library/Fonts",
+    "C:\\Windows\\Fonts"
+)
+MAX_HOST_ROWS = 50
+CHART_WIDTH_CM = 16
+CHART_TIMEOUT = 120
+
+STATUS_COLORS = {
+    "success": "#2e7d32",
+    "partial": "#ef6c00",
+    "skipped": "#757575",
+    "error": "#c62828"
+}
+
+
+@lru_cache(maxsize=1)
+def _fonts():
+    """
+    Registra DejaVu Sans (accenti e simboli) se disponibile, altrimenti
+    Helvetica. Directory aggiuntiva: variabile REPORT_FONT_DIR.
+    """
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    dirs = [os.environ["REPORT_FONT_DIR"]] if os.environ.get("REPORT_FONT_DIR") else []
+    for directory in [*dirs, *FONT_DIRS]:
+        regular = os.path.join(directory, "DejaVuSans.ttf")
+        bold = os.path.join(directory, "DejaVuSans-Bold.ttf")
+        if os.path.exists(regular) and os.path.exists(bold):
+            pdfmetrics.registerFont(TTFont("ReportSans", regular))
+            pdfmetrics.registerFont(TTFont("ReportSans-Bold", bold))
+            return "ReportSans", "ReportSans-Bold"
+    return "Helvetica", "Helvetica-Bold"
+
+
+@lru_cache(maxsize=1)
+def _styles():
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+
+    regular, bold = _fonts()
+    base = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle("ReportTitle", base["Title"], fontName=bold, fontSize=18),
+        "h2": ParagraphStyle("ReportH2", base["Heading2"], fontName=bold, spaceBefore=12),
+        "body": ParagraphStyle("ReportBody", base["BodyText"], fontName=regular, fontSize=9, leading=12),
+        "cell": ParagraphStyle("ReportCell", base["BodyText"], fontName=regular, fontSize=8, leading=10),
+        "small": ParagraphStyle("ReportSmall", base["BodyText"], fontName=regular, fontSize=7, leading=9)
+    }
+
+
+@lru_cache(maxsize=1)
+def _table_style():
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    regular, bold = _fonts()
+    return TableStyle([
+        ("FONTNAME", (0, 0), (-1, -1), regular),
+        ("FONTNAME", (0, 0), (-1, 0), bold),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#263238")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#eceff1")]),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#b0bec5")),
+        ("VALIGN", (0, 0), (-1, -1), "TOP")
+    ])
+
+
+def _page_decorator(client):
+    """Intestazione e piè di pagina (numero di pagina) di ogni pagina."""
+    from reportlab.lib.units import cm
+
+    regular, _ = _fonts()
+
+    def _decorate(canvas, doc):
+        width, height = doc.pagesize
+        canvas.saveState()
+        canvas.setFont(regular, 7)
+        canvas.drawString(doc.leftMargin, height - 1.2 * cm, f"Cybersecurity Assessment - {client}")
+        canvas.drawRightString(width - doc.rightMargin, 1.0 * cm, f"Pagina {doc.page}")
+        canvas.restoreState()
+
+    return _decorate
+
+
+def _escape(value):
+    from xml.sax.saxutils import escape
+    return escape(str(value))
+
+
+def _table(header, rows, widths):
+    from reportlab.platypus import Paragraph, Table
+
+    cell = _styles()["cell"]
+    data = [header] + [
+        [Paragraph(_escape(v), cell) if isinstance(v, str) and len(v) > 30 else v for v in row]
+        for row in rows
+    ]
+    table = Table(data, colWidths=widths, repeatRows=1)
+    table.setStyle(_table_style())
+    return table
+
+
+def _chart(charts, name, failures):
+    """
+    Immagine di un grafico (attende il Future del renderer).
+
+    :param failures: dict {nome: errore} dei grafici non disponibili
+    """
+    from reportlab.lib.units import cm
+    from reportlab.lib.utils import ImageReader
+    from reportlab.platypus import Image
+
+    chart = charts.get(name)
+    if chart is None:
+        return None
+    try:
+        png = chart.result(timeout=CHART_TIMEOUT) if hasattr(chart, "result") else chart
+    except FutureTimeout:
+        chart.cancel()
+        failures[name] = f"timeout dopo {CHART_TIMEOUT}s"
+    except Exception as e:
+        failures[name] = f"{type(e).__name__}: {e}"
+    if name in failures:
+        print(f"[WARN] Grafico {name} non disponibile: {failures[name]}")
+        return None
+    width, height = ImageReader(io.BytesIO(png)).getSize()
+    target = CHART_WIDTH_CM * cm
+    return Image(io.BytesIO(png), width=target, height=target * height / width)
+
+
+def _story(context, output, charts, generated, failures, artifacts_dir=None):
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles = _styles()
+    kb = get_kb()
+    risk = output["risk_score"]
+    host_risk = output.get("host_risk") or {}
+    story = [
+        Paragraph(f"Cybersecurity Assessment Report<br/>{_escape(context.name)}", styles["title"]),
+        Paragraph(
+            f"Categoria: {_escape(context.category)} - Generato: {generated:%d/%m/%Y %H:%M}",
+            styles["body"]
+        )
+    ]
+
+    # Rischio complessivo
+    story.append(Paragraph("Risk Summary", styles["h2"]))
+    rows = [["Risk score", risk["score"], risk["level"]]]
+    if host_risk.get("overall"):
+        rows.append(["Rischio host (max)", host_risk["overall"]["score"], host_risk["overall"]["level"]])
+    story.append(_table(["", "Score", "Livello"], rows, [6 * cm, 3 * cm, 4 * cm]))
+    story.extend(filter(None, [Spacer(1, 0.3 * cm), _chart(charts, "risk_gauge", failures)]))
+
+    # MITRE ATT&CK
+    story.append(Paragraph("MITRE ATT&amp;CK", styles["h2"]))
+    mitre = output.get("mitre_observed") or []
+    if mitre:
+        story.append(_table(
+            ["Tecnica", "Nome", "Tattiche"],
+            [[t, kb.name(t) or "-", ", ".join(kb.tactics(t)) or "-"] for t in mitre],
+            [2.5 * cm, 7 * cm, 7 * cm]
+        ))
+        story.extend(filter(None, [Spacer(1, 0.3 * cm), _chart(charts, "tactics", failures)]))
+    else:
+        story.append(Paragraph("Nessuna tecnica osservata.", styles["body"]))
+
+    # Rischio per host
+    hosts = host_risk.get("hosts") or []
+    if hosts:
+        story.append(Paragraph("Rischio per host", styles["h2"]))
+        story.append(_table(
+            ["Classe", "Host", "Max", "Media"],
+            [[c, v["hosts"], v["max"], v["mean"]] for c, v in host_risk["classes"].items()],
+            [5 * cm, 3 * cm, 3 * cm, 3 * cm]
+        ))
+        story.extend(filter(None, [Spacer(1, 0.3 * cm), _chart(charts, "hosts", failures)]))
+        story.append(_table(
+            ["Host", "Classe", "Criticità", "Score", "Livello", "Tattiche"],
+            [[h["host"], h["asset_class"], h["criticality"], h["score"], h["level"],
+              ", ".join(h["tactics"]) or "-"] for h in hosts[:MAX_HOST_ROWS]],
+            [3.5 * cm, 2 * cm, 2 * cm, 1.5 * cm, 2 * cm, 5.5 * cm]
+        ))
+        if len(hosts) > MAX_HOST_ROWS:
+            story.append(Paragraph(
+                f"Altri {len(hosts) - MAX_HOST_ROWS} host nei report Markdown/HTML/JSON.", styles["small"]
+            ))
+
+    # Step eseguiti
+    story.append(Paragraph("Findings", styles["h2"]))
+    cell = styles["cell"]
+    rows = []
+    for step, result in output["results"].items():
+        status = result.get("status", "unknown")
+        color = STATUS_COLORS.get(status, "#000000")
+        rows.append([
+            Paragraph(_escape(step), cell),
+            Paragraph(f'<font color="{color}">{_escape(status)}</font>', cell),
+            Paragraph(_escape(result.get("summary", "")), cell)
+        ])
+    story.append(_table(["Step", "Status", "Summary"], rows, [5.5 * cm, 2 * cm, 9 * cm]))
+    if artifacts_dir:
+        story.append(Spacer(1, 0.3 * cm))
+        story.append(Paragraph(
+            "Gli output completi degli step sono negli artefatti del report: "
+            f"{_escape(os.path.basename(artifacts_dir))}/",
+            styles["small"]
+        ))
+    return story
+
+
+def write_pdf(path, context, output, charts=None, run_log=None, artifacts_dir=None):
+    """
+    Scrive il report PDF.
+
+    :param charts: {nome: Future | PNG} da ChartRenderer.render_all;
+                   None = grafici renderizzati qui (cache compresa)
+    :param run_log: RunLog del run: un evento "chart_error" per ogni
+                    grafico non disponibile (timeout o errore di rendering)
+    :param artifacts_dir: cartella degli artefatti scritti dagli altri
+                          formati (None = nessun rimando nel PDF)
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate
+
+    if charts is None:
+        from core.report_charts import get_chart_renderer
+        charts = get_chart_renderer().render_all(output)
+
+    doc = SimpleDocTemplate(
+        path, pagesize=A4, leftMargin=2 * cm, rightMargin=2 * cm,
+        topMargin=2 * cm, bottomMargin=2 * cm,
+        title=f"Cybersecurity Assessment - {context.name}", author="CyberToolkit"
+    )
+    decorate = _page_decorator(context.name)
+    failures = {}
+    doc.build(_story(context, output, charts, datetime.now(), failures, artifacts_dir), onFirstPage=decorate, onLaterPages=decorate)
+    if run_log is not None:
+        for name, error in failures.items():
+            run_log.write_event("chart_error", chart=name, error=error, report=path)
+    return path
@@ -1,14 +1,23 @@
 """
 Risk Engine
 Calcolo del rischio basato su MITRE ATT&CK osservato
+Le tecniche osservate vengono risolte nelle loro tattiche tramite la
+knowledge base ATT&CK (core.attack_kb).
 """
+from core.attack_kb import get_kb
+
 MITRE_TACTIC_WEIGHTS = {
     "Impact": 5,
     "Command and Control": 5,
+    "Exfiltration": 5,
     "Lateral Movement": 4,
     "Execution": 4,
     "Credential Access": 4,
+    "Initial Access": 4,
+    "Privilege Escalation": 4,
     "Defense Evasion": 3,
+    "Persistence": 3,
+    "Collection": 3,
     "Discovery": 2
 }
 RISK_LEVELS = [
@@ -22,16 +31,19 @@ RISK_LEVELS = [
 def calculate_risk(mitre_observed, results=None):
     """
     Calcola risk score e livello
-    :param mitre_observed: lista di tattiche MITRE osservat
+    :param mitre_observed: lista di tecniche MITRE osservate (es. T1046, T1059.001)
     :param results: output degli step (opzionale, futuro uso)
-    :return: dict con score e livello
+    :return: dict con score, livello e conteggio tecniche per tattica
     """
+    kb = get_kb()
     score = 0
     tactic_counter = {}
-    for tactic in mitre_observed:
-        weight = MITRE_TACTIC_WEIGHTS.get(tactic, 1)
-        score += weight
-        tactic_counter[tactic] = tactic_counter.get(tactic, 0) + 1
+    for technique in dict.fromkeys(mitre_observed):
+        tactics = kb.tactics(technique)
+        # Tecniche multi-tattica: pesa la tattica più grave (nessun doppio conteggio)
+        score += max((MITRE_TACTIC_WEIGHTS.get(t, 1) for t in tactics), default=1)
+        for tactic in tactics:
+            tactic_counter[tactic] = tactic_counter.get(tactic, 0) + 1
     # Bonus se più tattiche critiche osservate
     critical_tactics = {"Impact", "Command and Control", "Lateral Movement"}
     if any(t in tactic_counter for t in critical_tactics):
@@ -0,0 +1,271 @@
+"""
+Storico del rischio (SQLite via SQLAlchemy Core)
+Append-only: ogni run aggiunge un assessment con score, breakdown per
+tattica e insieme delle tecniche osservate.
+  - indici su (client, timestamp) per trend e finestre temporali
+  - inserimenti batch in un'unica transazione
+  - query aggregate lato SQL (finestra mobile, downsampling per periodo)
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import (
+    Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table,
+    create_engine, event, func, insert, select
+)
+
+DEFAULT_DB_PATH = "history/risk_history.db"
+
+# Formati strftime di SQLite per il downsampling
+BUCKETS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m",
+    "quarter": None,
+    "year": "%Y"
+}
+
+metadata = MetaData()
+
+assessments = Table(
+    "assessments", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("client", String, nullable=False),
+    Column("run_id", String, nullable=False),
+    Column("timestamp", DateTime, nullable=False),
+    Column("workflow", String),
+    Column("score", Float, nullable=False),
+    Column("level", String),
+    Column("host_score", Float),
+    Index("ix_assessments_client_timestamp", "client", "timestamp"),
+    Index("ix_assessments_timestamp", "timestamp"),
+)
+
+assessment_tactics = Table(
+    "assessment_tactics", metadata,
+    Column("assessment_id", Integer, ForeignKey("assessments.id"), nullable=False),
+    Column("tactic", String, nullable=False),
+    Column("count", Integer, nullable=False),
+    Index("ix_assessment_tactics_assessment", "assessment_id"),
+    Index("ix_assessment_tactics_tactic", "tactic", "assessment_id"),
+)
+
+assessment_techniques = Table(
+    "assessment_techniques", metadata,
+    Column("assessment_id", Integer, ForeignKey("assessments.id"), nullable=False),
+    Column("technique", String, nullable=False),
+    Index("ix_assessment_techniques_assessment", "assessment_id"),
+)
+
+
+def _sqlite_pragmas(dbapi_connection, _):
+    # WAL: letture concorrenti durante le scritture (worker del batch mode)
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+class RiskHistory:
+    """
+    Storico append-only degli assessment per cliente.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.engine = create_engine(
+            f"sqlite:///{path}", connect_args={"timeout": 30}, future=True
+        )
+        event.listen(self.engine, "connect", _sqlite_pragmas)
+        metadata.create_all(self.engine)
+
+    # =========================
+    # Scrittura
+    # =========================
+    def record(self, client, run_id, risk_score, techniques=(), workflow=None,
+               host_score=None, timestamp=None):
+        """Aggiunge un assessment; restituisce il suo id."""
+        return self.record_many([{
+            "client": client,
+            "run_id": run_id,
+            "timestamp": timestamp,
+            "workflow": workflow,
+            "risk_score": risk_score,
+            "host_score": host_score,
+            "techniques": techniques
+        }])[0]
+
+    def record_many(self, runs):
+        """
+        Inserimento batch (una transazione).
+
+        :param runs: lista di dict {client, run_id, timestamp, workflow,
+                     risk_score: {score, level, breakdown}, host_score, techniques}
+        :return: lista di id nello stesso ordine
+        """
+        if not runs:
+            return []
+        rows = [{
+            "client": r["client"],
+            "run_id": str(r["run_id"]),
+            "timestamp": r.get("timestamp") or datetime.now(),
+            "workflow": r.get("workflow"),
+            "score": r["risk_score"]["score"],
+            "level": r["risk_score"].get("level"),
+            "host_score": r.get("host_score")
+        } for r in runs]
+
+        with self.engine.begin() as conn:
+            ids = [
+                row.id for row in conn.execute(
+                    insert(assessments).returning(assessments.c.id, sort_by_parameter_order=True),
+                    rows
+                )
+            ]
+            tactics = [
+                {"assessment_id": aid, "tactic": tactic, "count": count}
+                for aid, r in zip(ids, runs)
+                for tactic, count in (r["risk_score"].get("breakdown") or {}).items()
+            ]
+            techniques = [
+                {"assessment_id": aid, "technique": technique}
+                for aid, r in zip(ids, runs)
+                for technique in dict.fromkeys(r.get("techniques") or ())
+            ]
+            if tactics:
+                conn.execute(insert(assessment_tactics), tactics)
+            if techniques:
+                conn.execute(insert(assessment_techniques), techniques)
+        return ids
+
+    # =========================
+    # Query
+    # =========================
+    def clients(self):
+        with self.engine.connect() as conn:
+            return list(conn.execute(
+                select(assessments.c.client).distinct().order_by(assessments.c.client)
+            ).scalars())
+
+    def history(self, client, since=None, until=None, limit=None):
+        """Assessment del cliente in ordine cronologico."""
+        query = select(
+            assessments.c.id, assessments.c.run_id, assessments.c.timestamp,
+            assessments.c.workflow, assessments.c.score, assessments.c.level,
+            assessments.c.host_score
+        ).where(assessments.c.client == client)
+        if since is not None:
+            query = query.where(assessments.c.timestamp >= since)
+        if until is not None:
+            query = query.where(assessments.c.timestamp < until)
+        query = query.order_by(assessments.c.timestamp)
+        if limit is not None:
+            query = query.limit(limit)
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(query)]
+
+    def rolling(self, client, window_days=365, now=None):
+        """
+        Statistiche sulla finestra mobile [now - window_days, now].
+
+        :return: dict {"runs", "min", "max", "avg", "current", "first", "last"}
+        """
+        now = now or datetime.now()
+        since = now - timedelta(days=window_days)
+        window = (
+            (assessments.c.client == client)
+            & (assessments.c.timestamp >= since)
+            & (assessments.c.timestamp <= now)
+        )
+        with self.engine.connect() as conn:
+            stats = conn.execute(select(
+                func.count(), func.min(assessments.c.score), func.max(assessments.c.score),
+                func.avg(assessments.c.score), func.min(assessments.c.timestamp),
+                func.max(assessments.c.timestamp)
+            ).where(window)).one()
+            current = conn.execute(
+                select(assessments.c.score).where(window)
+                .order_by(assessments.c.timestamp.desc()).limit(1)
+            ).scalar()
+        runs, low, high, avg, first, last = stats
+        return {
+            "runs": runs,
+            "min": low,
+            "max": high,
+            "avg": round(avg, 2) if avg is not None else None,
+            "current": current,
+            "first": first,
+            "last": last
+        }
+
+    def _bucket(self, bucket):
+        if bucket not in BUCKETS:
+            raise ValueError(f"Periodo non supportato: {bucket} ({', '.join(BUCKETS)})")
+        if bucket == "quarter":
+            month = func.cast(func.strftime("%m", assessments.c.timestamp), Integer)
+            return func.strftime("%Y", assessments.c.timestamp) + "-Q" + \
+                func.cast((month + 2) // 3, String)
+        return func.strftime(BUCKETS[bucket], assessments.c.timestamp)
+
+    def downsample(self, client, bucket="month", since=None, until=None):
+        """
+        Serie aggregata per periodo (day, week, month, quarter, year).
+
+        :return: lista di dict {"period", "runs", "min", "max", "avg"}
+        """
+        period = self._bucket(bucket).label("period")
+        query = select(
+            period, func.count().label("runs"),
+            func.min(assessments.c.score).label("min"),
+            func.max(assessments.c.score).label("max"),
+            func.avg(assessments.c.score).label("avg")
+        ).where(assessments.c.client == client)
+        if since is not None:
+            query = query.where(assessments.c.timestamp >= since)
+        if until is not None:
+            query = query.where(assessments.c.timestamp < until)
+        query = query.group_by(period).order_by(period)
+        with self.engine.connect() as conn:
+            return [
+                dict(row._mapping, avg=round(row.avg, 2))
+                for row in conn.execute(query)
+            ]
+
+    def tactic_trend(self, client, tactic, bucket="month", since=None):
+        """Tecniche osservate per una tattica, aggregate per periodo."""
+        period = self._bucket(bucket).label("period")
+        query = (
+            select(period, func.sum(assessment_tactics.c.count).label("count"))
+            .select_from(assessments.join(
+                assessment_tactics, assessment_tactics.c.assessment_id == assessments.c.id
+            ))
+            .where((assessments.c.client == client) & (assessment_tactics.c.tactic == tactic))
+        )
+        if since is not None:
+            query = query.where(assessments.c.timestamp >= since)
+        query = query.group_by(period).order_by(period)
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(query)]
+
+    def techniques(self, assessment_id):
+        with self.engine.connect() as conn:
+            return list(conn.execute(
+                select(assessment_techniques.c.technique)
+                .where(assessment_techniques.c.assessment_id == assessment_id)
+            ).scalars())
+
+    def close(self):
+        self.engine.dispose()
+
+
+_history = {}
+_history_lock = threading.Lock()
+
+
+def get_history(path=DEFAULT_DB_PATH):
+    """Store condiviso dal processo per un dato database."""
+    with _history_lock:
+        if path not in _history:
+            _history[path] = RiskHistory(path)
+        return _history[path]
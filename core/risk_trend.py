@@ -1,3 +1,6 @@
+from core.risk_history import get_history, DEFAULT_DB_PATH
+
+
 def risk_trend(scores):
     """
     scores: lista di punteggi di rischio nel tempo
@@ -6,4 +9,16 @@ def risk_trend(scores):
         "min": min(scores),
         "max": max(scores),
         "current": scores[-1]
-    }
\ No newline at end of file
+    }
+
+
+def client_risk_trend(client, window_days=365, bucket="month", db_path=DEFAULT_DB_PATH):
+    """
+    Trend del rischio di un cliente dallo storico persistente (core.risk_history):
+    statistiche sulla finestra mobile + serie aggregata per periodo
+    """
+    history = get_history(db_path)
+    trend = history.rolling(client, window_days=window_days)
+    since = trend["first"]
+    trend["series"] = history.downsample(client, bucket=bucket, since=since) if since else []
+    return trend
@@ -0,0 +1,167 @@
+"""
+Run log strutturato
+Un thread di background scrive i record degli step su due stream:
+  - log_<timestamp>.txt   → formato leggibile (come in passato)
+  - log_<timestamp>.jsonl → un record JSON per riga (ingestion SIEM)
+L'orchestrator accoda i record e non attende mai la serializzazione;
+i file vengono flushati a fine step e sugli eventi di inizio/fine run,
+non sui record di progress.
+"""
+import json
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+import yaml
+from core.artifacts import is_artifact
+
+_STOP = object()
+_FLUSH = object()
+# Eventi dopo i quali i file vengono flushati (oltre ai record degli step)
+FLUSH_EVENTS = ("run_start", "run_end", "run_aborted")
+
+
+def _format_text(step_name, step_result):
+    """Blocco testuale di uno step (stesso formato del log storico)."""
+    lines = [
+        f"[STEP] {step_name}\n",
+        f"Status : {step_result.get('status', 'unknown')}\n",
+        f"Summary: {step_result.get('summary', '')}\n"
+    ]
+    raw = step_result.get("raw", None)
+    if is_artifact(raw):
+        lines.append(f"Raw output: {raw['path']} ({raw['size']} byte, gzip {raw['stored']} byte)\n")
+    elif raw:
+        lines.append("Raw output:\n")
+        # ============================
+        # 1️⃣ Caso: RAW = Dizionario
+        # ============================
+        if isinstance(raw, dict):
+            for key, value in raw.items():
+                lines.append(f"\n- {key}:\n")
+                try:
+                    lines.append(yaml.dump(value, sort_keys=False, allow_unicode=True))
+                except Exception:
+                    lines.append(str(value) + "\n")
+        # ============================
+        # 2️⃣ Caso: RAW = Lista
+        # ============================
+        elif isinstance(raw, list):
+            for i, item in enumerate(raw, 1):
+                lines.append(f"\n[{i}] ")
+                if isinstance(item, dict):
+                    lines.append("\n")
+                    lines.append(yaml.dump(item, sort_keys=False, allow_unicode=True))
+                else:
+                    lines.append(str(item) + "\n")
+        # ============================
+        # 3️⃣ Qualsiasi altra cosa
+        # ============================
+        else:
+            lines.append(str(raw) + "\n")
+    lines.append("-" * 50 + "\n")
+    return "".join(lines)
+
+
+class RunLog:
+    """
+    Log di un run con un handle aperto per stream e writer in background.
+    """
+
+    def __init__(self, log_folder, name, fields=None):
+        """
+        :param log_folder: cartella dei log
+        :param name: nome base dei file (es. log_20251223_012618)
+        :param fields: campi aggiunti a ogni record JSONL (es. cliente, run id)
+        """
+        os.makedirs(log_folder, exist_ok=True)
+        self.fields = dict(fields or {})
+        self.text_path = os.path.join(log_folder, f"{name}.txt")
+        self.json_path = os.path.join(log_folder, f"{name}.jsonl")
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # =========================
+    # API
+    # =========================
+    def write_step(self, step_name, step_result):
+        """Accoda il record di uno step; i file vengono flushati a fine step."""
+        self._put(("step", step_name, step_result))
+
+    def write_event(self, event, **data):
+        """Accoda un evento generico (solo stream JSONL)."""
+        self._put(("event", event, data))
+
+    def flush(self):
+        """Attende che tutti i record accodati siano scritti su disco."""
+        if self._thread is not None:
+            self._put(_FLUSH)
+            self._queue.join()
+
+    def close(self):
+        """Svuota la coda, chiude i file e ferma il writer."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+        thread.join()
+
+    # =========================
+    # Writer di background
+    # =========================
+    def _put(self, item):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._writer, name="cybertoolkit-runlog", daemon=True
+                )
+                self._thread.start()
+            self._queue.put(item)
+
+    def _writer(self):
+        text = open(self.text_path, "a", encoding="utf-8")
+        jsonl = open(self.json_path, "a", encoding="utf-8")
+        try:
+            while True:
+                item = self._queue.get()
+                try:
+                    if item is _STOP:
+                        return
+                    if item is _FLUSH or self._handle(item, text, jsonl):
+                        text.flush()
+                        jsonl.flush()
+                except Exception as e:
+                    text.write(f"[LOG ERROR] {e}\n")
+                finally:
+                    self._queue.task_done()
+        finally:
+            text.close()
+            jsonl.close()
+
+    def _handle(self, item, text, jsonl):
+        """Scrive un record; True se i file vanno flushati."""
+        kind, name, payload = item
+        timestamp = datetime.now(timezone.utc).isoformat()
+
+        if kind == "step":
+            text.write(_format_text(name, payload))
+            record = {
+                "timestamp": timestamp,
+                **self.fields,
+                "type": "step",
+                "step": name,
+                "status": payload.get("status", "unknown"),
+                "summary": payload.get("summary", ""),
+                "metadata": payload.get("metadata"),
+                "raw": payload.get("raw")
+            }
+        else:
+            record = {"timestamp": timestamp, **self.fields, "type": name, **payload}
+
+        jsonl.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+
+        # Flush a fine step e a inizio/fine run, non per ogni progress
+        return kind == "step" or name in FLUSH_EVENTS
@@ -0,0 +1,321 @@
+"""
+Scheduler delle scansioni
+Applica i vincoli del cliente (security_constraints) a tutto il lavoro di rete:
+  - finestra oraria consentita (allowed_testing_hours), anche a cavallo
+    della mezzanotte: gli step partono solo dentro la finestra, le scansioni
+    in corso vengono sospese (SIGSTOP) alla chiusura e riprese all'apertura
+  - budget di pacchetti/probe al secondo condiviso da tutti gli step:
+    ogni nmap prenota una quota fissa del budget (--max-rate), il resto
+    alimenta un token bucket usato dalle probe in-process (TCP, HTTP, TLS,
+    ping); la somma di quote e bucket non supera mai il budget
+  - run concorrenti nello stesso processo condividono lo scheduler del
+    primo run (un solo budget di rete), rilasciato dall'ultimo
+
+security_constraints:
+  allowed_testing_hours: {start: "22:00", end: "06:00"}
+  rate_limit:
+    packets_per_second: 500
+    burst: 100
+"""
+import asyncio
+import contextlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Budget di default quando i test DoS non sono autorizzati
+DEFAULT_SAFE_RATE = 500
+# Tool sospesi fuori finestra e soggetti al budget di rete
+SCAN_TOOLS = {"nmap", "ping"}
+# Intervallo di controllo della finestra durante le attese
+WINDOW_POLL = 30
+
+
+def _parse_time(value):
+    if value in (None, ""):
+        return None
+    hours, minutes = str(value).split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+class TestingWindow:
+    """
+    Finestra oraria giornaliera (ora locale). Senza start/end è sempre aperta.
+    """
+
+    def __init__(self, start=None, end=None):
+        self.start = _parse_time(start)
+        self.end = _parse_time(end)
+
+    @classmethod
+    def from_constraints(cls, hours):
+        hours = hours or {}
+        return cls(hours.get("start"), hours.get("end"))
+
+    @property
+    def always_open(self):
+        return self.start is None or self.end is None or self.start == self.end
+
+    def is_open(self, now=None):
+        if self.always_open:
+            return True
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        if self.start < self.end:
+            return self.start <= minute < self.end
+        # Finestra a cavallo della mezzanotte (es. 22:00 → 06:00)
+        return minute >= self.start or minute < self.end
+
+    def next_open(self, now=None):
+        """Istante della prossima apertura (now se già aperta)."""
+        now = now or datetime.now()
+        if self.is_open(now):
+            return now
+        opening = now.replace(hour=self.start // 60, minute=self.start % 60, second=0, microsecond=0)
+        if opening <= now:
+            opening += timedelta(days=1)
+        return opening
+
+    def seconds_until_open(self, now=None):
+        now = now or datetime.now()
+        return max(0.0, (self.next_open(now) - now).total_seconds())
+
+    def __repr__(self):
+        if self.always_open:
+            return "sempre"
+        return f"{self.start // 60:02d}:{self.start % 60:02d}-{self.end // 60:02d}:{self.end % 60:02d}"
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe a prenotazione: acquire() restituisce subito
+    se ci sono token, altrimenti attende il tempo necessario a ripagarli.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate / 10))
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        delay = self._reserve(tokens)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, tokens=1):
+        delay = self._reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+
+class Scheduler:
+    """
+    Vincoli di esecuzione condivisi da orchestrator, executor e moduli.
+    """
+
+    def __init__(self, window=None, rate=None, burst=None, slots=8):
+        """
+        :param rate: budget di pacchetti/probe al secondo (None = illimitato)
+        :param slots: processi di scansione concorrenti: il budget viene
+                      diviso in slots + 1 quote, una riservata al bucket
+        """
+        self.window = window or TestingWindow()
+        self.rate = int(rate) if rate else None
+        if self.rate is not None and self.rate < 2:
+            raise ValueError("rate_limit.packets_per_second deve essere almeno 2")
+        # Quota per nmap; almeno una quota resta sempre al bucket
+        self.share = max(1, self.rate // (slots + 1)) if self.rate else None
+        self.bucket = TokenBucket(self.rate, burst) if self.rate else None
+        self._leased = 0
+        self._cond = threading.Condition()
+
+    # =========================
+    # Finestra oraria
+    # =========================
+    def is_open(self):
+        return self.window.is_open()
+
+    def wait_open(self, label=None, on_wait=None):
+        """
+        Blocca finché la finestra di test non è aperta.
+
+        :param on_wait: callback(seconds, opens_at) invocata prima di attendere
+        :return: secondi attesi
+        """
+        if self.window.is_open():
+            return 0.0
+        started = time.monotonic()
+        opens_at = self.window.next_open()
+        seconds = self.window.seconds_until_open()
+        if on_wait is not None:
+            on_wait(seconds, opens_at)
+        else:
+            print(f"[*] Fuori finestra di test ({self.window}): "
+                  f"{label or 'scansione'} in attesa fino alle {opens_at:%H:%M}")
+        while not self.window.is_open():
+            time.sleep(min(WINDOW_POLL, max(1.0, self.window.seconds_until_open())))
+        return time.monotonic() - started
+
+    async def wait_open_async(self):
+        while not self.window.is_open():
+            await asyncio.sleep(min(WINDOW_POLL, max(1.0, self.window.seconds_until_open())))
+
+    # =========================
+    # Budget di rete
+    # =========================
+    def throttle(self, probes=1):
+        """Probe in-process (sincrone): rispetta finestra e budget."""
+        if not self.window.is_open():
+            self.wait_open()
+        if self.bucket is not None:
+            self.bucket.acquire(probes)
+
+    async def throttle_async(self, probes=1):
+        await self.wait_open_async()
+        if self.bucket is not None:
+            await self.bucket.acquire_async(probes)
+
+    def _update_bucket(self):
+        self.bucket.rate = self.rate - self._leased
+
+    def lease(self, cancelled=None):
+        """
+        Prenota una quota del budget per un processo nmap, attendendo
+        (threading.Condition) che una quota venga rilasciata.
+
+        :param cancelled: threading.Event che interrompe l'attesa
+        :return: quota (pacchetti/s) oppure None se interrotta
+        """
+        with self._cond:
+            while self._leased + self.share > self.rate - self.share:
+                if cancelled is not None and cancelled.is_set():
+                    return None
+                self._cond.wait()
+            self._leased += self.share
+            self._update_bucket()
+            return self.share
+
+    def _release(self, share):
+        with self._cond:
+            self._leased -= share
+            self._update_bucket()
+            self._cond.notify()
+
+    async def _lease(self):
+        """lease() in un thread: l'event loop dell'executor non si blocca."""
+        cancelled = threading.Event()
+        future = asyncio.get_running_loop().run_in_executor(None, self.lease, cancelled)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancelled.set()
+            with self._cond:
+                self._cond.notify_all()
+
+            def _discard(f):
+                share = f.result()
+                if share:
+                    self._release(share)
+
+            future.add_done_callback(_discard)
+            raise
+
+    @staticmethod
+    def is_scan(argv):
+        return os.path.basename(str(argv[0])) in SCAN_TOOLS
+
+    @contextlib.asynccontextmanager
+    async def slot(self, argv):
+        """
+        Contesto di esecuzione di un comando nell'executor:
+        attende la finestra e applica il budget (flag --max-rate per nmap).
+        Da acquisire prima dello slot dell'executor: chi attende una quota
+        non occupa un processo.
+
+        :return: argv eventualmente arricchito dei flag di rate
+        """
+        if not self.is_scan(argv):
+            yield argv
+            return
+
+        await self.wait_open_async()
+        tool = os.path.basename(str(argv[0]))
+        if self.rate is None:
+            yield argv
+        elif tool == "nmap" and "--max-rate" not in argv:
+            share = await self._lease()
+            try:
+                yield [argv[0], "--max-rate", str(share), *argv[1:]]
+            finally:
+                self._release(share)
+        else:
+            await self.bucket.acquire_async(1)
+            yield argv
+
+
+_scheduler = Scheduler()
+_options = {"enforce_window": True, "max_rate": None}
+_active_runs = 0
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Restituisce lo scheduler attivo nel processo."""
+    return _scheduler
+
+
+def configure(enforce_window=True, max_rate=None):
+    """Opzioni CLI: --ignore-window / --max-rate (precedenza sul file input)."""
+    _options.update(enforce_window=enforce_window, max_rate=max_rate)
+
+
+def for_context(context, slots=8):
+    """
+    Installa lo scheduler con i vincoli del cliente per un run
+    (da rilasciare con release() a fine run).
+    Con altri run in corso nello stesso processo lo scheduler attivo
+    resta invariato: le loro scansioni e quote non vengono riassegnate.
+
+    :param slots: processi di scansione concorrenti (limite dell'executor)
+    """
+    global _scheduler, _active_runs
+    constraints = context.extra.get("constraints", {})
+    window = TestingWindow.from_constraints(context.allowed_testing_hours())
+    if not _options["enforce_window"]:
+        window = TestingWindow()
+
+    limits = constraints.get("rate_limit") or {}
+    rate = _options["max_rate"] or limits.get("packets_per_second")
+    if rate is None and not context.is_dos_testing_allowed():
+        rate = DEFAULT_SAFE_RATE
+
+    with _scheduler_lock:
+        if _active_runs == 0:
+            _scheduler = Scheduler(window, rate, limits.get("burst"), slots=slots)
+        elif repr(window) != repr(_scheduler.window) or rate != _scheduler.rate:
+            print(f"[WARN] Run concorrente con vincoli diversi ({window}, {rate} pps): "
+                  f"resta attivo lo scheduler in corso ({_scheduler.window}, {_scheduler.rate} pps)")
+        _active_runs += 1
+        return _scheduler
+
+
+def release():
+    """Fine di un run: l'ultimo run ripristina lo scheduler senza vincoli."""
+    global _scheduler, _active_runs
+    with _scheduler_lock:
+        _active_runs = max(0, _active_runs - 1)
+        if _active_runs == 0:
+            _scheduler = Scheduler()
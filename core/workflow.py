@@ -0,0 +1,86 @@
+"""
+Workflow graph
+Normalizza gli step di un workflow YAML e ne risolve le dipendenze
+(depends_on / parallel) per l'esecuzione concorrente nell'Orchestrator.
+"""
+DEFAULT_MAX_WORKERS = 4
+
+
+def step_id(step):
+    """
+    Restituisce l'identificativo di uno step (stringa o dict YAML)
+    """
+    if isinstance(step, dict):
+        return step.get("step") or step.get("id")
+    return step
+
+
+def normalize_steps(workflow):
+    """
+    Normalizza gli step del workflow in una lista di dict {"id", "depends_on"}.
+
+    Formati supportati per ogni step:
+      - "network.network.discovery"
+      - {"step": "web.web.tls_enum", "depends_on": [...], "parallel": true}
+
+    Regole:
+      - senza hint ogni step attende il precedente (comportamento storico)
+      - depends_on esplicito sostituisce la dipendenza implicita
+      - parallel: true (sullo step o sul workflow) rimuove la dipendenza implicita
+
+    :raise ValueError: step duplicati, dipendenze sconosciute o cicliche
+    """
+    default_parallel = bool(workflow.get("parallel", False))
+    steps = []
+    seen = set()
+    previous = None
+
+    for raw in workflow.get("steps", []) or []:
+        sid = step_id(raw)
+        if not sid:
+            raise ValueError(f"Step senza identificativo: {raw}")
+        if sid in seen:
+            raise ValueError(f"Step duplicato nel workflow: {sid}")
+
+        options = raw if isinstance(raw, dict) else {}
+        depends_on = options.get("depends_on")
+        if depends_on is None:
+            parallel = options.get("parallel", default_parallel)
+            depends_on = [] if parallel or previous is None else [previous]
+        elif isinstance(depends_on, str):
+            depends_on = [depends_on]
+
+        steps.append({"id": sid, "depends_on": list(depends_on)})
+        seen.add(sid)
+        previous = sid
+
+    _check_dependencies(steps)
+    return steps
+
+
+def _check_dependencies(steps):
+    """
+    Verifica che le dipendenze esistano e che il grafo sia aciclico
+    """
+    ids = {s["id"] for s in steps}
+    for s in steps:
+        for dep in s["depends_on"]:
+            if dep not in ids:
+                raise ValueError(f"Dipendenza sconosciuta per {s['id']}: {dep}")
+
+    resolved = set()
+    remaining = list(steps)
+    while remaining:
+        ready = [s for s in remaining if set(s["depends_on"]) <= resolved]
+        if not ready:
+            cycle = ", ".join(s["id"] for s in remaining)
+            raise ValueError(f"Dipendenze cicliche tra gli step: {cycle}")
+        resolved.update(s["id"] for s in ready)
+        remaining = [s for s in remaining if s["id"] not in resolved]
+
+
+def max_workers(workflow):
+    """
+    Numero massimo di step eseguiti in contemporanea
+    """
+    return max(1, int(workflow.get("max_workers", DEFAULT_MAX_WORKERS)))
@@ -1,16 +1,57 @@
 import sys
-import yaml
 #print("YAML version:", yaml.__version__)
 import argparse
 from core.context import Context
-from core.orchestrator import Orchestrator
 import os
 from datetime import datetime
 
+# Default delle opzioni CLI (qui per non importare executor/cache all'avvio:
+# allineati ai moduli che li applicano, verificato in tests/test_cli.py)
+DEFAULT_MAX_PROCS = 8
+DEFAULT_CACHE_TTL = 24 * 3600
+DEFAULT_CACHE_DIR = ".cache/results"
+DEFAULT_KEEP_ARTIFACTS = 10
+DEFAULT_SEGMENT_BUDGET = 2
+DEFAULT_REPORT_DIR = "reports"
+REPORT_FORMATS = ("md", "html", "json", "pdf")
+STATUS_PREFIX = {
+    "success": "[+]",
+    "partial": "[WARN]",
+    "error": "[ERRORE]"
+}
+
 def load_yaml(path):
+   import yaml
    with open(path, "r") as f:
        return yaml.safe_load(f)
 
+def list_steps():
+    """--list-steps: step disponibili dal manifest del registry"""
+    from core.registry import get_registry
+    registry = get_registry()
+    for step in registry.steps():
+        entry = registry.manifest[step]
+        tools = ", ".join(entry["tools"]) or "-"
+        techniques = ", ".join(entry["mitre"]["techniques"]) or "-"
+        print(f"{step:<40} tool: {tools:<18} MITRE: {techniques}")
+        if entry["summary"]:
+            print(f"{'':<40} {entry['summary']}")
+
+def validate_workflows(paths):
+    """--validate: verifica step, dipendenze e tool senza eseguire nulla"""
+    from core.registry import get_registry
+    registry = get_registry()
+    failed = False
+    for path in paths:
+        errors, warnings = registry.validate(load_yaml(path) or {})
+        print(f"[{'ERRORE' if errors else 'OK'}] {path}")
+        for e in errors:
+            print(f"   - {e}")
+        for w in warnings:
+            print(f"   ! {w}")
+        failed = failed or bool(errors)
+    return 1 if failed else 0
+
 def write_log(filename, results, mitre_hits, risk):
     with open(filename, "w", encoding="utf-8") as f:
         f.write("[+] Assessment completato\n\n")
@@ -77,15 +118,12 @@ def build_context(args):
 
     raw = {}
     if args.input_file:
-        raw = load_yaml(args.input_file)
+        raw = load_yaml(args.input_file) or {}
 
     # Sezioni principali (sicure anche se mancanti)
-    assessment = raw.get("assessment", {})
-    client = raw.get("client", {})
-    assets = raw.get("assets", {})
+    client = raw.setdefault("client", {})
+    assets = raw.setdefault("assets", {})
     #print(f"ASSET {assets}")
-    constraints = raw.get("security_constraints", {})
-    metadata = raw.get("notes", {})
 
     # === Override CLI ===
     if args.client:
@@ -120,22 +158,13 @@ def build_context(args):
         "assets": assets
     })
 
-    return Context(
-        name=client.get("name", "UNKNOWN"),
-        category=client.get("category", "generic"),
-        assets=assets,
-        extra={
-            "assessment": assessment,
-            "constraints": constraints,
-            "notes": metadata
-        }
-    )
+    return Context.from_input(raw)
 
 def main():
     parser = argparse.ArgumentParser(
         description="CyberToolkit - MITRE-based Security Assessment"
     )
-    parser.add_argument("--workflow", required=True, help="Path del workflow YAML")
+    parser.add_argument("--workflow", help="Path del workflow YAML (default del batch)")
     parser.add_argument("--input-file", help="File YAML con parametri cliente")
     parser.add_argument("--client", help="Nome cliente")
     parser.add_argument(
@@ -147,23 +176,191 @@ def main():
     parser.add_argument("--web_domain", help="Sito web target")
     parser.add_argument("--endpoints", help="IP endpoint separati da virgola")
     parser.add_argument("--pos", help="IP POS separati da virgola")
+    parser.add_argument(
+        "--max-procs",
+        type=int,
+        default=DEFAULT_MAX_PROCS,
+        help="Numero massimo di processi di scansione concorrenti"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disattiva la cache dei risultati di scansione"
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignora i risultati in cache e li aggiorna con una nuova scansione"
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        default=DEFAULT_CACHE_TTL,
+        help="Validità dei risultati in cache (secondi)"
+    )
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Cartella della cache")
+    parser.add_argument(
+        "--keep-artifacts",
+        type=int,
+        default=DEFAULT_KEEP_ARTIFACTS,
+        help="Run di cui conservare gli artefatti raw in logs/ (0 = nessuna pulizia)"
+    )
+    parser.add_argument(
+        "--ignore-window",
+        action="store_true",
+        help="Non applica allowed_testing_hours (solo laboratorio)"
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=int,
+        help="Budget pacchetti/probe al secondo (precedenza su security_constraints.rate_limit)"
+    )
+    parser.add_argument(
+        "--report-format",
+        default="md",
+        help=f"Formati del report separati da virgola ({', '.join(REPORT_FORMATS)})"
+    )
+    parser.add_argument(
+        "--report-dir",
+        default=DEFAULT_REPORT_DIR,
+        help="Cartella dei report (con gli output raw completi in <report>_artifacts/)"
+    )
+    parser.add_argument(
+        "--batch",
+        help="Batch mode: cartella di input cliente (*.yaml) oppure manifest YAML"
+    )
+    parser.add_argument(
+        "--workflow-map",
+        help="Batch: workflow per categoria, es. negozio=workflows/negozio.yaml,hotel=workflows/hotel.yaml"
+    )
+    parser.add_argument("--batch-workers", type=int, help="Batch: assessment concorrenti (processi)")
+    parser.add_argument(
+        "--segment-budget",
+        type=int,
+        default=DEFAULT_SEGMENT_BUDGET,
+        help="Batch: assessment concorrenti per segmento/uplink non presente nel manifest"
+    )
+    parser.add_argument("--output-dir", help="Batch: cartella dei bundle di risultati")
+    parser.add_argument(
+        "--list-steps",
+        action="store_true",
+        help="Elenca gli step disponibili (tool richiesti, MITRE) ed esce"
+    )
+    parser.add_argument(
+        "--validate",
+        nargs="*",
+        metavar="WORKFLOW",
+        help="Valida i workflow indicati (default: --workflow o tutti in workflows/) ed esce"
+    )
     args = parser.parse_args()
 
-    # Carica workflow e contesto
-    workflow = load_yaml(args.workflow)
+    if args.list_steps:
+        list_steps()
+        return
+    if args.validate is not None:
+        paths = args.validate or ([args.workflow] if args.workflow else sorted(
+            os.path.join("workflows", f) for f in os.listdir("workflows") if f.endswith(".yaml")
+        ))
+        sys.exit(validate_workflows(paths))
+    if not args.workflow and not args.batch:
+        parser.error("serve --workflow oppure --batch")
+    report_formats = [f.strip() for f in args.report_format.split(",") if f.strip()]
+    unknown = [f for f in report_formats if f not in REPORT_FORMATS]
+    if unknown or not report_formats:
+        parser.error(f"--report-format non valido: {args.report_format} ({', '.join(REPORT_FORMATS)})")
+
+    # Import differiti: --list-steps / --validate non caricano l'orchestrator
+    from core import executor
+    from core import cache
+    from core import batch
+    from core import scheduler
+    from core.orchestrator import Orchestrator
+    from core.plan import load_workflow, build_plan
+    from core.report_engine import write_reports
+
+    if args.batch:
+        workflow_map = dict(
+            item.split("=", 1) for item in (args.workflow_map or "").split(",") if "=" in item
+        )
+        summaries = batch.run_batch(
+            args.batch,
+            workflow=args.workflow,
+            workflow_map=workflow_map,
+            workers=args.batch_workers,
+            output_dir=args.output_dir,
+            default_budget=args.segment_budget,
+            settings={
+                "max_procs": args.max_procs,
+                "report_formats": report_formats,
+                "scheduler": {
+                    "enforce_window": not args.ignore_window,
+                    "max_rate": args.max_rate
+                },
+                "cache": {
+                    "enabled": not args.no_cache,
+                    "refresh": args.refresh,
+                    "ttl": args.cache_ttl,
+                    "directory": args.cache_dir
+                }
+            }
+        )
+        sys.exit(0 if all(s["status"] == "success" for s in summaries) else 1)
+
+    executor.configure(args.max_procs)
+    scheduler.configure(enforce_window=not args.ignore_window, max_rate=args.max_rate)
+    cache.configure(
+        enabled=not args.no_cache,
+        refresh=args.refresh,
+        ttl=args.cache_ttl,
+        directory=args.cache_dir
+    )
+
+    # Workflow compilato (cache su disco) e validato prima di qualsiasi scansione
+    try:
+        workflow = load_workflow(args.workflow)
+    except ValueError as e:
+        print(f"[ERRORE] {args.workflow}: {e}")
+        sys.exit(1)
     context = build_context(args)
+    plan = build_plan(workflow, context)
 
     print(f"\n[*] Avvio assessment per {context}")
-    print(f"[*] Workflow: {workflow.get('name')}\n")
+    print(f"[*] Workflow: {plan.name}")
+    for step in plan.steps:
+        if not step.runnable:
+            print(f"[-] {step.id} saltato: {step.skip}")
+    print()
 
     # Passa direttamente l'oggetto Context
-    orchestrator = Orchestrator(context)
-    output = orchestrator.run(workflow)
+    orchestrator = Orchestrator(context, keep_artifacts=args.keep_artifacts)
+
+    # Risultati stampati man mano che gli step terminano
+    output = None
+    for event in orchestrator.run_iter(plan):
+        if event["event"] == "step":
+            result = event["result"]
+            status = result.get("status", "unknown")
+            if status == "skipped":
+                continue
+            prefix = STATUS_PREFIX.get(status, "[*]")
+            risk = event["risk_score"]
+            print(f"{prefix} [{event['completed']}/{event['total']}] {event['step']}: {status}")
+            if result.get("summary"):
+                print(f"    {result['summary']}")
+            print(f"    MITRE: {len(event['mitre_observed'])} tecniche - rischio {risk['score']} ({risk['level']})")
+        elif event["event"] == "run_end":
+            output = event["output"]
+    print()
+
+    # Grafici del PDF disegnati in un processo separato mentre la CLI stampa i risultati
+    charts = None
+    if "pdf" in report_formats:
+        from core.report_charts import get_chart_renderer
+        charts = get_chart_renderer().render_all(output)
 
     results = output["results"]
     mitre_hits = output["mitre_observed"]
     risk = output["risk_score"]
-    report = output["report"]
 
     # Output CLI
     print("[+] Assessment completato\n")
@@ -176,8 +373,18 @@ def main():
         print(f"- {t}")
    
     print("\n=== REPORT GENERATION ===")
-    # Qui ci va il metodo per la generazione del report
-    # PDF con tutto cio che ne consegue in termini di formattazione
+    # Scrittura in streaming: gli output raw completi finiscono negli artefatti
+    try:
+        reports = write_reports(
+            context, output, directory=args.report_dir, formats=report_formats,
+            charts=charts, run_log=orchestrator.run_log
+        )
+    finally:
+        orchestrator.run_log.close()
+        if charts is not None:
+            get_chart_renderer().shutdown()
+    for fmt, path in reports.items():
+        print(f"[+] Report {fmt}: {path}")
    
     print("\n=== RISK SUMMARY ===")
     print(f"Score: {risk['score']}")
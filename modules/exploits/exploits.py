@@ -2,11 +2,88 @@
 Exploit validation (no exploitation)
 MITRE: T1203
 """
-import subprocess
-from time import sleep
+from time import sleep, monotonic
+import atexit
 import tempfile
 import os
+import re
 import json
+import secrets
+import socket
+import threading
+from core.executor import run_command
+from modules.exploits.msfrpc import MsfRpcError, MsfRpcAuthError, get_client, close_clients
+
+DOCKER_TIMEOUT = 600
+NMAP_TIMEOUT = 3600
+MSF_TIMEOUT = 1800
+
+MSF_CONTAINER = "metasploit2"
+MSF_IMAGE = "metasploitframework/metasploit-framework"
+
+# msfrpcd esposto dal container sulla porta 55553
+RPC_HOST = os.environ.get("MSF_RPC_HOST", "127.0.0.1")
+RPC_PORT = int(os.environ.get("MSF_RPC_PORT", 55553))
+RPC_USER = os.environ.get("MSF_RPC_USER", "msf")
+RPC_PASSWORD = os.environ.get("MSF_RPC_PASSWORD")
+# Password generata, riusata dai run successivi (msfrpcd può restare attivo)
+RPC_PASSWORD_FILE = os.environ.get("MSF_RPC_PASSWORD_FILE", ".cache/msfrpc_password")
+RPC_STARTUP_TIMEOUT = 180
+RPC_CONNECT_TIMEOUT = 2
+
+# Impostata dal batch mode: il container è gestito dal processo padre
+KEEP_CONTAINER = os.environ.get("MSF_KEEP_CONTAINER") == "1"
+
+# I finding cambiano con moduli Metasploit e patch dei target: mai riusati dalla cache
+UNCACHEABLE_STEPS = ("metasploit_check",)
+
+CVE_PATTERN = re.compile(r"CVE-\d{4}-\d{4,}")
+MODULE_PATTERN = re.compile(r"\b((?:exploit|auxiliary|post)/[\w/.-]+)")
+SEARCH_MARKER = "##CYBERTOOLKIT_CVE "
+
+_cleanup_registered = False
+_rpc_lock = threading.Lock()
+_password_lock = threading.Lock()
+
+def configure(rpc_password=None, keep_container=None):
+    """
+    Credenziali RPC e gestione del container impostate dal batch mode
+    nei processi worker (il container è del processo padre).
+    """
+    global RPC_PASSWORD, KEEP_CONTAINER
+    if rpc_password:
+        RPC_PASSWORD = rpc_password
+    if keep_container is not None:
+        KEEP_CONTAINER = keep_container
+
+def rpc_password():
+    """
+    Password di msfrpcd: MSF_RPC_PASSWORD se impostata, altrimenti generata
+    una volta e salvata in RPC_PASSWORD_FILE (permessi 0600). Un msfrpcd
+    lasciato attivo da un run precedente accetta così le stesse credenziali.
+    """
+    global RPC_PASSWORD
+    with _password_lock:
+        if RPC_PASSWORD:
+            return RPC_PASSWORD
+        try:
+            with open(RPC_PASSWORD_FILE, "r", encoding="utf-8") as f:
+                RPC_PASSWORD = f.read().strip()
+        except FileNotFoundError:
+            pass
+        if not RPC_PASSWORD:
+            RPC_PASSWORD = secrets.token_urlsafe(16)
+            try:
+                directory = os.path.dirname(RPC_PASSWORD_FILE) or "."
+                os.makedirs(directory, exist_ok=True)
+                # mkstemp crea il file con permessi 0600
+                fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(RPC_PASSWORD)
+                os.replace(tmp, RPC_PASSWORD_FILE)
+            except OSError as e:
+                print(f"[WARN] Password RPC non salvata in {RPC_PASSWORD_FILE}: {e}")
+        return RPC_PASSWORD
 
 def ensure_msf_container(container_name="metasploit2",
                          image_name="metasploitframework/metasploit-framework"):
@@ -17,10 +94,11 @@ def ensure_msf_container(container_name="metasploit2",
     - Se running → ok
     """
 
-    status = subprocess.run(
-        f"docker ps -a --filter name={container_name} --format '{{{{.Status}}}}'",
-        shell=True, capture_output=True, text=True
-    ).stdout.strip()
+    status = run_command(
+        ["docker", "ps", "-a", "--filter", f"name={container_name}",
+         "--format", "{{.Status}}"],
+        timeout=DOCKER_TIMEOUT
+    ).stdout_text.strip()
 
     if "Up" in status:
         print(f"[INFO] Container '{container_name}' già in esecuzione.")
@@ -28,29 +106,29 @@ def ensure_msf_container(container_name="metasploit2",
 
     if "Exited" in status:
         print(f"[INFO] Avvio container '{container_name}' fermo…")
-        subprocess.run(f"docker start {container_name}", shell=True)
+        run_command(["docker", "start", container_name], timeout=DOCKER_TIMEOUT)
         sleep(3)
         return
 
     print("[INFO] Container non trovato. Creo ambiente…")
 
-    images = subprocess.run(
-        f"docker images -q {image_name}",
-        shell=True, capture_output=True, text=True
-    ).stdout.strip()
+    images = run_command(
+        ["docker", "images", "-q", image_name],
+        timeout=DOCKER_TIMEOUT
+    ).stdout_text.strip()
 
     if not images:
         print(f"[INFO] Download immagine Docker {image_name}")
-        subprocess.run(f"docker pull {image_name}", shell=True)
+        run_command(["docker", "pull", image_name], timeout=DOCKER_TIMEOUT)
 
     print("[INFO] Avvio container Metasploit…")
 
-    subprocess.run(
-        f"docker run -d --name {container_name} "
-        "--cap-add=NET_RAW --cap-add=NET_ADMIN --privileged "
-        "-p 4444:4444 -p 55553:55553 "
-        f"{image_name} tail -f /dev/null",
-        shell=True
+    run_command(
+        ["docker", "run", "-d", "--name", container_name,
+         "--cap-add=NET_RAW", "--cap-add=NET_ADMIN", "--privileged",
+         "-p", "4444:4444", "-p", "55553:55553",
+         image_name, "tail", "-f", "/dev/null"],
+        timeout=DOCKER_TIMEOUT
     )
 
     sleep(5)
@@ -61,163 +139,294 @@ def stop_msf_container(container_name="metasploit2"):
     Non genera errore se non esiste.
     """
     # Se il container gira → stop
-    subprocess.run(
-        f"docker stop {container_name}",
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
+    run_command(["docker", "stop", container_name], timeout=DOCKER_TIMEOUT)
 
     # Se esiste → rimuovi
-    subprocess.run(
-        f"docker rm {container_name}",
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
+    run_command(["docker", "rm", container_name], timeout=DOCKER_TIMEOUT)
+
+def _rpc_listening():
+    """True se qualcosa è già in ascolto sulla porta msfrpcd."""
+    try:
+        with socket.create_connection((RPC_HOST, RPC_PORT), timeout=RPC_CONNECT_TIMEOUT):
+            return True
+    except OSError:
+        return False
+
+def _auth_error(e):
+    return MsfRpcAuthError(
+        f"{e}: msfrpcd è già attivo con credenziali diverse, "
+        f"impostare MSF_RPC_USER/MSF_RPC_PASSWORD (o la password in {RPC_PASSWORD_FILE})",
+        code=e.code
     )
 
+def ensure_msf_rpc(container_name=MSF_CONTAINER):
+    """
+    Avvia msfrpcd nel container (se non già attivo) e restituisce
+    il client RPC autenticato condiviso.
+    Il boot di Ruby viene pagato una sola volta per processo.
+
+    Se un msfrpcd è già in ascolto non ne viene avviato un secondo;
+    credenziali rifiutate → MsfRpcAuthError subito, senza attendere
+    RPC_STARTUP_TIMEOUT.
+    """
+    with _rpc_lock:
+        if _rpc_listening():
+            try:
+                return get_client(RPC_HOST, RPC_PORT, RPC_USER, rpc_password())
+            except MsfRpcAuthError as e:
+                raise _auth_error(e) from e
+            except MsfRpcError:
+                # In ascolto ma ancora in avvio: si attende sotto
+                pass
+        else:
+            print("[INFO] Avvio msfrpcd nel container…")
+            run_command(
+                ["docker", "exec", "-d", container_name, "bash", "-lc",
+                 f"./msfrpcd -U {RPC_USER} -P {rpc_password()} -a 0.0.0.0 -p {RPC_PORT} -S -f"],
+                timeout=DOCKER_TIMEOUT
+            )
+
+        deadline = monotonic() + RPC_STARTUP_TIMEOUT
+        while True:
+            try:
+                return get_client(RPC_HOST, RPC_PORT, RPC_USER, rpc_password())
+            except MsfRpcAuthError as e:
+                raise _auth_error(e) from e
+            except MsfRpcError:
+                if monotonic() > deadline:
+                    raise
+                sleep(2)
+
+def _register_cleanup(container_name):
+    """
+    Sessione RPC e container restano attivi per tutto il processo:
+    vengono chiusi una sola volta all'uscita.
+    """
+    global _cleanup_registered
+    if _cleanup_registered:
+        return
+    _cleanup_registered = True
+
+    def _cleanup():
+        close_clients()
+        if not KEEP_CONTAINER:
+            stop_msf_container(container_name=container_name)
+
+    atexit.register(_cleanup)
+
+def _rpc_check(client, target_ip, xml_path):
+    """
+    Import, estrazione CVE e ricerca moduli sulla sessione RPC persistente.
+    Le ricerche per CVE vengono inviate in pipeline sul connection pool.
+    """
+    with open(xml_path, "r", encoding="utf-8") as f:
+        client.db_import(f.read())
+
+    cve_list = sorted({
+        cve
+        for vuln in client.vulns()
+        if vuln.get("host") in (None, target_ip)
+        for cve in CVE_PATTERN.findall(str(vuln.get("refs", "")))
+    })
+
+    searches = client.call_many([("module.search", f"cve:{cve}") for cve in cve_list])
+    checks = [
+        {
+            "cve": cve,
+            "modules": [m.get("fullname") for m in modules or []]
+        }
+        for cve, modules in zip(cve_list, searches)
+    ]
+    return cve_list, checks
+
+def _msfconsole(container_name, script_path):
+    run_command(
+        ["docker", "exec", container_name, "bash", "-lc",
+         f"./msfconsole -q -r {script_path}"],
+        timeout=MSF_TIMEOUT
+    )
+
+def parse_search_output(output):
+    """
+    Suddivide l'output spool delle ricerche in un mapping per CVE
+    usando i marker stampati dal resource script.
+
+    :return: dict cve -> {"modules": [...], "result": testo}
+    """
+    mapping = {}
+    current = None
+    lines = []
+    for line in output.splitlines() + [SEARCH_MARKER + "END"]:
+        if line.startswith(SEARCH_MARKER):
+            if current:
+                text = "\n".join(lines).strip()
+                mapping[current] = {
+                    "modules": sorted(set(MODULE_PATTERN.findall(text))),
+                    "result": text
+                }
+            current = line[len(SEARCH_MARKER):].strip()
+            lines = []
+        elif current:
+            lines.append(line)
+    mapping.pop("END", None)
+    return mapping
+
+def _console_check(container_name, run_dir):
+    """
+    Fallback senza RPC: msfconsole con resource script via docker exec.
+    Due sole invocazioni per run (import + vulns, poi tutte le ricerche CVE
+    in un unico script) con file in una cartella temporanea dedicata al run.
+    """
+    remote_dir = f"/tmp/cybertoolkit_{os.path.basename(run_dir)}"
+
+    # ----------------------------------------
+    # Import in Metasploit e dump CVE
+    # ----------------------------------------
+    with open(os.path.join(run_dir, "import.rc"), "w") as f:
+        f.write(
+            f"db_import {remote_dir}/msf_scan.xml\n"
+            f"spool {remote_dir}/msf_vuln.txt\n"
+            "vulns\n"
+            "spool off\n"
+            "exit\n"
+        )
+
+    run_command(
+        ["docker", "cp", run_dir, f"{container_name}:{remote_dir}"],
+        timeout=DOCKER_TIMEOUT
+    )
+    _msfconsole(container_name, f"{remote_dir}/import.rc")
+    run_command(
+        ["docker", "cp", f"{container_name}:{remote_dir}/msf_vuln.txt", run_dir],
+        timeout=DOCKER_TIMEOUT
+    )
+
+    try:
+        with open(os.path.join(run_dir, "msf_vuln.txt"), "r") as f:
+            cve_list = sorted(set(CVE_PATTERN.findall(f.read())))
+    except OSError:
+        cve_list = []
+
+    if not cve_list:
+        return cve_list, []
+
+    # ----------------------------------------
+    # Tutte le ricerche CVE in un solo script
+    # ----------------------------------------
+    script = [f"spool {remote_dir}/msf_search.txt"]
+    for cve in cve_list:
+        script.append(f"<ruby>\nprint_line('{SEARCH_MARKER}{cve}')\n</ruby>")
+        script.append(f"search cve:{cve}")
+    script += ["spool off", "exit"]
+
+    with open(os.path.join(run_dir, "search.rc"), "w") as f:
+        f.write("\n".join(script) + "\n")
+
+    run_command(
+        ["docker", "cp", os.path.join(run_dir, "search.rc"), f"{container_name}:{remote_dir}/search.rc"],
+        timeout=DOCKER_TIMEOUT
+    )
+    _msfconsole(container_name, f"{remote_dir}/search.rc")
+    run_command(
+        ["docker", "cp", f"{container_name}:{remote_dir}/msf_search.txt", run_dir],
+        timeout=DOCKER_TIMEOUT
+    )
+    run_command(
+        ["docker", "exec", container_name, "rm", "-rf", remote_dir],
+        timeout=DOCKER_TIMEOUT
+    )
+
+    try:
+        with open(os.path.join(run_dir, "msf_search.txt"), "r") as f:
+            mapping = parse_search_output(f.read())
+    except OSError:
+        mapping = {}
+
+    results = [
+        {
+            "cve": cve,
+            "modules": mapping.get(cve, {}).get("modules", []),
+            "result": mapping.get(cve, {}).get("result", "")
+        }
+        for cve in cve_list
+    ]
+    return cve_list, results
+
 def metasploit_check(context):
     """
     exploits.metasploit_check
     Pipeline automatizzata:
     1. Esegue Nmap con script vulnerabilità
     2. Salva risultato in XML
-    3. Importa in Metasploit
+    3. Importa in Metasploit (sessione msgrpc persistente)
     4. Estrae CVE
-    5. Cerca moduli Metasploit compatibili
-    6. Esegue 'check' per ogni modulo
-    7. Restituisce JSON report
+    5. Cerca moduli Metasploit compatibili (chiamate RPC in pipeline)
+    6. Restituisce JSON report
+
+    Se msfrpcd non è disponibile si ripiega su msfconsole via docker exec.
     """
+    gateways = context.network_gateways()
+    if not gateways:
+        return {
+            "status": "error",
+            "raw": "",
+            "summary": "Nessun gateway definito"
+        }
 
     ensure_msf_container(
-        container_name="metasploit2",
-        image_name="metasploitframework/metasploit-framework"
-    )  # tua funzione già esistente
+        container_name=MSF_CONTAINER,
+        image_name=MSF_IMAGE
+    )
+    _register_cleanup(MSF_CONTAINER)
 
-    try:
-        gateways = context.network_gateways()
-        if not gateways:
-            return {
-                "status": "error",
-                "raw": "",
-                "summary": "Nessun gateway definito"
-            }
+    target_ip = gateways[0]
 
-        target_ip = gateways[0]
+    # Cartella temporanea dedicata al run: run concorrenti non si sovrascrivono
+    with tempfile.TemporaryDirectory(prefix="msf_") as run_dir:
 
         # ----------------------------------------
         # 1️⃣ Eseguiamo Nmap con vulners script
         # ----------------------------------------
-        tmp_dir = tempfile.gettempdir()
-        xml_path = os.path.join(tmp_dir, "msf_scan.xml")
+        xml_path = os.path.join(run_dir, "msf_scan.xml")
 
-        nmap_cmd = f"nmap -sT -sV --script vulners -oX {xml_path} {target_ip}"
-        nmap_result = subprocess.run(nmap_cmd, shell=True, capture_output=True, text=True)
+        nmap_cmd = ["nmap", "-sT", "-sV", "--script", "vulners", "-oX", xml_path, target_ip]
+        nmap_result = run_command(nmap_cmd, timeout=NMAP_TIMEOUT)
 
-        if nmap_result.returncode != 0:
+        if not nmap_result.ok:
             return {
                 "status": "error",
-                "raw": nmap_result.stderr,
+                "raw": nmap_result.stderr_text,
                 "summary": "Errore durante Nmap"
             }
 
-        # Copiamo XML dentro container metasploit
-        subprocess.run(
-            f"docker cp {xml_path} metasploit2:/tmp/msf_scan.xml",
-            shell=True
-        )
-
-        # ----------------------------------------
-        # 2️⃣ Importiamo in Metasploit e dump CVE
-        # ----------------------------------------
-        msf_script = r"""
-            db_import /tmp/msf_scan.xml
-            spool /tmp/msf_vuln.txt
-            vulns
-            spool off
-            exit
-        """
-
-        with open("/tmp/msf_script.rc", "w") as f:
-            f.write(msf_script)
-
-        subprocess.run("docker cp /tmp/msf_script.rc metasploit2:/tmp/script.rc", shell=True)
-
-        subprocess.run(
-            "docker exec metasploit2 bash -lc \"./msfconsole -q -r /tmp/script.rc\"",
-            shell=True,
-            capture_output=True,
-            text=True
-        )
-
-        # Recuperiamo vulnerabilità estratte
-        subprocess.run(
-            "docker cp metasploit2:/tmp/msf_vuln.txt /tmp/msf_vuln.txt",
-            shell=True
-        )
-
         # ----------------------------------------
-        # 3️⃣ Parsing base CVE trovate
-        # ----------------------------------------
-        cve_list = []
-        with open("/tmp/msf_vuln.txt", "r") as f:
-            for line in f.readlines():
-                if "CVE-" in line:
-                    parts = line.strip().split()
-                    for p in parts:
-                        if "CVE-" in p:
-                            cve_list.append(p.replace(",", "").strip())
-
-        cve_list = list(set(cve_list))
-
-        results = []
-
+        # 2️⃣ Import + CVE + moduli via RPC
         # ----------------------------------------
-        # 4️⃣ Per ogni CVE → cerchiamo modulo + check
-        # ----------------------------------------
-        for cve in cve_list:
-
-            msf_dynamic = f"""
-                search cve:{cve}
-                spool /tmp/check_{cve}.txt
-                use auxiliary/scanner/vuln/
-                exit
-            """
-            # Nota: non possiamo sapere il modulo esatto qui senza parsing avanzato
-            # quindi usiamo search e salviamo output
-
-            with open("/tmp/tmpcmd.rc", "w") as f:
-                f.write(msf_dynamic)
-
-            subprocess.run("docker cp /tmp/tmpcmd.rc metasploit2:/tmp/tmpcmd.rc", shell=True)
-
-            subprocess.run(
-                "docker exec metasploit2 bash -lc \"./msfconsole -q -r /tmp/tmpcmd.rc\"",
-                shell=True,
-                capture_output=True
-            )
-
-            subprocess.run(
-                f"docker cp metasploit2:/tmp/check_{cve}.txt /tmp/check_{cve}.txt",
-                shell=True
-            )
-
-            with open(f"/tmp/check_{cve}.txt") as f:
-                results.append({
-                    "cve": cve,
-                    "result": f.read()
-                })
-
-        report_json = json.dumps({
-            "target": target_ip,
-            "found_cves": cve_list,
-            "checks": results
-        }, indent=4)
-
-        return {
-            "status": "success",
-            "raw": report_json,
-            "summary": f"Metasploit vulnerability scan completato su {target_ip}"
-        }
-    finally:
-        stop_msf_container(container_name="metasploit2")
\ No newline at end of file
+        rpc_error = None
+        try:
+            client = ensure_msf_rpc(MSF_CONTAINER)
+            cve_list, results = _rpc_check(client, target_ip, xml_path)
+            backend = "msgrpc"
+        except MsfRpcError as e:
+            # Il fallback resta visibile in report e run log, non solo a console
+            rpc_error = f"{type(e).__name__}: {e}"
+            print(f"[WARN] RPC Metasploit non disponibile ({rpc_error}), uso msfconsole")
+            cve_list, results = _console_check(MSF_CONTAINER, run_dir)
+            backend = "msfconsole"
+
+    report = {
+        "target": target_ip,
+        "backend": backend,
+        "found_cves": cve_list,
+        "checks": results
+    }
+    summary = f"Metasploit vulnerability scan completato su {target_ip}"
+    if rpc_error:
+        report["rpc_error"] = rpc_error
+        summary += f" (msfconsole, RPC non disponibile: {rpc_error})"
+
+    return {
+        "status": "success",
+        "raw": json.dumps(report, indent=4),
+        "summary": summary
+    }
@@ -0,0 +1,186 @@
+"""
+Client Metasploit RPC (msgrpc / msfrpcd)
+Sessione autenticata persistente su HTTP keep-alive con connection pool:
+le chiamate (db.import_data, db.vulns, module.search, ...) vengono
+inviate in pipeline senza riavviare msfconsole a ogni invocazione.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import msgpack
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_PORT = 55553
+DEFAULT_POOL_SIZE = 4
+RPC_TIMEOUT = 300
+
+# msgrpc: Msf::RPC::Exception con codice 401 per login fallito e token non valido/scaduto
+AUTH_ERROR_CODE = 401
+
+
+class MsfRpcError(Exception):
+    """Errore restituito dal server RPC o di trasporto."""
+
+    def __init__(self, message, error_class=None, code=None):
+        super().__init__(message)
+        self.error_class = error_class
+        self.code = code
+
+    @property
+    def auth_failed(self):
+        return self.code == AUTH_ERROR_CODE
+
+
+class MsfRpcAuthError(MsfRpcError):
+    """Credenziali rifiutate da msfrpcd (auth.login)."""
+
+
+class MsfRpcClient:
+    """
+    Client msgrpc: autenticazione una sola volta, token riutilizzato
+    per tutte le chiamate, connessioni HTTP riusate dal pool.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, user="msf", password="",
+                 ssl=False, uri="/api/", pool_size=DEFAULT_POOL_SIZE, timeout=RPC_TIMEOUT):
+        scheme = "https" if ssl else "http"
+        self.url = f"{scheme}://{host}:{port}{uri}"
+        self.user = user
+        self.password = password
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.token = None
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.verify = False
+        self.session.headers.update({"Content-Type": "binary/message-pack"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # =========================
+    # Trasporto
+    # =========================
+    def _post(self, payload):
+        try:
+            response = self.session.post(
+                self.url, data=msgpack.packb(payload, use_bin_type=True), timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise MsfRpcError(f"RPC non raggiungibile: {e}") from e
+
+        try:
+            data = msgpack.unpackb(response.content, raw=False, strict_map_key=False)
+        except (msgpack.UnpackException, ValueError) as e:
+            raise MsfRpcError(f"Risposta RPC non valida (HTTP {response.status_code})") from e
+
+        if isinstance(data, dict) and data.get("error"):
+            code = data.get("error_code")
+            raise MsfRpcError(
+                data.get("error_message") or data.get("error_string") or str(data),
+                error_class=data.get("error_class"),
+                code=int(code) if str(code).isdigit() else None
+            )
+        return data
+
+    def login(self):
+        """Autentica (auth.login) e memorizza il token di sessione."""
+        with self._lock:
+            try:
+                data = self._post(["auth.login", self.user, self.password])
+            except MsfRpcError as e:
+                if not e.auth_failed:
+                    raise
+                data = {}
+            if data.get("result") != "success":
+                raise MsfRpcAuthError(
+                    f"Autenticazione RPC fallita per l'utente '{self.user}' su {self.url}",
+                    code=AUTH_ERROR_CODE
+                )
+            self.token = data["token"]
+            return self.token
+
+    def call(self, method, *args):
+        """
+        Invoca un metodo RPC con il token di sessione.
+        Se il token è scaduto (errore msgrpc 401) la sessione viene
+        riautenticata una volta.
+        """
+        if self.token is None:
+            self.login()
+        try:
+            return self._post([method, self.token, *args])
+        except MsfRpcError as e:
+            if not e.auth_failed:
+                raise
+            self.login()
+            return self._post([method, self.token, *args])
+
+    def call_many(self, calls):
+        """
+        Invia più chiamate in pipeline sulle connessioni del pool.
+
+        :param calls: lista di tuple (method, *args)
+        :return: lista di risultati nello stesso ordine
+        """
+        if self.token is None:
+            self.login()
+        with ThreadPoolExecutor(max_workers=self.pool_size) as pool:
+            return list(pool.map(lambda c: self.call(*c), calls))
+
+    def close(self):
+        """Logout e chiusura delle connessioni del pool."""
+        if self.token is not None:
+            try:
+                self._post(["auth.logout", self.token, self.token])
+            except MsfRpcError:
+                pass
+            self.token = None
+        self.session.close()
+
+    # =========================
+    # Helper API
+    # =========================
+    def version(self):
+        return self.call("core.version")
+
+    def db_import(self, xml_data, workspace=None):
+        opts = {"data": xml_data}
+        if workspace:
+            opts["workspace"] = workspace
+        return self.call("db.import_data", opts)
+
+    def vulns(self, workspace=None):
+        opts = {"workspace": workspace} if workspace else {}
+        return self.call("db.vulns", opts).get("vulns", [])
+
+    def search(self, query):
+        return self.call("module.search", query)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host="127.0.0.1", port=DEFAULT_PORT, user="msf", password="", **kwargs):
+    """
+    Restituisce un client autenticato condiviso per (host, port, user, password):
+    la sessione resta aperta tra uno step e l'altro.
+    """
+    key = (host, port, user, password)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = MsfRpcClient(host, port, user, password, **kwargs)
+            client.login()
+            _clients[key] = client
+        return client
+
+
+def close_clients():
+    """Chiude tutte le sessioni RPC aperte."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
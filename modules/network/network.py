@@ -2,46 +2,257 @@
 Network discovery & validation
 MITRE: T1046, T1016, T1021, T1570, T1071, T1041
 """
-import subprocess
+from concurrent.futures import as_completed
 from datetime import datetime
-from tqdm import tqdm
-import time
+import ipaddress
+import math
+from core.baseline_engine import RunStore, diff_hosts
+from core.executor import get_executor, run_command
+from core.nmap_parser import parse_hosts, live_hosts as up_hosts
+from core.progress import ProgressTracker, stats_args
 
-def extract_live_hosts(nmap_output: str) -> list:
-    hosts = []
-    for line in nmap_output.splitlines():
-        if line.startswith("Nmap scan report for"):
-            hosts.append(line.split()[-1])
-    return hosts
+# Timeout (secondi) per singola invocazione
+NMAP_TIMEOUT = 3 * 3600
+PROBE_TIMEOUT = 300
 
-def run_with_progress(command: str, description: str):
+# Sharding discovery: i range IPv4 più ampi vengono divisi in blocchi /24
+SHARD_PREFIX = 24
+# Dimensione dei gruppi di host per le fasi successive alla discovery
+HOST_GROUP_MIN = 8
+HOST_GROUP_MAX = 64
+
+# Discovery e reassessment aggiornano il RunStore (baseline): vanno sempre eseguiti
+UNCACHEABLE_STEPS = ("discovery", "reassessment")
+
+KEY_PORTS = [21, 22, 23, 80, 443, 445, 3389, 3306, 5432, 8080]
+
+def extract_live_hosts(nmap_xml: bytes) -> list:
+    """
+    Indirizzi IP degli host attivi da un output nmap XML (-oX -)
+    """
+    return up_hosts(parse_hosts(nmap_xml))
+
+def _with_stats(command: list) -> list:
+    """Aggiunge --stats-every ai comandi nmap per avere progress reali."""
+    if command and command[0] == "nmap" and "--stats-every" not in command:
+        return command[:1] + stats_args() + command[1:]
+    return command
+
+def run_with_progress(command: list, description: str, timeout=NMAP_TIMEOUT, targets=None):
+    """
+    Esegue un comando (argv) sull'executor condiviso.
+    La barra è guidata dalle statistiche reali di nmap (percentuale/ETC)
+    e il completamento è rilevato attendendo il processo.
+    """
+    from tqdm import tqdm
+    with tqdm(
+        total=100,
+        desc=description,
+        bar_format="{l_bar}{bar}| {elapsed}{postfix}"
+    ) as pbar:
+
+        def _update(event):
+            pbar.n = round(event["percent"], 1)
+            if event.get("etc"):
+                pbar.set_postfix_str(f"{event['task']} ETC {event['etc']}", refresh=False)
+            pbar.refresh()
+
+        tracker = ProgressTracker(description, on_update=_update)
+        future = get_executor().submit(
+            _with_stats(command), timeout=timeout, targets=targets, on_line=tracker
+        )
+        try:
+            result = future.result()
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            tracker.finish()
+
+    return result.returncode, result.stdout_text, result.stderr_text
+
+def run_batch_with_progress(commands: list, description: str, timeout=NMAP_TIMEOUT, targets=None):
     """
-    Esegue un comando mostrando una barra di progresso simulata.
+    Esegue più comandi in parallelo sull'executor condiviso.
+    La barra mostra la percentuale media reale dei comandi del batch.
+
+    :param targets: target di ciascun comando (abilita la cache dei risultati)
+    :return: lista di CommandResult nello stesso ordine di commands
     """
+    from tqdm import tqdm
+    executor = get_executor()
+    targets = targets or [None] * len(commands)
+    results = [None] * len(commands)
+
     with tqdm(
         total=100,
         desc=description,
-        bar_format="{l_bar}{bar}| {elapsed}"
+        bar_format="{l_bar}{bar}| {elapsed}{postfix}"
     ) as pbar:
 
-        proc = subprocess.Popen(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+        def _update(event):
+            pbar.n = round(sum(t.last["percent"] for t in trackers) / len(trackers), 1)
+            pbar.set_postfix_str(f"{sum(r is not None for r in results)}/{len(commands)}", refresh=False)
+            pbar.refresh()
+
+        trackers = [
+            ProgressTracker(f"{description} [{i + 1}/{len(commands)}]", on_update=_update)
+            for i in range(len(commands))
+        ]
+        futures = {
+            executor.submit(_with_stats(cmd), timeout=timeout, targets=t, on_line=tracker): i
+            for i, (cmd, t, tracker) in enumerate(zip(commands, targets, trackers))
+        }
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                trackers[i].finish()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    return results
+
+def split_range(network_range: str, prefix: int = SHARD_PREFIX) -> list:
+    """
+    Divide un CIDR IPv4 più ampio di /prefix in sotto-blocchi /prefix.
+    Range non CIDR (es. sintassi nmap 10.0.0.1-50) o IPv6 restano invariati.
+    """
+    try:
+        network = ipaddress.ip_network(network_range, strict=False)
+    except ValueError:
+        return [network_range]
+
+    if network.version != 4 or network.prefixlen >= prefix:
+        return [str(network)]
+    return [str(subnet) for subnet in network.subnets(new_prefix=prefix)]
+
+def host_groups(hosts: list, concurrency: int) -> list:
+    """
+    Suddivide gli host in gruppi di dimensione adattiva:
+    abbastanza gruppi da occupare tutti gli slot dell'executor,
+    ma mai più piccoli di HOST_GROUP_MIN né più grandi di HOST_GROUP_MAX.
+    """
+    if not hosts:
+        return []
+    size = math.ceil(len(hosts) / max(1, concurrency))
+    size = max(HOST_GROUP_MIN, min(HOST_GROUP_MAX, size))
+    return [hosts[i:i + size] for i in range(0, len(hosts), size)]
+
+def host_fingerprint(records: list) -> dict:
+    """
+    Fingerprint di un host: porte chiave aperte con servizio/banner.
+    I record successivi (es. -sV) arricchiscono quelli precedenti.
+
+    :param records: record nmap dello stesso host (vedi core.nmap_parser)
+    :return: dict "tcp/22" -> "ssh OpenSSH 8.9"
+    """
+    fingerprint = {}
+    for record in records:
+        for port in record.get("ports", []):
+            if port["port"] not in KEY_PORTS or port["state"] != "open":
+                continue
+            banner = " ".join(
+                str(v) for v in (port["service"], port["product"], port["version"]) if v
+            )
+            key = f"{port['protocol']}/{port['port']}"
+            if key not in fingerprint or port["product"]:
+                fingerprint[key] = banner
+    return fingerprint
+
+def _exclude_args(context) -> list:
+    """--exclude di nmap per gli IP in excluded_assets (i range li comprendono)."""
+    excluded = []
+    for target in sorted(context.excluded_targets()):
+        try:
+            excluded.append(str(ipaddress.ip_network(target, strict=False)))
+        except ValueError:
+            continue
+    return ["--exclude", ",".join(excluded)] if excluded else []
+
+def _host_discovery(shards: list, cached: bool = True, exclude: list = ()):
+    """
+    Host discovery (-sn) in parallelo su tutti gli shard.
+
+    :param cached: False = nessun riuso dalla cache dei comandi (stato attuale della rete)
+    :param exclude: argomenti --exclude (vedi _exclude_args)
+    :return: (live_hosts, risultato fase, ok)
+    """
+    commands = [["nmap", "-sn", *exclude, "-oX", "-", shard] for shard in shards]
+    outputs = run_batch_with_progress(
+        commands, "🔍 Host discovery",
+        targets=[[shard] for shard in shards] if cached else None
+    )
+
+    # dict come insieme ordinato: deduplica O(1) anche su discovery /16
+    live_hosts = list(dict.fromkeys(
+        host for res in outputs for host in extract_live_hosts(res.stdout)
+    ))
+
+    phase = {
+        "commands": [res.command for res in outputs],
+        "live_hosts": live_hosts,
+        "count": len(live_hosts)
+    }
+    return live_hosts, phase, all(res.ok for res in outputs)
+
+def _advanced_phases(context) -> dict:
+    """
+    Fasi di enumerazione avanzata (service detection, OS, NSE se consentiti)
+    """
+    phases = {
+        "service_detection": (
+            "🧬 Service detection",
+            ["nmap", "-Pn", "-sV", "--version-light"]
+        ),
+        "os_fingerprint": (
+            "🖥 OS fingerprinting",
+            ["nmap", "-Pn", "-O", "--osscan-guess"]
         )
+    }
 
-        # Simulazione avanzamento (realistica)
-        while proc.poll() is None:
-            time.sleep(0.3)
-            if pbar.n < 95:
-                pbar.update(5)
+    if context.is_dos_testing_allowed():
+        phases["safe_scripts"] = (
+            "📜 NSE safe scripts",
+            ["nmap", "-Pn", "-sC", "--script", "safe"]
+        )
+    return phases
 
-        stdout, stderr = proc.communicate()
-        pbar.update(100 - pbar.n)
+def _run_phases(phases: dict, hosts: list, cached: bool = True):
+    """
+    Esegue ciascuna fase su gruppi adattivi di host.
 
-    return proc.returncode, stdout, stderr
+    :param cached: False = nessun riuso dalla cache dei comandi
+    :return: (risultati per fase, ok)
+    """
+    results = {}
+    ok = True
+    groups = host_groups(hosts, get_executor().max_concurrency)
+
+    for key, (desc, base_cmd) in phases.items():
+        outputs = run_batch_with_progress(
+            [base_cmd + ["-oX", "-"] + group for group in groups], desc,
+            targets=groups if cached else None
+        )
+        ok = ok and all(res.ok for res in outputs)
+        results[key] = {
+            "commands": [res.command for res in outputs],
+            "hosts": [h for res in outputs for h in parse_hosts(res.stdout)]
+        }
+    return results, ok
+
+def _index_by_host(results: dict, phases) -> dict:
+    """
+    Riorganizza i record delle fasi per host: ip -> {fase: record}
+    """
+    by_host = {}
+    for phase in phases:
+        for record in results.get(phase, {}).get("hosts", []):
+            if record["address"]:
+                by_host.setdefault(record["address"], {})[phase] = record
+    return by_host
 
 # ==============================
 # Discovery Method [Multi-Phase]
@@ -104,7 +315,10 @@ def discovery(context):
 
     Notes:
         - La funzione non esegue scansioni invasive sull'intera subnet.
-        - Gli scan avanzati sono limitati a un numero controllato di host.
+        - Tutti i range configurati vengono coperti: i CIDR ampi sono
+          divisi in blocchi /24 scansionati in parallelo.
+        - Le fasi successive lavorano su gruppi di host di dimensione
+          adattiva, senza limite fisso al numero di host.
         - L'approccio è coerente con metodologie di penetration testing
           riconosciute (PTES, OSSTMM, NIST SP 800-115).
 
@@ -115,8 +329,6 @@ def discovery(context):
           vengono abilitate solo se esplicitamente consentite.
 
     """
-    from datetime import datetime
-
     network_ranges = context.network_ranges()
     if not network_ranges:
         return {
@@ -125,80 +337,57 @@ def discovery(context):
             "summary": "Nessun network range configurato"
         }
 
-    target = network_ranges[0]
+    shards = [shard for r in network_ranges for shard in split_range(r)]
     results = {}
     overall_status = "success"
 
     # =========================
     # PHASE 1 – HOST DISCOVERY
     # =========================
-    cmd = f"nmap -sn {target}"
-    rc, out, err = run_with_progress(
-        cmd, "🔍 Host discovery"
+    # Sempre una scansione nuova: il risultato diventa la baseline del RunStore
+    live_hosts, results["host_discovery"], ok = _host_discovery(
+        shards, cached=False, exclude=_exclude_args(context)
     )
+    if not ok:
+        overall_status = "partial"
 
-    live_hosts = extract_live_hosts(out)
-
-    results["host_discovery"] = {
-        "command": cmd,
-        "live_hosts": live_hosts,
-        "count": len(live_hosts),
-        "output": out
-    }
-
+    target = ", ".join(network_ranges)
     if not live_hosts:
         return {
-            "status": "success",
+            "status": overall_status,
             "raw": results,
             "summary": f"Nessun host attivo su {target}"
         }
 
-    # Limite professionale
-    live_hosts = live_hosts[:20]
-    targets = " ".join(live_hosts)
-
     # =========================
     # PHASE 2 – KEY PORTS
     # =========================
-    cmd = (
-        f"nmap -Pn -p 21,22,23,80,443,445,3389,3306,5432,8080 "
-        f"--open {targets}"
-    )
-    rc, out, err = run_with_progress(
-        cmd, "🚪 Scansione porte chiave"
-    )
-
-    results["key_ports"] = {
-        "command": cmd,
-        "output": out
+    phases = {
+        "key_ports": (
+            "🚪 Scansione porte chiave",
+            ["nmap", "-Pn", "-p", ",".join(map(str, KEY_PORTS)), "--open"]
+        ),
     }
 
     # =========================
     # PHASE 3 – ADVANCED SCANS
     # =========================
-    advanced_scans = {
-        "service_detection": (
-            "🧬 Service detection",
-            f"nmap -Pn -sV --version-light {targets}"
-        ),
-        "os_fingerprint": (
-            "🖥 OS fingerprinting",
-            f"nmap -Pn -O --osscan-guess {targets}"
-        )
-    }
-
-    if context.is_dos_testing_allowed():
-        advanced_scans["safe_scripts"] = (
-            "📜 NSE safe scripts",
-            f"nmap -Pn -sC --script safe {targets}"
-        )
-
-    for key, (desc, cmd) in advanced_scans.items():
-        rc, out, err = run_with_progress(cmd, desc)
-        results[key] = {
-            "command": cmd,
-            "output": out
+    phases.update(_advanced_phases(context))
+
+    phase_results, ok = _run_phases(phases, live_hosts, cached=False)
+    results.update(phase_results)
+    if not ok:
+        overall_status = "partial"
+
+    # Baseline per la reassessment incrementale
+    by_host = _index_by_host(results, phases)
+    RunStore().save(context.name, {
+        ip: {
+            "fingerprint": host_fingerprint(list(host_phases.values())),
+            "phases": host_phases
         }
+        for ip, host_phases in by_host.items()
+    })
 
     # =========================
     # FINAL RESPONSE
@@ -211,10 +400,112 @@ def discovery(context):
             f"{len(live_hosts)} host analizzati su {target}"
         ),
         "metadata": {
-            "target": target,
+            "target": network_ranges,
+            "shards": shards,
+            "host_groups": len(host_groups(live_hosts, get_executor().max_concurrency)),
             "hosts_analyzed": live_hosts,
             "timestamp": datetime.utcnow().isoformat(),
-            "strategy": "iterative_with_progress"
+            "strategy": "sharded_batched_discovery"
+        }
+    }
+
+# ==============================
+# Incremental Reassessment
+# ==============================
+def reassessment(context):
+    """
+    network.reassessment
+    Reassessment incrementale basato sulla baseline del cliente.
+
+    1. Host discovery su tutti i range
+    2. Pass rapido sulle porte chiave (-sV --version-light) per la fingerprint
+    3. Enumerazione completa solo per host nuovi o con porte/banner cambiati
+    4. Merge con i risultati invariati della baseline, che viene aggiornata
+
+    Senza baseline precedente tutti gli host vengono trattati come nuovi.
+    Nessuna scansione viene riusata dalla cache: il confronto è sempre
+    con lo stato attuale della rete.
+    """
+    network_ranges = context.network_ranges()
+    if not network_ranges:
+        return {
+            "status": "error",
+            "raw": "",
+            "summary": "Nessun network range configurato"
+        }
+
+    store = RunStore()
+    baseline = store.load(context.name)
+    baseline_hosts = baseline.get("hosts", {})
+
+    shards = [shard for r in network_ranges for shard in split_range(r)]
+    results = {}
+    overall_status = "success"
+
+    live_hosts, results["host_discovery"], ok = _host_discovery(
+        shards, cached=False, exclude=_exclude_args(context)
+    )
+    if not ok:
+        overall_status = "partial"
+
+    # Pass rapido: porte chiave + banner
+    quick_phase = {
+        "key_ports": (
+            "🚪 Fingerprint porte chiave",
+            ["nmap", "-Pn", "-p", ",".join(map(str, KEY_PORTS)),
+             "--open", "-sV", "--version-light"]
+        )
+    }
+    quick, ok = _run_phases(quick_phase, live_hosts, cached=False) if live_hosts else ({}, True)
+    if not ok:
+        overall_status = "partial"
+    quick_by_host = _index_by_host(quick, quick_phase)
+
+    fingerprints = {
+        ip: host_fingerprint(list(quick_by_host.get(ip, {}).values()))
+        for ip in live_hosts
+    }
+    changes = diff_hosts(baseline_hosts, fingerprints)
+    rescan = changes["new"] + changes["changed"]
+
+    # Enumerazione completa solo sugli host cambiati
+    phases = _advanced_phases(context)
+    full, ok = _run_phases(phases, rescan, cached=False) if rescan else ({}, True)
+    if not ok:
+        overall_status = "partial"
+    full_by_host = _index_by_host(full, phases)
+
+    merged = {}
+    for ip in live_hosts:
+        if ip in rescan:
+            host_phases = dict(quick_by_host.get(ip, {}))
+            host_phases.update(full_by_host.get(ip, {}))
+        else:
+            host_phases = baseline_hosts[ip].get("phases", {})
+        merged[ip] = {
+            "fingerprint": fingerprints[ip],
+            "phases": host_phases
+        }
+
+    store.save(context.name, merged)
+
+    results["changes"] = changes
+    results["hosts"] = merged
+
+    return {
+        "status": overall_status,
+        "raw": results,
+        "summary": (
+            f"Reassessment incrementale: {len(live_hosts)} host attivi, "
+            f"{len(rescan)} riscansionati, {len(changes['unchanged'])} invariati, "
+            f"{len(changes['gone'])} non più raggiungibili"
+        ),
+        "metadata": {
+            "target": network_ranges,
+            "baseline_timestamp": baseline.get("timestamp"),
+            "rescanned_hosts": rescan,
+            "timestamp": datetime.utcnow().isoformat(),
+            "strategy": "incremental_reassessment"
         }
     }
 
@@ -224,11 +515,13 @@ def portscan(context):
    Scansione porte TCP principali
    """
    target_ip = context.assets.get("endpoint", "192.168.1.1")
-   cmd = f"nmap -sT -Pn --top-ports 1000 {target_ip}"
-   result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+   cmd = ["nmap", "-sT", "-Pn", "--top-ports", "1000", "-oX", "-", target_ip]
+   tracker = ProgressTracker("Port scan TCP")
+   result = run_command(_with_stats(cmd), timeout=NMAP_TIMEOUT, targets=[target_ip], on_line=tracker)
+   tracker.finish()
    return {
-       "status": "success" if result.returncode == 0 else "error",
-       "raw": result.stdout,
+       "status": "success" if result.ok else "error",
+       "raw": parse_hosts(result.stdout),
        "summary": f"Port scan TCP su {target_ip}"
    }
 
@@ -238,11 +531,11 @@ def segmentation(context):
    Verifica segmentazione / percorsi di rete
    """
    target_ip = context.assets.get("gateway_ip", "192.168.1.1")
-   cmd = f"traceroute -d {target_ip}"
-   result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+   cmd = ["traceroute", "-d", target_ip]
+   result = run_command(cmd, timeout=PROBE_TIMEOUT)
    return {
-       "status": "success" if result.returncode == 0 else "error",
-       "raw": result.stdout,
+       "status": "success" if result.ok else "error",
+       "raw": result.stdout_text,
        "summary": "Verifica segmentazione e routing di rete"
    }
 
@@ -251,10 +544,10 @@ def egress(context):
    network.egress
    Verifica comunicazioni in uscita (C2 / data exfiltration)
    """
-   cmd = "powershell -Command \"Test-NetConnection 8.8.8.8 -Port 443\""
-   result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+   cmd = ["powershell", "-Command", "Test-NetConnection 8.8.8.8 -Port 443"]
+   result = run_command(cmd, timeout=PROBE_TIMEOUT)
    return {
        "status": "success",
-       "raw": result.stdout,
+       "raw": result.stdout_text,
        "summary": "Test egress traffic verso Internet"
    }
\ No newline at end of file
@@ -1,13 +1,32 @@
-import subprocess
 """
 Verifica POS (rete / configurazioni) senza exploit distruttivi.
 """
+from core.executor import get_executor
+from core.nmap_parser import parse_hosts
+from modules.pos import prober
+
+NMAP_TIMEOUT = 1800
+
+# Porte sensibili verificate di default sui terminali (SMB, Telnet, RDP, VNC, FTP)
+DEFAULT_SENSITIVE_PORTS = [445, 23, 3389, 5900, 21]
+# Terminali per singola invocazione nmap
+VALIDATION_BATCH_SIZE = 256
+
+def _port_table(ports):
+    """Tabella porte in stile output normale di nmap (PORT STATE SERVICE)."""
+    lines = ["PORT STATE SERVICE"]
+    for p in ports:
+        lines.append(f"{p['port']}/{p['protocol']} {p['state']} {p['service'] or ''}".rstrip())
+    return "\n".join(lines) if ports else ""
 
 def pos_enum(context):
     """
     Enumerazione POS sulla rete:
-    - Effettua ping dei terminali POS
+    - Probe concorrenti dei terminali POS (ICMP, fallback TCP connect)
     - Raccoglie stato reachability + metadata
+
+    Opzioni in assets.pos_systems.probe:
+      parallelism, timeout (secondi per host), tcp_ports, icmp
     """
     pos_list = context.pos_list()
 
@@ -19,22 +38,26 @@ def pos_enum(context):
         }
 
     findings = []
+    targets = [pos for pos in pos_list if pos.get("ip")]
+    options = context.pos_probe_options()
+    outputs = prober.probe_fleet(
+        [pos["ip"] for pos in targets],
+        parallelism=options.get("parallelism", prober.DEFAULT_PARALLELISM),
+        tcp_ports=options.get("tcp_ports", prober.DEFAULT_TCP_PORTS),
+        timeout=options.get("timeout", prober.DEFAULT_TIMEOUT),
+        icmp=options.get("icmp", True)
+    )
 
-    for pos in pos_list:
-        ip = pos.get("ip")
-        if not ip:
-            continue
-
-        cmd = f"ping -c 1 {ip}"
-        res = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-
+    for pos, res in zip(targets, outputs):
         findings.append({
-            "ip": ip,
-            "reachable": res.returncode == 0,
+            "ip": pos["ip"],
+            "reachable": res["reachable"],
+            "method": res["method"],
+            "rtt_ms": res["rtt_ms"],
             "vendor": pos.get("vendor", "unknown"),
             "model": pos.get("model", "unknown"),
             "pci_scope": pos.get("pci_scope", False),
-            "stdout": res.stdout.strip()
+            "stdout": res["stdout"]
         })
 
     return {
@@ -48,11 +71,17 @@ def pos_validation(context):
     Validazione sicurezza POS.
     
     Cosa fa:
-    - Controlla servizi sensibili sui POS (es: SMB su 445)
-    - Raccoglie output Nmap
+    - Controlla servizi sensibili sui POS (SMB, Telnet, RDP, VNC, ...)
+      con una sola invocazione nmap per blocco di terminali
+    - Suddivide l'XML di nmap in record per terminale
     - Indica host sicuro / potenzialmente rischioso
-    
-    Output strutturato per report engine.
+
+    Porte configurabili in assets.pos_systems.sensitive_ports
+    (es. porte di management del vendor).
+
+    Output strutturato per report engine. Status dai return code dei
+    blocchi nmap: "partial" se alcuni falliscono, "error" se falliscono
+    tutti (es. 127 = nmap non installato).
     """
     
     pos_list = context.pos_list()
@@ -65,31 +94,67 @@ def pos_validation(context):
         }
 
     report = []
+    targets = [pos for pos in pos_list if pos.get("ip")]
+    sensitive = sorted({int(p) for p in context.pos_sensitive_ports() or DEFAULT_SENSITIVE_PORTS})
+    port_arg = ",".join(map(str, sensitive))
 
-    for pos in pos_list:
-        ip = pos.get("ip")
-        if not ip:
-            continue
+    ips = list(dict.fromkeys(pos["ip"] for pos in targets))
+    batches = [ips[i:i + VALIDATION_BATCH_SIZE] for i in range(0, len(ips), VALIDATION_BATCH_SIZE)]
+    commands = [["nmap", "-Pn", "-p", port_arg, "-oX", "-", *batch] for batch in batches]
+    outputs = get_executor().run_many(commands, timeout=NMAP_TIMEOUT, targets=batches)
 
-        cmd = f"nmap -Pn -p 445 {ip}"
-        res = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    # XML → record per terminale (indirizzo o hostname indicato in input)
+    hosts = {}
+    batch_of = {}
+    for batch, res in zip(batches, outputs):
+        for ip in batch:
+            batch_of[ip] = res
+        for host in parse_hosts(res.stdout):
+            for name in [host["address"], *host["hostnames"]]:
+                if name:
+                    hosts.setdefault(name, host)
 
-        smb_open = "open" in res.stdout.lower()
+    for pos in targets:
+        ip = pos["ip"]
+        res = batch_of[ip]
+        ports = hosts.get(ip, {}).get("ports", [])
+        open_ports = sorted(p["port"] for p in ports if p["state"] == "open")
 
         report.append({
             "ip": ip,
             "vendor": pos.get("vendor", "unknown"),
             "model": pos.get("model", "unknown"),
             "pci_scope": pos.get("pci_scope", False),
-            "command": cmd,
+            "command": res.command,
             "returncode": res.returncode,
-            "smb_port_open": smb_open,
-            "stdout": res.stdout.strip(),
-            "stderr": res.stderr.strip()
+            "smb_port_open": 445 in open_ports,
+            "open_sensitive_ports": open_ports,
+            "ports": ports,
+            "stdout": _port_table(ports),
+            "stderr": res.stderr_text.strip()
         })
 
+    failed = sum(1 for res in outputs if not res.ok)
+    if outputs and failed == len(outputs):
+        status = "error"
+    elif failed:
+        status = "partial"
+    else:
+        status = "success"
+
+    if status == "error":
+        reason = "nmap non installato" if all(res.returncode == 127 for res in outputs) else "nmap fallito"
+        summary = f"Validazione sicurezza POS non eseguita su {len(report)} host ({reason})."
+    else:
+        summary = (
+            f"Validazione sicurezza POS completata. Analizzati {len(report)} host, "
+            f"{sum(1 for r in report if r['open_sensitive_ports'])} con porte sensibili esposte."
+        )
+        if failed:
+            summary += f" {failed}/{len(outputs)} blocchi nmap falliti."
+
     return {
-        "status": "success",
+        "status": status,
         "raw": report,
-        "summary": f"Validazione sicurezza POS completata. Analizzati {len(report)} host."
+        "summary": summary
     }
\ No newline at end of file
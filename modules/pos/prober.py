@@ -0,0 +1,145 @@
+"""
+Prober di raggiungibilità per flotte POS
+Probe concorrenti con limite di parallelismo e deadline per host:
+  1. ICMP echo (ping) dove consentito
+  2. fallback TCP connect su porte tipiche dei terminali
+Un RST (connessione rifiutata) conta come host raggiungibile.
+I ping non occupano gli slot dell'executor (max_concurrency, pensato per
+nmap): il parallelismo è quello del prober, il ritmo lo dà il budget dello
+scheduler.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import math
+import os
+import time
+from core.executor import get_executor
+from core.scheduler import get_scheduler
+
+DEFAULT_PARALLELISM = 64
+DEFAULT_TIMEOUT = 3.0
+DEFAULT_TCP_PORTS = [80, 443, 22, 23, 445, 3389, 5900, 8443]
+
+
+def _ping_argv(ip, timeout):
+    if os.name == "nt":
+        return ["ping", "-n", "1", "-w", str(int(timeout * 1000)), ip]
+    return ["ping", "-c", "1", "-W", str(max(1, math.ceil(timeout))), ip]
+
+
+async def _icmp_probe(ip, timeout):
+    """
+    Ping sul loop del prober, fuori dal limite di processi dell'executor:
+    finestra oraria e token bucket dello scheduler restano applicati.
+
+    :return: (reachable, stdout) oppure (None, "") se ICMP non è disponibile
+    """
+    res = await get_executor().run_async(_ping_argv(ip, timeout), timeout=timeout + 1, bounded=False)
+    if res.returncode == 127:
+        return None, ""
+    return res.ok, res.stdout_text.strip()
+
+
+async def _tcp_probe(ip, port, timeout):
+    await get_scheduler().throttle_async()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except ConnectionRefusedError:
+        return True
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def _tcp_any(ip, ports, timeout):
+    """Prima porta che risponde (connessione accettata o rifiutata), altrimenti None."""
+    async def _probe(port):
+        return port if await _tcp_probe(ip, port, timeout) else None
+
+    tasks = [asyncio.ensure_future(_probe(p)) for p in ports]
+    try:
+        for future in asyncio.as_completed(tasks):
+            port = await future
+            if port is not None:
+                return port
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return None
+
+
+async def probe_host(ip, tcp_ports=DEFAULT_TCP_PORTS, timeout=DEFAULT_TIMEOUT, icmp=True):
+    """
+    Verifica la raggiungibilità di un host entro la deadline indicata.
+
+    :return: dict {"reachable", "method", "port", "rtt_ms", "stdout"}
+    """
+    started = time.monotonic()
+    result = {"reachable": False, "method": None, "port": None, "rtt_ms": None, "stdout": ""}
+
+    # Con fallback TCP, ICMP usa metà della deadline
+    icmp_timeout = timeout / 2 if tcp_ports else timeout
+
+    async def _probe():
+        if icmp:
+            reachable, stdout = await _icmp_probe(ip, icmp_timeout)
+            result["stdout"] = stdout
+            if reachable:
+                result.update(reachable=True, method="icmp")
+                return
+
+        if tcp_ports:
+            remaining = max(0.1, timeout - (time.monotonic() - started))
+            port = await _tcp_any(ip, tcp_ports, remaining)
+            if port is not None:
+                result.update(reachable=True, method="tcp", port=port)
+
+    try:
+        await asyncio.wait_for(_probe(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+    if result["reachable"]:
+        result["rtt_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+
+async def probe_many(ips, parallelism=DEFAULT_PARALLELISM, **kwargs):
+    """
+    Probe concorrenti con al massimo `parallelism` host in volo.
+
+    :return: lista di risultati nello stesso ordine di ips
+    """
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+
+    async def _bounded(ip):
+        async with semaphore:
+            return await probe_host(ip, **kwargs)
+
+    return await asyncio.gather(*(_bounded(ip) for ip in ips))
+
+
+def probe_fleet(ips, parallelism=DEFAULT_PARALLELISM, tcp_ports=DEFAULT_TCP_PORTS,
+                timeout=DEFAULT_TIMEOUT, icmp=True):
+    """
+    Versione sincrona di probe_many (per gli step dell'orchestrator).
+    Se chiamata da un event loop già attivo (es. Orchestrator.arun_iter)
+    i probe girano su un loop dedicato in un thread worker.
+    """
+    def _run():
+        return asyncio.run(probe_many(
+            ips, parallelism=parallelism, tcp_ports=tcp_ports, timeout=timeout, icmp=icmp
+        ))
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return _run()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(_run).result()
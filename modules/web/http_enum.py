@@ -0,0 +1,164 @@
+"""
+Enumerazione HTTP nativa (requests)
+Molti domini in parallelo con connessioni keep-alive riusate per host
+e rate limit per host. Per ogni URL raccoglie status, redirect, titolo,
+header e security header mancanti.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import html
+import re
+import threading
+import time
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from core.scheduler import get_scheduler
+
+DEFAULT_WORKERS = 16
+DEFAULT_RATE_PER_HOST = 5.0
+DEFAULT_TIMEOUT = 10
+MAX_BODY_BYTES = 64 * 1024
+USER_AGENT = "CyberToolkit/1.0 (security assessment)"
+
+SECURITY_HEADERS = [
+    "Strict-Transport-Security",
+    "Content-Security-Policy",
+    "X-Frame-Options",
+    "X-Content-Type-Options",
+    "Referrer-Policy",
+    "Permissions-Policy"
+]
+
+_TITLE = re.compile(rb"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class HostRateLimiter:
+    """
+    Intervallo minimo tra due richieste verso lo stesso host.
+    """
+
+    def __init__(self, rate_per_host=DEFAULT_RATE_PER_HOST):
+        self.interval = 1.0 / rate_per_host if rate_per_host else 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _targets(domain):
+    """URL da verificare per una voce di assets.web.domains."""
+    if "://" in domain:
+        return [domain]
+    return [f"http://{domain}/", f"https://{domain}/"]
+
+
+def _title(body):
+    match = _TITLE.search(body)
+    if not match:
+        return None
+    text = match.group(1).decode("utf-8", errors="replace")
+    return html.unescape(" ".join(text.split()))[:200] or None
+
+
+class HttpEnumerator:
+    """
+    Motore di enumerazione HTTP condiviso tra i domini di un assessment.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, rate_per_host=DEFAULT_RATE_PER_HOST,
+                 timeout=DEFAULT_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.limiter = HostRateLimiter(rate_per_host)
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.session.verify = False
+        # Un pool keep-alive per host, più connessioni per host quando serve
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=4, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _send(self, method, url):
+        self.limiter.wait(urlsplit(url).hostname)
+        get_scheduler().throttle()
+        return self.session.request(
+            method, url, timeout=self.timeout, allow_redirects=False, stream=True
+        )
+
+    def fetch(self, url, max_redirects=5):
+        """
+        Richiede un URL seguendo i redirect (ognuno soggetto al rate limit).
+
+        :return: dict con status, redirect, titolo, header e security header
+        """
+        record = {"url": url, "status": None, "final_url": url, "redirects": []}
+        response = None
+        try:
+            response = self._send("GET", url)
+            while response.is_redirect and len(record["redirects"]) < max_redirects:
+                location = requests.compat.urljoin(response.url, response.headers["Location"])
+                record["redirects"].append({"status": response.status_code, "location": location})
+                response.close()
+                response = None
+                response = self._send("GET", location)
+
+            body = b""
+            for chunk in response.iter_content(8192):
+                body += chunk
+                if len(body) >= MAX_BODY_BYTES:
+                    break
+        except requests.RequestException as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            return record
+        finally:
+            # Anche su errore: la connessione torna al pool (pool_maxsize per host)
+            if response is not None:
+                response.close()
+
+        headers = dict(response.headers)
+        record.update({
+            "status": response.status_code,
+            "final_url": response.url,
+            "title": _title(body),
+            "server": headers.get("Server"),
+            "headers": headers,
+            "security_headers": {
+                h: response.headers.get(h) for h in SECURITY_HEADERS if h in response.headers
+            },
+            "missing_security_headers": [h for h in SECURITY_HEADERS if h not in response.headers],
+            "elapsed_ms": round(response.elapsed.total_seconds() * 1000, 1)
+        })
+        return record
+
+    def enumerate(self, domains):
+        """
+        Enumera tutti i domini in parallelo.
+
+        :return: lista di dict {"domain", "results": [record per URL]} nell'ordine di input
+                 (domini duplicati enumerati una volta sola)
+        """
+        domains = list(dict.fromkeys(domains))
+        jobs = [(d, url) for d in domains for url in _targets(d)]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            records = list(pool.map(lambda job: self.fetch(job[1]), jobs))
+
+        by_domain = {d: [] for d in domains}
+        for (domain, _), record in zip(jobs, records):
+            by_domain[domain].append(record)
+        return [{"domain": d, "results": by_domain[d]} for d in domains]
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,419 @@
+"""
+Scanner TLS in-process (modulo ssl della stdlib)
+Per ogni dominio/porta:
+  - handshake con SNI: certificato, catena, scadenza, verifica
+  - versioni di protocollo supportate (TLS 1.0 → 1.3)
+  - cipher suite accettate (TLS ≤ 1.2, una per handshake)
+  - OCSP stapling (ClientHello TLS 1.2 con estensione status_request)
+Handshake concorrenti con limite globale; host che condividono
+IP e certificato vengono enumerati una sola volta.
+I certificati non verificati vengono decodificati con cryptography
+(se installato), altrimenti resta il dict di getpeercert() della
+verifica riuscita.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import hashlib
+import os
+import socket
+import ssl
+import struct
+from core.scheduler import get_scheduler
+
+DEFAULT_WORKERS = 32
+DEFAULT_TIMEOUT = 5
+DEFAULT_PORTS = [443]
+
+PROTOCOLS = {
+    "TLSv1.0": ssl.TLSVersion.TLSv1,
+    "TLSv1.1": ssl.TLSVersion.TLSv1_1,
+    "TLSv1.2": ssl.TLSVersion.TLSv1_2,
+    "TLSv1.3": ssl.TLSVersion.TLSv1_3
+}
+WEAK_PROTOCOLS = {"TLSv1.0", "TLSv1.1"}
+# SSLSocket.version() riporta TLS 1.0 come "TLSv1"
+_VERSION_NAMES = {"TLSv1": "TLSv1.0"}
+WEAK_CIPHER_MARKERS = ("RC4", "DES", "NULL", "EXPORT", "MD5", "anon")
+# Cifrari "TLSv1.2" (AEAD, SHA-256/384) non sono negoziabili con TLS 1.0/1.1
+LEGACY_ONLY_PROTOCOLS = {"TLSv1.0", "TLSv1.1"}
+
+# Nomi degli attributi come in ssl.getpeercert()
+_OID_NAMES = {
+    "2.5.4.3": "commonName",
+    "2.5.4.6": "countryName",
+    "2.5.4.7": "localityName",
+    "2.5.4.8": "stateOrProvinceName",
+    "2.5.4.10": "organizationName",
+    "2.5.4.11": "organizationalUnitName",
+    "2.5.4.5": "serialNumber",
+    "1.2.840.113549.1.9.1": "emailAddress"
+}
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _client_context(verify=False, version=None, ciphers="ALL:@SECLEVEL=0"):
+    """
+    SSLContext lato client; version fissa min=max per il probe dei protocolli.
+    """
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if verify:
+        ctx.load_default_certs()
+    else:
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+    if ciphers:
+        ctx.set_ciphers(ciphers)
+    if version is not None:
+        ctx.minimum_version = version
+        ctx.maximum_version = version
+    return ctx
+
+
+def _handshake(ctx, host, port, server_name, timeout):
+    """
+    Esegue un handshake TLS e restituisce l'SSLSocket aperto (da chiudere).
+    """
+    get_scheduler().throttle()
+    sock = socket.create_connection((host, port), timeout=timeout)
+    try:
+        return ctx.wrap_socket(sock, server_hostname=server_name)
+    except BaseException:
+        sock.close()
+        raise
+
+
+def _cert_time(value):
+    """Data nel formato di getpeercert() (es. 'Jun  1 12:00:00 2030 GMT')."""
+    return f"{_MONTHS[value.month - 1]} {value.day:2d} {value:%H:%M:%S %Y} GMT"
+
+
+def _rdns(name):
+    return tuple(
+        tuple((_OID_NAMES.get(a.oid.dotted_string, a.rfc4514_attribute_name), a.value) for a in rdn)
+        for rdn in name.rdns
+    )
+
+
+def _decode_der(der):
+    """
+    Decodifica un certificato DER non verificato nel formato di getpeercert().
+
+    :return: dict (vuoto se cryptography non è installato o il DER non è valido)
+    """
+    try:
+        from cryptography import x509
+    except ImportError:
+        return {}
+    try:
+        cert = x509.load_der_x509_certificate(der)
+        not_before = getattr(cert, "not_valid_before_utc", None) or cert.not_valid_before
+        not_after = getattr(cert, "not_valid_after_utc", None) or cert.not_valid_after
+        info = {
+            "subject": _rdns(cert.subject),
+            "issuer": _rdns(cert.issuer),
+            "notBefore": _cert_time(not_before),
+            "notAfter": _cert_time(not_after)
+        }
+        try:
+            san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+        except x509.ExtensionNotFound:
+            san = None
+        if san is not None:
+            info["subjectAltName"] = tuple(("DNS", v) for v in san.get_values_for_type(x509.DNSName))
+        return info
+    except (TypeError, ValueError):
+        return {}
+
+
+def _name(rdns):
+    return ", ".join(f"{k}={v}" for rdn in rdns or () for k, v in rdn)
+
+
+def _certificate(info, der):
+    not_after = info.get("notAfter")
+    expires = None
+    days_left = None
+    if not_after:
+        ts = ssl.cert_time_to_seconds(not_after)
+        expires = datetime.fromtimestamp(ts, timezone.utc)
+        days_left = (expires - datetime.now(timezone.utc)).days
+    return {
+        "subject": _name(info.get("subject")),
+        "issuer": _name(info.get("issuer")),
+        "san": [v for k, v in info.get("subjectAltName", ()) if k == "DNS"],
+        "not_before": info.get("notBefore"),
+        "not_after": not_after,
+        "expires": expires.isoformat() if expires else None,
+        "days_left": days_left,
+        "expired": days_left is not None and days_left < 0,
+        "sha256": hashlib.sha256(der).hexdigest() if der else None
+    }
+
+
+# =========================
+# Probe elementari
+# =========================
+def probe_certificate(host, port, timeout=DEFAULT_TIMEOUT):
+    """
+    Handshake iniziale: IP, protocollo/cifrario negoziati, certificato e verifica catena.
+    """
+    record = {"host": host, "port": port}
+    try:
+        with _handshake(_client_context(), host, port, host, timeout) as tls:
+            record["ip"] = tls.getpeername()[0]
+            record["negotiated"] = {"protocol": tls.version(), "cipher": tls.cipher()[0]}
+            der = tls.getpeercert(binary_form=True)
+            # Catena completa inviata dal server (Python 3.13+)
+            chain = getattr(tls, "get_unverified_chain", None)
+            if chain is not None:
+                record["chain"] = [_name(_decode_der(c).get("subject")) for c in chain() or []]
+    except (OSError, ssl.SSLError) as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+    try:
+        with _handshake(_client_context(verify=True, ciphers=None), host, port, host, timeout) as tls:
+            info = tls.getpeercert()
+        record["chain_verified"] = True
+    except ssl.SSLCertVerificationError as e:
+        info = _decode_der(der)
+        record["chain_verified"] = False
+        record["verify_error"] = e.verify_message
+    except (OSError, ssl.SSLError) as e:
+        info = _decode_der(der)
+        record["chain_verified"] = False
+        record["verify_error"] = str(e)
+
+    record["certificate"] = _certificate(info, der)
+    return record
+
+
+def probe_protocol(ip, port, server_name, name, timeout=DEFAULT_TIMEOUT):
+    """
+    True/False se il server accetta la versione; None se non determinabile
+    (client locale senza supporto, timeout o connessione interrotta).
+    """
+    try:
+        ctx = _client_context(version=PROTOCOLS[name])
+    except (ValueError, ssl.SSLError):
+        return None
+    try:
+        with _handshake(ctx, ip, port, server_name, timeout) as tls:
+            return _VERSION_NAMES.get(tls.version(), tls.version()) == name
+    except ssl.SSLError as e:
+        # Versione disabilitata dalla policy dell'OpenSSL locale
+        if "NO_PROTOCOLS_AVAILABLE" in str(e):
+            return None
+        return False
+    except OSError:
+        return None
+
+
+def probe_cipher(ip, port, server_name, cipher, protocol="TLSv1.2", timeout=DEFAULT_TIMEOUT):
+    """
+    True se il server accetta il cifrario con la versione indicata
+    (min=max: i cifrari abilitati solo su TLS 1.0/1.1 vengono provati).
+    """
+    try:
+        ctx = _client_context(version=PROTOCOLS[protocol], ciphers=f"{cipher}:@SECLEVEL=0")
+    except (ValueError, ssl.SSLError):
+        return False
+    try:
+        with _handshake(ctx, ip, port, server_name, timeout):
+            return True
+    except (OSError, ssl.SSLError):
+        return False
+
+
+def legacy_ciphers(protocol=None):
+    """
+    Cifrari TLS ≤ 1.2 disponibili nell'OpenSSL locale
+    (solo quelli negoziabili con `protocol`, se indicato).
+    """
+    ctx = _client_context()
+    return [
+        c["name"] for c in ctx.get_ciphers()
+        if c["protocol"] != "TLSv1.3"
+        and not (protocol in LEGACY_ONLY_PROTOCOLS and c["protocol"] == "TLSv1.2")
+    ]
+
+
+# =========================
+# OCSP stapling
+# =========================
+_HELLO_CIPHERS = [
+    0xc02b, 0xc02f, 0xc02c, 0xc030, 0xcca9, 0xcca8, 0xc009, 0xc013,
+    0xc00a, 0xc014, 0x009c, 0x009d, 0x002f, 0x0035
+]
+
+
+def _extension(ext_type, data):
+    return struct.pack("!HH", ext_type, len(data)) + data
+
+
+def _client_hello(server_name):
+    name = server_name.encode("idna")
+    extensions = b"".join([
+        _extension(0x0000, struct.pack("!HBH", len(name) + 3, 0, len(name)) + name),
+        _extension(0x0005, b"\x01\x00\x00\x00\x00"),
+        _extension(0x000a, struct.pack("!HHHH", 6, 0x001d, 0x0017, 0x0018)),
+        _extension(0x000b, b"\x01\x00"),
+        _extension(0x000d, struct.pack("!H", 16) + struct.pack(
+            "!8H", 0x0403, 0x0503, 0x0804, 0x0805, 0x0401, 0x0501, 0x0201, 0x0203
+        ))
+    ])
+    suites = struct.pack(f"!H{len(_HELLO_CIPHERS)}H", len(_HELLO_CIPHERS) * 2, *_HELLO_CIPHERS)
+    body = (
+        b"\x03\x03" + os.urandom(32) + b"\x00" + suites + b"\x01\x00"
+        + struct.pack("!H", len(extensions)) + extensions
+    )
+    handshake = b"\x01" + struct.pack("!I", len(body))[1:] + body
+    return b"\x16\x03\x01" + struct.pack("!H", len(handshake)) + handshake
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connessione chiusa")
+        data += chunk
+    return data
+
+
+def probe_ocsp_stapling(ip, port, server_name, timeout=DEFAULT_TIMEOUT):
+    """
+    Invia un ClientHello TLS 1.2 con status_request e cerca il messaggio
+    CertificateStatus prima di ServerHelloDone.
+
+    :return: True / False, None se non determinabile
+    """
+    get_scheduler().throttle()
+    try:
+        with socket.create_connection((ip, port), timeout=timeout) as sock:
+            sock.sendall(_client_hello(server_name))
+            buffer = b""
+            while True:
+                content_type, _, length = struct.unpack("!BHH", _recv_exact(sock, 5))
+                payload = _recv_exact(sock, length)
+                if content_type == 21:
+                    return None
+                if content_type != 22:
+                    return None
+                buffer += payload
+                while len(buffer) >= 4:
+                    msg_type = buffer[0]
+                    msg_len = int.from_bytes(buffer[1:4], "big")
+                    if len(buffer) < 4 + msg_len:
+                        break
+                    if msg_type == 22:
+                        return True
+                    if msg_type == 14:
+                        return False
+                    buffer = buffer[4 + msg_len:]
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+# =========================
+# Scanner
+# =========================
+class TlsScanner:
+    """
+    Scanner TLS con limite globale di handshake concorrenti.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, ciphers=True):
+        self.workers = workers
+        self.timeout = timeout
+        self.ciphers = ciphers
+
+    def scan(self, domains, ports=DEFAULT_PORTS):
+        """
+        :return: lista di record per (dominio, porta) nell'ordine di input
+        """
+        targets = [(d, p) for d in domains for p in ports]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            records = list(pool.map(
+                lambda t: probe_certificate(t[0], t[1], self.timeout), targets
+            ))
+
+            # Un'enumerazione completa per (IP, porta, certificato)
+            groups = {}
+            for record in records:
+                if "error" in record:
+                    continue
+                key = (record["ip"], record["port"], record["certificate"]["sha256"])
+                groups.setdefault(key, record["host"])
+
+            details = self._enumerate(pool, groups)
+
+        for record in records:
+            if "error" in record:
+                continue
+            key = (record["ip"], record["port"], record["certificate"]["sha256"])
+            record.update(details[key])
+            record["shared_with"] = groups[key] if groups[key] != record["host"] else None
+            record["issues"] = self._issues(record)
+        return records
+
+    def _enumerate(self, pool, groups):
+        keys = list(groups)
+        protocol_jobs = [(k, name) for k in keys for name in PROTOCOLS]
+        protocol_results = pool.map(
+            lambda j: probe_protocol(j[0][0], j[0][1], groups[j[0]], j[1], self.timeout),
+            protocol_jobs
+        )
+        ocsp_results = pool.map(
+            lambda k: probe_ocsp_stapling(k[0], k[1], groups[k], self.timeout), keys
+        )
+
+        details = {k: {"protocols": {}, "ciphers": []} for k in keys}
+        for (key, name), supported in zip(protocol_jobs, protocol_results):
+            details[key]["protocols"][name] = supported
+        for key, stapled in zip(keys, ocsp_results):
+            details[key]["ocsp_stapling"] = stapled
+
+        if self.ciphers:
+            # Cifrari provati su ogni versione ≤ 1.2 accettata dal server
+            names = {name: legacy_ciphers(name) for name in PROTOCOLS if name != "TLSv1.3"}
+            cipher_jobs = [
+                (k, c, name)
+                for k in keys
+                for name in names
+                if details[k]["protocols"][name]
+                for c in names[name]
+            ]
+            accepted = pool.map(
+                lambda j: probe_cipher(j[0][0], j[0][1], groups[j[0]], j[1], j[2], self.timeout),
+                cipher_jobs
+            )
+            by_protocol = {k: {} for k in keys}
+            for (key, cipher, name), ok in zip(cipher_jobs, accepted):
+                if ok:
+                    by_protocol[key].setdefault(name, []).append(cipher)
+            for key in keys:
+                protocols = by_protocol[key]
+                details[key]["ciphers"] = list(dict.fromkeys(c for n in protocols for c in protocols[n]))
+                details[key]["ciphers_by_protocol"] = protocols
+        return details
+
+    @staticmethod
+    def _issues(record):
+        issues = []
+        for name in WEAK_PROTOCOLS:
+            if record["protocols"].get(name):
+                issues.append(f"Protocollo obsoleto abilitato: {name}")
+        weak = [c for c in record["ciphers"] if any(m in c for m in WEAK_CIPHER_MARKERS)]
+        if weak:
+            issues.append(f"Cifrari deboli accettati: {', '.join(weak)}")
+        cert = record["certificate"]
+        if cert["expired"]:
+            issues.append("Certificato scaduto")
+        elif cert["days_left"] is not None and cert["days_left"] < 30:
+            issues.append(f"Certificato in scadenza tra {cert['days_left']} giorni")
+        if not record.get("chain_verified"):
+            issues.append(f"Catena non verificata: {record.get('verify_error')}")
+        if record.get("ocsp_stapling") is False:
+            issues.append("OCSP stapling non attivo")
+        return sorted(issues)
@@ -2,12 +2,17 @@
 Web enumeration & TLS validation
 MITRE: T1190, T1557
 """
-import subprocess
+from urllib.parse import urlsplit
+from modules.web.http_enum import HttpEnumerator, DEFAULT_WORKERS, DEFAULT_RATE_PER_HOST, DEFAULT_TIMEOUT
+from modules.web import tls_scan
 
 def web_enum(context):
    """
    web.web_enum
-   Enumerazione base servizi web
+   Enumerazione HTTP/HTTPS nativa di tutti i domini in parallelo:
+   status, redirect, titolo, header e security header mancanti.
+
+   Opzioni in assets.web.enum: workers, rate_per_host (req/s), timeout
    """
    domain = context.web_domains()
    if not domain:
@@ -16,18 +21,33 @@ def web_enum(context):
            "raw": "",
            "summary": "Nessun dominio web fornito"
        }
-   cmd = f"nmap -p 80,443 --script=http-title,http-headers {domain}"
-   result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+   options = context.web_enum_options()
+   enumerator = HttpEnumerator(
+       workers=options.get("workers", DEFAULT_WORKERS),
+       rate_per_host=options.get("rate_per_host", DEFAULT_RATE_PER_HOST),
+       timeout=options.get("timeout", DEFAULT_TIMEOUT)
+   )
+   try:
+       findings = enumerator.enumerate(domain)
+   finally:
+       enumerator.close()
+
+   reachable = sum(
+       1 for f in findings if any(r["status"] is not None for r in f["results"])
+   )
    return {
        "status": "success",
-       "raw": result.stdout,
-       "summary": f"Enumerazione web su {domain}"
+       "raw": findings,
+       "summary": f"Enumerazione web su {len(domain)} domini ({reachable} raggiungibili)"
    }
 
 def tls_enum(context):
    """
    web.tls_enum
-   Enumerazione TLS / SSL
+   Enumerazione TLS / SSL in-process su tutti i domini e porte:
+   protocolli, cifrari, certificato/catena, scadenza, OCSP stapling.
+
+   Opzioni in assets.web.tls: ports, workers, timeout, ciphers (bool)
    """
    domain = context.web_domains()
    if not domain:
@@ -36,10 +56,18 @@ def tls_enum(context):
            "raw": "",
            "summary": "Nessun dominio per TLS enum"
        }
-   cmd = f"nmap --script ssl-enum-ciphers -p 443 {domain}"
-   result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+   options = context.web_tls_options()
+   hosts = [urlsplit(d).hostname if "://" in d else d for d in domain]
+   scanner = tls_scan.TlsScanner(
+       workers=options.get("workers", tls_scan.DEFAULT_WORKERS),
+       timeout=options.get("timeout", tls_scan.DEFAULT_TIMEOUT),
+       ciphers=options.get("ciphers", True)
+   )
+   findings = scanner.scan(hosts, ports=options.get("ports", tls_scan.DEFAULT_PORTS))
+
+   issues = sum(len(f.get("issues", [])) for f in findings)
    return {
        "status": "success",
-       "raw": result.stdout,
-       "summary": "Enumerazione TLS / cifrari"
+       "raw": findings,
+       "summary": f"Enumerazione TLS / cifrari su {len(findings)} endpoint ({issues} problemi)"
    }
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Test della retention degli artefatti: restano gli store degli ultimi
+run, mai quello del run in corso; i report restano completi.
+"""
+import os
+from core.artifacts import ArtifactStore, prune_runs
+from core.context import Context
+from core.report_engine import write_reports
+
+
+def _runs(log_folder, *timestamps):
+    for ts in timestamps:
+        ArtifactStore(str(log_folder / f"artifacts_{ts}"), threshold=0).put(f"raw {ts}")
+    (log_folder / "log_20250101_000000.txt").write_text("log")
+
+
+def test_prune_keeps_latest_runs(tmp_path):
+    _runs(tmp_path, "20250101_000000", "20250301_000000", "20250201_000000")
+    removed = prune_runs(str(tmp_path), keep=2)
+    assert removed == [str(tmp_path / "artifacts_20250101_000000")]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "artifacts_20250201_000000", "artifacts_20250301_000000", "log_20250101_000000.txt"
+    ]
+
+
+def test_prune_never_removes_current_run(tmp_path):
+    _runs(tmp_path, "20250101_000000", "20250201_000000")
+    current = str(tmp_path / "artifacts_20250101_000000")
+    assert prune_runs(str(tmp_path), keep=1, current=current) == []
+    assert (tmp_path / "artifacts_20250101_000000").is_dir()
+
+
+def test_prune_disabled(tmp_path):
+    _runs(tmp_path, "20250101_000000", "20250201_000000")
+    assert prune_runs(str(tmp_path), keep=0) == []
+    assert prune_runs(str(tmp_path / "missing")) == []
+    assert len(list(tmp_path.glob("artifacts_*"))) == 2
+
+
+def test_reports_survive_pruning(tmp_path):
+    old = ArtifactStore(str(tmp_path / "logs" / "artifacts_20250101_000000"), threshold=0).put("a" * 5000)
+    output = {
+        "results": {"network.network.discovery": {"status": "success", "raw": old, "summary": "ok"}},
+        "mitre_observed": [],
+        "risk_score": {"score": 0, "level": "NONE", "breakdown": {}}
+    }
+    write_reports(Context("Test", "pmi"), output, str(tmp_path / "reports"), name="r")
+    _runs(tmp_path / "logs", "20250201_000000")
+
+    assert prune_runs(str(tmp_path / "logs"), keep=1) == [os.path.dirname(os.path.dirname(old.path))]
+    with open(tmp_path / "reports" / "r_artifacts" / "network_network_discovery.txt", encoding="utf-8") as f:
+        assert f.read() == "a" * 5000
@@ -0,0 +1,90 @@
+"""
+Test della knowledge base ATT&CK: parsing STIX, cache pickle (riuso e
+invalidazione), tabella integrata e lookup delle sotto-tecniche.
+"""
+import json
+import os
+import pytest
+from core import attack_kb
+from core.attack_kb import BUILTIN_TECHNIQUES, load_kb, parse_stix
+
+
+def _technique(tid, name, phases, **extra):
+    return {
+        "type": "attack-pattern", "name": name,
+        "external_references": [{"source_name": "mitre-attack", "external_id": tid}],
+        "kill_chain_phases": [{"kill_chain_name": "mitre-attack", "phase_name": p} for p in phases],
+        **extra
+    }
+
+
+BUNDLE = {"type": "bundle", "objects": [
+    {"type": "x-mitre-tactic", "name": "Execution", "x_mitre_shortname": "execution"},
+    {"type": "x-mitre-tactic", "name": "Command and Control", "x_mitre_shortname": "command-and-control"},
+    _technique("T1059", "Command and Scripting Interpreter", ["execution"]),
+    _technique("T1059.001", "PowerShell", ["execution"]),
+    _technique("T1105", "Ingress Tool Transfer", ["command-and-control", "lateral-movement"]),
+    _technique("T1000", "Revocata", ["execution"], revoked=True),
+    _technique("T1001", "Deprecata", ["execution"], x_mitre_deprecated=True),
+    {"type": "attack-pattern", "name": "Senza id", "external_references": [{"source_name": "capec"}]},
+    {"type": "malware", "name": "ignorato"}
+]}
+
+
+def test_parse_stix():
+    techniques = parse_stix(BUNDLE)
+    assert set(techniques) == {"T1059", "T1059.001", "T1105"}
+    assert techniques["T1059.001"] == ("PowerShell", ("Execution",))
+    # Tattica non definita nel bundle: nome ricavato dallo shortname
+    assert techniques["T1105"] == ("Ingress Tool Transfer", ("Command and Control", "Lateral Movement"))
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    path = tmp_path / "enterprise-attack.json"
+    path.write_text(json.dumps(BUNDLE))
+    return path
+
+
+def test_cache_round_trip_and_invalidation(bundle, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    kb = load_kb(str(bundle), cache_dir)
+    assert kb.source == str(bundle)
+    assert "T1105" in kb and "T1046" in kb  # tecniche integrate sempre presenti
+    assert len(os.listdir(cache_dir)) == 1
+
+    # Seconda lettura dalla cache: nessun parsing del bundle
+    monkeypatch.setattr(attack_kb, "parse_stix", lambda b: pytest.fail("bundle riletto"))
+    cached = load_kb(str(bundle), cache_dir)
+    assert cached.techniques == kb.techniques
+    assert cached.techniques_for("Execution") == kb.techniques_for("Execution")
+    monkeypatch.undo()
+
+    # Bundle modificato → nuova chiave di cache
+    objects = BUNDLE["objects"] + [_technique("T1204", "User Execution", ["execution"])]
+    bundle.write_text(json.dumps({"type": "bundle", "objects": objects}))
+    os.utime(bundle, ns=(1, 1))
+    assert "T1204" in load_kb(str(bundle), cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_builtin_fallback(tmp_path, monkeypatch):
+    monkeypatch.delenv("ATTACK_STIX_BUNDLE", raising=False)
+    kb = load_kb(str(tmp_path / "missing.json"), str(tmp_path / "cache"))
+    assert kb.source == "builtin"
+    assert len(kb) == len(BUILTIN_TECHNIQUES)
+    assert kb.tactics("T1046") == ("Discovery",)
+    assert "T1046" in kb.techniques_for("Discovery")
+    assert not os.path.exists(tmp_path / "cache")
+
+
+def test_subtechnique_lookup(bundle, tmp_path):
+    kb = load_kb(str(bundle), str(tmp_path / "cache"))
+    assert kb.parent("T1059.001") == "T1059"
+    assert kb.parent("T1059.999") == "T1059"
+    assert kb.parent("T1059") == "T1059"
+    assert kb.name("T1059.001") == "PowerShell"
+    # Sotto-tecnica sconosciuta: nome e tattiche ereditati dal padre
+    assert kb.name("T1059.999") == "Command and Scripting Interpreter"
+    assert kb.tactics("T1059.999") == ("Execution",)
+    assert kb.tactics("T9999") == () and kb.name("T9999") is None
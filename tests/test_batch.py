@@ -0,0 +1,94 @@
+"""
+Test del batch mode: status del cliente dagli step e variabili
+Metasploit passate ai worker senza toccare l'ambiente del padre.
+"""
+import json
+import os
+from collections import Counter
+import pytest
+from core import batch, cache, executor, scheduler
+from core.orchestrator import Orchestrator
+
+
+@pytest.mark.parametrize("statuses, expected", [
+    ({"success": 3}, "success"),
+    ({"success": 2, "skipped": 1}, "success"),
+    ({"success": 2, "partial": 1}, "partial"),
+    ({"success": 1, "error": 1}, "partial"),
+    ({"error": 2, "skipped": 1}, "error"),
+    ({}, "success")
+])
+def test_step_status(statuses, expected):
+    assert batch._step_status(Counter(statuses)) == expected
+
+
+def _job(tmp_path):
+    return {
+        "client": "Test", "category": "pmi", "input": "test.yaml",
+        "raw": {"client": {"name": "Test", "category": "pmi"}},
+        "workflow_path": "wf.yaml", "workflow": {"name": "wf", "steps": []},
+        "segment": "default", "bundle": str(tmp_path / "test")
+    }
+
+
+def test_run_client_reports_step_failures(monkeypatch, tmp_path):
+    output = {
+        "results": {
+            "pos.pos.pos_enum": {"status": "success", "raw": [], "summary": "ok"},
+            "network.network.discovery": {"status": "error", "raw": "", "summary": "ko"}
+        },
+        "mitre_observed": [],
+        "risk_score": {"score": 0, "level": "NONE", "breakdown": {}}
+    }
+    monkeypatch.setattr(Orchestrator, "run", lambda self, workflow: output)
+    # Stato globale riconfigurato da run_client
+    monkeypatch.setattr(cache, "_cache", cache._cache)
+    monkeypatch.setattr(scheduler, "_options", dict(scheduler._options))
+    settings = {
+        "max_procs": executor.get_executor().max_concurrency,
+        "cache": {"enabled": False, "directory": str(tmp_path / "cache")}
+    }
+
+    summary = batch.run_client(_job(tmp_path), settings)
+    assert summary["status"] == "partial"
+    assert summary["steps"] == {"success": 1, "error": 1}
+    with open(os.path.join(summary["bundle"], "result.json"), encoding="utf-8") as f:
+        assert json.load(f)["results"] == output["results"]
+
+
+def _worker_env(job, settings):
+    """Eseguita nel worker: ambiente e configurazione del modulo exploits."""
+    from modules.exploits import exploits
+    return {
+        "client": job["client"],
+        "segment": job["segment"],
+        "status": "success",
+        "env": os.environ.get("MSF_RPC_PASSWORD"),
+        "keep": os.environ.get("MSF_KEEP_CONTAINER"),
+        "rpc_password": exploits.RPC_PASSWORD,
+        "keep_container": exploits.KEEP_CONTAINER
+    }
+
+
+def test_msf_settings_only_in_workers(monkeypatch, tmp_path):
+    from modules.exploits import exploits
+    monkeypatch.delenv("MSF_RPC_PASSWORD", raising=False)
+    monkeypatch.delenv("MSF_KEEP_CONTAINER", raising=False)
+    monkeypatch.setattr(exploits, "RPC_PASSWORD", None)
+    monkeypatch.setattr(exploits, "RPC_PASSWORD_FILE", str(tmp_path / "msfrpc_password"))
+    calls = []
+    monkeypatch.setattr(exploits, "ensure_msf_container", lambda **kw: calls.append("start"))
+    monkeypatch.setattr(exploits, "stop_msf_container", lambda **kw: calls.append("stop"))
+    monkeypatch.setattr(batch, "run_client", _worker_env)
+
+    job = _job(tmp_path)
+    job["workflow"] = {"steps": [{"id": "exploits.exploits.metasploit_check"}]}
+    [summary] = batch.BatchRunner(workers=1).run([job])
+
+    assert calls == ["start", "stop"]
+    assert summary["env"] == summary["rpc_password"] == exploits.RPC_PASSWORD
+    assert (tmp_path / "msfrpc_password").read_text() == exploits.RPC_PASSWORD
+    assert summary["keep"] == "1" and summary["keep_container"] is True
+    assert "MSF_RPC_PASSWORD" not in os.environ
+    assert "MSF_KEEP_CONTAINER" not in os.environ
+    assert exploits.KEEP_CONTAINER is False
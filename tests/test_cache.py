@@ -0,0 +1,81 @@
+"""
+Test della cache dei risultati (TTL, LRU, --refresh) e della cache degli
+step nell'Orchestrator (step con stato mai riusati).
+"""
+import os
+import time
+
+from core import cache as cache_module
+from core.cache import ResultCache
+from core.context import Context
+from core.orchestrator import Orchestrator
+from core.plan import ExecutionPlan, PlannedStep
+
+
+def test_roundtrip_and_key_stability(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = cache.make_key("cmd", {"b": 1, "a": [1, 2]})
+    assert key == cache.make_key("cmd", {"a": [1, 2], "b": 1})
+    assert key != cache.make_key("step", {"b": 1, "a": [1, 2]})
+
+    cache.set(key, {"stdout": b"x"})
+    assert cache.get(key) == {"stdout": b"x"}
+    assert cache.get("0" * 64, "missing") == "missing"
+
+
+def test_ttl_expiry(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path), ttl=10)
+    cache.set("ab" * 32, "value")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("ab" * 32) is None
+    assert not os.path.exists(cache._path("ab" * 32))
+
+
+def test_lru_eviction_keeps_recently_read(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 9)
+    keys = [f"{i:02d}" * 32 for i in range(3)]
+    for offset, key in enumerate(keys):
+        cache.set(key, "x" * 1000)
+        os.utime(cache._path(key), (1000 + offset, 1000 + offset))
+    cache.get(keys[0])  # più recente
+
+    cache.max_bytes = 2 * os.path.getsize(cache._path(keys[0]))
+    cache._evict()
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_disabled_and_refresh(tmp_path):
+    ResultCache(str(tmp_path)).set("cd" * 32, 1)
+    assert ResultCache(str(tmp_path), enabled=False).get("cd" * 32) is None
+    refresh = ResultCache(str(tmp_path), refresh=True)
+    assert refresh.get("cd" * 32) is None
+    refresh.set("cd" * 32, 2)
+    assert ResultCache(str(tmp_path)).get("cd" * 32) == 2
+
+
+class _CountingStep:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, context):
+        self.calls += 1
+        return {"status": "success", "raw": "", "summary": str(self.calls)}
+
+
+def _run(tmp_path, cacheable):
+    planned = PlannedStep("test.test.step", (), "m", "f", (), (), (), (), None, cacheable)
+    plan = ExecutionPlan("t", None, (), 1, (planned,))
+    orchestrator = Orchestrator(Context("Test", "pmi"), log_folder=str(tmp_path / "logs"), history_path=None)
+    return orchestrator.run(plan)["results"]["test.test.step"]["summary"]
+
+
+def test_step_cache_skips_uncacheable_steps(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "_cache", ResultCache(str(tmp_path / "cache")))
+    step = _CountingStep()
+    monkeypatch.setattr(PlannedStep, "func", property(lambda self: step))
+
+    assert [_run(tmp_path, True) for _ in range(2)] == ["1", "1"]
+    assert [_run(tmp_path, False) for _ in range(2)] == ["2", "3"]
@@ -0,0 +1,40 @@
+"""
+Test della CLI: default allineati ai moduli e comandi rapidi
+(--list-steps, --validate) senza caricare executor e cache.
+"""
+import os
+import subprocess
+import sys
+import pytest
+import main
+from core import artifacts, cache, executor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import runpy, sys
+sys.argv = ["main.py"] + sys.argv[1:]
+try:
+    runpy.run_path("main.py", run_name="__main__")
+except SystemExit:
+    pass
+loaded = [m for m in ("core.executor", "core.cache", "core.orchestrator", "asyncio") if m in sys.modules]
+print("LOADED=" + ",".join(loaded))
+"""
+
+
+def test_defaults_match_modules():
+    assert main.DEFAULT_MAX_PROCS == executor.DEFAULT_MAX_CONCURRENCY
+    assert main.DEFAULT_CACHE_TTL == cache.DEFAULT_TTL
+    assert main.DEFAULT_CACHE_DIR == cache.DEFAULT_CACHE_DIR
+    assert main.DEFAULT_KEEP_ARTIFACTS == artifacts.DEFAULT_KEEP_RUNS
+
+
+@pytest.mark.parametrize("argv", [["--list-steps"], ["--validate", "workflows/negozio.yaml"]])
+def test_fast_commands_do_not_load_executor(argv):
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE, *argv], cwd=ROOT, capture_output=True, text=True, timeout=60
+    )
+    assert proc.returncode == 0, proc.stderr
+    loaded = proc.stdout.strip().splitlines()[-1]
+    assert loaded == "LOADED=", loaded
@@ -0,0 +1,75 @@
+"""
+Test dell'executor: timeout e cancellazione terminano l'intero process
+group, comando mancante → 127, limite di processi concorrenti.
+"""
+import os
+import threading
+import time
+import pytest
+from core.executor import Executor
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="process group POSIX")
+
+# Il figlio in background resta nel process group di sh: deve morire con lui
+SPAWN_CHILD = ["sh", "-c", "sleep 30 & echo $!; wait"]
+
+
+def _alive(pid):
+    """Processo esistente e non zombie."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] not in ("Z", "X")
+    except FileNotFoundError:
+        return False
+
+
+def _wait_dead(pid, timeout=5):
+    deadline = time.monotonic() + timeout
+    while _alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return not _alive(pid)
+
+
+@pytest.fixture
+def executor():
+    executor = Executor(max_concurrency=2)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="serve /proc")
+def test_timeout_kills_process_group(executor):
+    result = executor.run(SPAWN_CHILD, timeout=0.5)
+    assert result.timed_out and not result.ok
+    assert result.duration < 10
+    assert _wait_dead(int(result.stdout_text.split()[0]))
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="serve /proc")
+def test_cancel_kills_process_group(executor):
+    pids = []
+    started = threading.Event()
+
+    def _on_line(line):
+        pids.append(int(line))
+        started.set()
+
+    future = executor.submit(SPAWN_CHILD, on_line=_on_line)
+    assert started.wait(5)
+    assert future.cancel()
+    assert _wait_dead(pids[0])
+
+
+def test_missing_command_is_127(executor):
+    result = executor.run(["/nonexistent/tool", "-x"])
+    assert result.returncode == 127
+    assert "command not found" in result.stderr_text
+    assert not result.ok
+
+
+def test_concurrency_cap(executor, tmp_path):
+    # Ogni processo conta i processi attivi (file presenti) all'avvio
+    script = f"touch {tmp_path}/$$; ls {tmp_path} | wc -l; sleep 0.3; rm {tmp_path}/$$"
+    results = executor.run_many([["sh", "-c", script]] * 6, timeout=20)
+    assert all(r.ok for r in results)
+    assert max(int(r.stdout_text) for r in results) == 2
@@ -0,0 +1,100 @@
+"""
+Test del risk scoring per host: host dai raw degli step (anche JSON
+testuale e artefatti), porte → Remote Services, criticità e classi.
+"""
+import json
+import pytest
+from core.artifacts import ArtifactStore
+from core.context import Context
+from core.host_risk import HostRiskModel, _walk_hosts
+
+MSF_REPORT = json.dumps({
+    "target": "10.0.0.1",
+    "backend": "msgrpc",
+    "found_cves": ["CVE-2024-0001"],
+    "checks": [{"cve": "CVE-2024-0001", "modules": ["exploit/test"]}]
+}, indent=4)
+
+DISCOVERY = {
+    "target": ["10.0.0.0/24"],
+    "host_discovery": [
+        {"address": "10.0.0.5", "ports": [{"port": 445, "state": "open"}, {"port": 23, "state": "closed"}]},
+        {"address": "10.0.0.6", "ports": [{"port": 22, "state": "filtered"}]}
+    ]
+}
+
+TECHNIQUES = {
+    "network.network.discovery": ["T1046"],
+    "exploits.exploits.metasploit_check": ["T1203"]
+}
+
+
+@pytest.fixture
+def context():
+    return Context("Test", "negozio", assets={"pos_systems": {"list": [
+        {"ip": "10.0.0.5", "pci_scope": True},
+        {"ip": "10.0.0.6"},
+        {"ip": "10.0.0.7", "criticality": "critical"}
+    ]}})
+
+
+def _results(msf_raw=MSF_REPORT):
+    return {
+        "network.network.discovery": {"status": "success", "raw": DISCOVERY},
+        "exploits.exploits.metasploit_check": {"status": "success", "raw": msf_raw}
+    }
+
+
+def test_walk_hosts_json_string():
+    assert _walk_hosts(MSF_REPORT, {}) == {"10.0.0.1": set()}
+    assert _walk_hosts("Nmap scan report for 10.0.0.1", {}) == {}
+    assert _walk_hosts("{non json", {}) == {}
+    assert _walk_hosts(DISCOVERY, {}) == {"10.0.0.5": {445}, "10.0.0.6": set()}
+
+
+def _by_host(scores):
+    return {h["host"]: h for h in scores["hosts"]}
+
+
+def test_scores(context):
+    scores = HostRiskModel.from_results(_results(), TECHNIQUES, context).score()
+    hosts = _by_host(scores)
+
+    # Discovery (2) + Lateral Movement da 445 (4) + bonus tattica critica (5), pci_scope → high x1.5
+    assert hosts["10.0.0.5"]["score"] == 16.5
+    assert hosts["10.0.0.5"]["level"] == "MEDIUM"
+    assert hosts["10.0.0.5"]["techniques"] == ["T1021.002", "T1046"]
+    assert hosts["10.0.0.5"]["criticality"] == "high"
+    # T1203 del report JSON di metasploit_check legato al gateway
+    assert hosts["10.0.0.1"]["techniques"] == ["T1203"]
+    assert hosts["10.0.0.1"]["asset_class"] == "network"
+    assert hosts["10.0.0.1"]["score"] == 4.0
+    assert hosts["10.0.0.6"]["score"] == 2.0
+    # Host in inventario senza osservazioni
+    assert hosts["10.0.0.7"]["score"] == 0.0 and hosts["10.0.0.7"]["level"] == "NONE"
+
+    assert scores["hosts"][0]["host"] == "10.0.0.5"
+    assert scores["overall"] == {"score": 16.5, "level": "MEDIUM"}
+    assert scores["classes"]["pos"] == {"hosts": 3, "max": 16.5, "mean": 6.2}
+    assert scores["classes"]["network"] == {"hosts": 1, "max": 4.0, "mean": 4.0}
+
+
+def test_artifact_raw(context, tmp_path):
+    ref = ArtifactStore(str(tmp_path), threshold=0).put(MSF_REPORT)
+    hosts = _by_host(HostRiskModel.from_results(_results(ref), TECHNIQUES, context).score())
+    assert hosts["10.0.0.1"]["techniques"] == ["T1203"]
+
+
+def test_rescoring_with_other_weights(context):
+    model = HostRiskModel.from_results(_results(), TECHNIQUES, context)
+    hosts = _by_host(model.score(tactic_weights={"Execution": 10}, bonus=0))
+    assert hosts["10.0.0.1"]["score"] == 10.0
+    # Tattiche senza peso indicato → 1
+    assert hosts["10.0.0.5"]["score"] == 3.0
+    capped = _by_host(model.score(tactic_weights={"Execution": 500}))
+    assert capped["10.0.0.1"]["score"] == 100.0
+
+
+def test_skipped_steps_do_not_observe(context):
+    scores = HostRiskModel.from_results(_results(), {"network.network.discovery": ["T1046"]}, context).score()
+    assert "10.0.0.1" not in _by_host(scores)
@@ -0,0 +1,99 @@
+"""
+Test di HttpEnumerator contro un server HTTP locale: redirect, domini
+duplicati e chiusura delle risposte anche su errore.
+"""
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from modules.web.http_enum import HttpEnumerator
+
+
+def _closed_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        if self.path == "/old":
+            self._reply(301, Location="/new")
+        elif self.path == "/broken":
+            self._reply(302, Location=f"http://127.0.0.1:{self.server.dead_port}/")
+        else:
+            self._reply(200, body=b"<html><title> Home  page </title></html>",
+                        **{"X-Frame-Options": "DENY"})
+
+    def _reply(self, status, body=b"", **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.hits = []
+    server.dead_port = _closed_port()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def enumerator():
+    enum = HttpEnumerator(workers=4, rate_per_host=0, timeout=5)
+    responses = []
+    send = enum._send
+
+    def _tracking_send(method, url):
+        response = send(method, url)
+        responses.append(response)
+        return response
+
+    enum._send = _tracking_send
+    enum.responses = responses
+    yield enum
+    enum.close()
+
+
+def test_redirect_and_headers(base_url, enumerator):
+    url, _ = base_url
+    record = enumerator.fetch(f"{url}/old")
+    assert record["status"] == 200
+    assert record["final_url"] == f"{url}/new"
+    assert record["redirects"] == [{"status": 301, "location": f"{url}/new"}]
+    assert record["title"] == "Home page"
+    assert record["security_headers"] == {"X-Frame-Options": "DENY"}
+    assert "X-Frame-Options" not in record["missing_security_headers"]
+    assert all(r.raw.closed for r in enumerator.responses)
+
+
+def test_responses_closed_on_redirect_error(base_url, enumerator):
+    url, _ = base_url
+    record = enumerator.fetch(f"{url}/broken")
+    assert record["status"] is None
+    assert record["error"].startswith("ConnectionError")
+    assert len(record["redirects"]) == 1
+    assert all(r.raw.closed for r in enumerator.responses)
+
+
+def test_duplicate_domains_enumerated_once(base_url, enumerator):
+    url, server = base_url
+    results = enumerator.enumerate([f"{url}/", f"{url}/old", f"{url}/"])
+    assert [r["domain"] for r in results] == [f"{url}/", f"{url}/old"]
+    assert sorted(server.hits) == ["/", "/new", "/old"]
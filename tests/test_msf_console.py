@@ -0,0 +1,101 @@
+"""
+Test del fallback msfconsole: parsing dello spool delle ricerche CVE e
+resource script/copie docker di _console_check (container simulato).
+"""
+import os
+import pytest
+from core.executor import CommandResult
+from modules.exploits import exploits
+from modules.exploits.exploits import SEARCH_MARKER, parse_search_output
+
+VULNS = """\
+[*] Time: 2026-10-18 10:00:00 UTC Vuln: host=10.0.0.1 name=ssh-vuln refs=CVE-2023-38408,CVE-2016-6210
+[*] Time: 2026-10-18 10:00:01 UTC Vuln: host=10.0.0.1 name=http-vuln refs=CVE-2021-41773
+[*] Time: 2026-10-18 10:00:02 UTC Vuln: host=10.0.0.1 name=dup refs=CVE-2021-41773
+"""
+
+SEARCH = f"""\
+[*] Spooling to file /tmp/cybertoolkit_x/msf_search.txt...
+{SEARCH_MARKER}CVE-2016-6210
+
+Matching Modules
+================
+
+   #  Name                                     Disclosure Date  Rank    Check  Description
+   -  ----                                     ---------------  ----    -----  -----------
+   0  auxiliary/scanner/ssh/ssh_enumusers      1998-07-17       normal  No     SSH Username Enumeration
+
+{SEARCH_MARKER}CVE-2021-41773
+
+Matching Modules
+================
+
+   #  Name                                                Disclosure Date  Rank       Check  Description
+   0  exploit/multi/http/apache_normalize_path_rce        2021-05-10       excellent  Yes    Apache 2.4.49/2.4.50 RCE
+   1  auxiliary/scanner/http/apache_normalize_path        2021-05-10       normal     No     Apache Path Traversal
+   2  exploit/multi/http/apache_normalize_path_rce        2021-05-10       excellent  Yes    duplicato
+
+{SEARCH_MARKER}CVE-2023-38408
+[-] No results from search
+"""
+
+
+def test_parse_search_output():
+    mapping = parse_search_output(SEARCH)
+    assert list(mapping) == ["CVE-2016-6210", "CVE-2021-41773", "CVE-2023-38408"]
+    assert mapping["CVE-2016-6210"]["modules"] == ["auxiliary/scanner/ssh/ssh_enumusers"]
+    assert mapping["CVE-2021-41773"]["modules"] == [
+        "auxiliary/scanner/http/apache_normalize_path",
+        "exploit/multi/http/apache_normalize_path_rce"
+    ]
+    assert mapping["CVE-2023-38408"] == {"modules": [], "result": "[-] No results from search"}
+    # Righe prima del primo marker ignorate
+    assert "Spooling" not in mapping["CVE-2016-6210"]["result"]
+    assert parse_search_output("") == {}
+
+
+@pytest.fixture
+def container(monkeypatch, tmp_path):
+    """Container simulato: docker cp dal container scrive gli spool di fixture."""
+    spools = {"msf_vuln.txt": VULNS, "msf_search.txt": SEARCH}
+    calls = {"commands": [], "consoles": []}
+
+    def _run_command(argv, timeout=None):
+        calls["commands"].append(argv)
+        if argv[:2] == ["docker", "cp"] and argv[2].startswith("metasploit2:"):
+            name = os.path.basename(argv[2])
+            if name in spools:
+                with open(os.path.join(argv[3], name), "w") as f:
+                    f.write(spools[name])
+        return CommandResult(argv, 0)
+
+    monkeypatch.setattr(exploits, "run_command", _run_command)
+    monkeypatch.setattr(exploits, "_msfconsole", lambda name, script: calls["consoles"].append(script))
+    run_dir = tmp_path / "msf_abc"
+    run_dir.mkdir()
+    return calls, spools, str(run_dir)
+
+
+def test_console_check(container):
+    calls, _, run_dir = container
+    cve_list, results = exploits._console_check("metasploit2", run_dir)
+
+    assert cve_list == ["CVE-2016-6210", "CVE-2021-41773", "CVE-2023-38408"]
+    assert [r["cve"] for r in results] == cve_list
+    assert results[1]["modules"][0] == "auxiliary/scanner/http/apache_normalize_path"
+    assert results[2]["modules"] == [] and "No results" in results[2]["result"]
+
+    # Due sole invocazioni di msfconsole, file nella cartella del run
+    assert calls["consoles"] == ["/tmp/cybertoolkit_msf_abc/import.rc", "/tmp/cybertoolkit_msf_abc/search.rc"]
+    with open(os.path.join(run_dir, "search.rc")) as f:
+        script = f.read()
+    assert script.count("search cve:") == 3
+    assert f"print_line('{SEARCH_MARKER}CVE-2021-41773')" in script
+    assert calls["commands"][-1] == ["docker", "exec", "metasploit2", "rm", "-rf", "/tmp/cybertoolkit_msf_abc"]
+
+
+def test_console_check_without_vulns(container):
+    calls, spools, run_dir = container
+    spools["msf_vuln.txt"] = "[*] Time: 2026-10-18 No vulns\n"
+    assert exploits._console_check("metasploit2", run_dir) == ([], [])
+    assert calls["consoles"] == ["/tmp/cybertoolkit_msf_abc/import.rc"]
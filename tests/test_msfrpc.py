@@ -0,0 +1,188 @@
+"""
+Test del client msgrpc contro un server RPC fittizio (HTTP + msgpack):
+token scaduto, credenziali errate, msfrpcd già in ascolto, password
+persistita tra i run e fallback su msfconsole registrato nel report.
+"""
+import json
+import os
+import stat
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import msgpack
+import pytest
+from modules.exploits import exploits, msfrpc
+from core.context import Context
+from core.executor import CommandResult
+from modules.exploits.msfrpc import MsfRpcAuthError, MsfRpcClient, MsfRpcError
+
+USER = "msf"
+PASSWORD = "s3cret"
+
+
+def _error(message, code, error_class="Msf::RPC::Exception"):
+    return {"error": True, "error_class": error_class, "error_code": code,
+            "error_string": message, "error_message": message}
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        request = msgpack.unpackb(self.rfile.read(int(self.headers["Content-Length"])), raw=False)
+        code, body = self.server.dispatch(request)
+        data = msgpack.packb(body, use_bin_type=True)
+        self.send_response(code)
+        self.send_header("Content-Type", "binary/message-pack")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _RpcServer(ThreadingHTTPServer):
+    """msfrpcd fittizio: token monouso se expire_tokens è attivo."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.tokens = set()
+        self.logins = 0
+        self.calls = []
+        self.expire_tokens = False
+        self._lock = threading.Lock()
+
+    def dispatch(self, request):
+        method, *args = request
+        with self._lock:
+            if method == "auth.login":
+                if args != [USER, PASSWORD]:
+                    return 401, _error("Login Failed", 401)
+                self.logins += 1
+                token = f"TEMP{self.logins}"
+                self.tokens.add(token)
+                return 200, {"result": "success", "token": token}
+            token, *params = args
+            if token not in self.tokens:
+                return 401, _error("Invalid Authentication Token", 401)
+            if self.expire_tokens:
+                self.tokens.discard(token)
+            self.calls.append(method)
+            if method == "core.version":
+                return 200, {"version": "6.4.0"}
+            if method == "module.search":
+                # Messaggio che contiene "token" ma non è un errore di autenticazione
+                return 500, _error("Invalid search token: " + str(params[0]), 500, "ArgumentError")
+            return 200, {"result": "success"}
+
+
+@pytest.fixture
+def server():
+    srv = _RpcServer()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    msfrpc.close_clients()
+
+
+def _client(server, password=PASSWORD):
+    return MsfRpcClient("127.0.0.1", server.server_address[1], USER, password, timeout=5)
+
+
+def test_call_reauthenticates_on_expired_token(server):
+    client = _client(server)
+    server.expire_tokens = True
+    assert client.version() == {"version": "6.4.0"}
+    assert client.version() == {"version": "6.4.0"}
+    assert server.logins == 2
+    client.close()
+
+
+def test_error_mentioning_token_is_not_retried(server):
+    client = _client(server)
+    with pytest.raises(MsfRpcError) as info:
+        client.search("cve:CVE-2024-0001")
+    assert info.value.code == 500
+    assert info.value.error_class == "ArgumentError"
+    assert not isinstance(info.value, MsfRpcAuthError)
+    assert server.logins == 1
+    assert server.calls == ["module.search"]
+
+
+def test_login_with_wrong_password(server):
+    with pytest.raises(MsfRpcAuthError) as info:
+        _client(server, password="wrong").login()
+    assert info.value.auth_failed
+    assert server.logins == 0
+
+
+def _use_server(monkeypatch, server, password):
+    monkeypatch.setattr(exploits, "RPC_HOST", "127.0.0.1")
+    monkeypatch.setattr(exploits, "RPC_PORT", server.server_address[1])
+    monkeypatch.setattr(exploits, "RPC_USER", USER)
+    monkeypatch.setattr(exploits, "RPC_PASSWORD", password)
+
+    def _no_docker(*args, **kwargs):
+        raise AssertionError("msfrpcd già in ascolto: nessun avvio atteso")
+
+    monkeypatch.setattr(exploits, "run_command", _no_docker)
+
+
+def test_ensure_msf_rpc_reuses_listening_daemon(monkeypatch, server):
+    _use_server(monkeypatch, server, PASSWORD)
+    client = exploits.ensure_msf_rpc()
+    assert client.token == "TEMP1"
+    assert exploits.ensure_msf_rpc() is client
+
+
+def test_ensure_msf_rpc_fails_fast_on_auth_failure(monkeypatch, server):
+    _use_server(monkeypatch, server, "wrong")
+    monkeypatch.setattr(exploits, "sleep", lambda s: pytest.fail("nessun retry atteso"))
+    with pytest.raises(MsfRpcAuthError, match="MSF_RPC_PASSWORD"):
+        exploits.ensure_msf_rpc()
+
+
+def test_clients_are_keyed_by_password(server):
+    port = server.server_address[1]
+    client = msfrpc.get_client("127.0.0.1", port, USER, PASSWORD, timeout=5)
+    assert msfrpc.get_client("127.0.0.1", port, USER, PASSWORD, timeout=5) is client
+    with pytest.raises(MsfRpcAuthError):
+        msfrpc.get_client("127.0.0.1", port, USER, "wrong", timeout=5)
+
+
+def test_generated_password_is_persisted(monkeypatch, tmp_path):
+    path = tmp_path / "state" / "msfrpc_password"
+    monkeypatch.setattr(exploits, "RPC_PASSWORD_FILE", str(path))
+    monkeypatch.setattr(exploits, "RPC_PASSWORD", None)
+    password = exploits.rpc_password()
+    assert password and path.read_text() == password
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    # Run successivo (nuovo processo): stessa password dal file
+    monkeypatch.setattr(exploits, "RPC_PASSWORD", None)
+    assert exploits.rpc_password() == password
+
+    # MSF_RPC_PASSWORD ha la precedenza
+    monkeypatch.setattr(exploits, "RPC_PASSWORD", "da-env")
+    assert exploits.rpc_password() == "da-env"
+
+
+def test_console_fallback_is_reported(monkeypatch):
+    monkeypatch.setattr(exploits, "ensure_msf_container", lambda **kw: None)
+    monkeypatch.setattr(exploits, "_register_cleanup", lambda name: None)
+    monkeypatch.setattr(exploits, "run_command", lambda argv, **kw: CommandResult(argv, 0))
+
+    def _auth_failure(container):
+        raise MsfRpcAuthError("Login Failed", code=401)
+
+    monkeypatch.setattr(exploits, "ensure_msf_rpc", _auth_failure)
+    monkeypatch.setattr(exploits, "_console_check", lambda container, run_dir: (["CVE-2024-0001"], []))
+    context = Context("Test", "pmi", assets={"network": {"gateways": ["10.0.0.1"]}})
+
+    result = exploits.metasploit_check(context)
+    report = json.loads(result["raw"])
+    assert report["backend"] == "msfconsole"
+    assert report["rpc_error"] == "MsfRpcAuthError: Login Failed"
+    assert "RPC non disponibile" in result["summary"]
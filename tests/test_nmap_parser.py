@@ -0,0 +1,52 @@
+"""
+Test del parser XML di nmap (streaming, XML troncato).
+"""
+from core.nmap_parser import iter_hosts, live_hosts, open_ports, parse_hosts
+
+XML = b"""<?xml version="1.0"?>
+<nmaprun scanner="nmap">
+<host><status state="up"/>
+  <address addr="10.0.0.5" addrtype="ipv4"/><address addr="AA:BB:CC:DD:EE:FF" addrtype="mac"/>
+  <hostnames><hostname name="pos1.local"/><hostname name="pos1.local"/></hostnames>
+  <ports>
+    <port protocol="tcp" portid="22"><state state="open"/><service name="ssh" product="OpenSSH" version="9.6"/></port>
+    <port protocol="tcp" portid="443"><state state="filtered"/>
+      <script id="ssl-cert" output="CN=pos1"/></port>
+  </ports>
+  <os><osmatch name="Linux 5.X" accuracy="96"/></os>
+</host>
+<host><status state="down"/><address addr="10.0.0.6" addrtype="ipv4"/></host>
+</nmaprun>
+"""
+
+
+def test_host_records():
+    hosts = parse_hosts(XML)
+    assert [h["address"] for h in hosts] == ["10.0.0.5", "10.0.0.6"]
+
+    first = hosts[0]
+    assert first["mac"] == "AA:BB:CC:DD:EE:FF"
+    assert first["hostnames"] == ["pos1.local"]
+    assert first["os"] == [{"name": "Linux 5.X", "accuracy": 96}]
+    assert first["ports"][0] == {
+        "port": 22, "protocol": "tcp", "state": "open",
+        "service": "ssh", "product": "OpenSSH", "version": "9.6"
+    }
+    assert first["ports"][1]["scripts"] == {"ssl-cert": "CN=pos1"}
+
+
+def test_live_hosts_and_open_ports():
+    hosts = parse_hosts(XML)
+    assert live_hosts(hosts) == ["10.0.0.5"]
+    assert [p["port"] for p in open_ports(hosts[0])] == [22]
+
+
+def test_truncated_xml_keeps_complete_hosts():
+    truncated = XML[:XML.index(b"<host><status state=\"down\"")] + b"<host><status sta"
+    assert [h["address"] for h in iter_hosts(truncated)] == ["10.0.0.5"]
+
+
+def test_file_source(tmp_path):
+    path = tmp_path / "scan.xml"
+    path.write_bytes(XML)
+    assert len(parse_hosts(str(path))) == 2
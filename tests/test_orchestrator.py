@@ -0,0 +1,113 @@
+"""
+Test dell'API in streaming dell'Orchestrator: ordine degli eventi,
+interruzione da parte del consumer ed errori propagati da arun_iter.
+"""
+import asyncio
+import json
+import pytest
+from core import orchestrator as orchestrator_module, scheduler
+from core.context import Context
+from core.orchestrator import Orchestrator
+from core.plan import ExecutionPlan, PlannedStep
+
+
+class _FakeOrchestrator(Orchestrator):
+    """Step simulati, storico rischio su un path fittizio."""
+
+    def __init__(self, tmp_path):
+        super().__init__(Context("Test", "pmi"), log_folder=str(tmp_path / "logs"),
+                         history_path=str(tmp_path / "history.db"))
+
+    def _execute_step(self, planned):
+        return {"status": "success", "raw": "", "summary": planned.id}, True
+
+
+def _plan():
+    steps = (
+        PlannedStep("a", (), "m", "f", (), ("T1046",), (), (), None),
+        PlannedStep("b", ("a",), "m", "f", (), ("T1595",), (), (), None),
+        PlannedStep("c", ("b",), "m", "f", (), (), (), (), "Asset mancanti: pos_list")
+    )
+    return ExecutionPlan("t", None, (), 1, steps)
+
+
+@pytest.fixture
+def history(monkeypatch):
+    """Scritture sullo storico rischio registrate invece che su SQLite."""
+    recorded = []
+
+    class _History:
+        def record(self, client, run_id, risk_score, **kw):
+            recorded.append((client, run_id))
+
+    monkeypatch.setattr(orchestrator_module, "get_history", lambda path: _History())
+    # Stato globale dello scheduler riconfigurato da for_context/release
+    monkeypatch.setattr(scheduler, "_scheduler", scheduler._scheduler)
+    monkeypatch.setattr(scheduler, "_active_runs", 0)
+    return recorded
+
+
+def _events(path):
+    with open(path, encoding="utf-8") as f:
+        return [record["type"] for record in map(json.loads, f)]
+
+
+def test_run_iter_event_order(tmp_path, history):
+    orchestrator = _FakeOrchestrator(tmp_path)
+    events = list(orchestrator.run_iter(_plan()))
+
+    assert [e["event"] for e in events] == ["run_start", "step", "step", "step", "run_end"]
+    assert events[0]["skipped"] == {"c": "Asset mancanti: pos_list"}
+    steps = events[1:4]
+    assert [e["step"] for e in steps] == ["a", "b", "c"]
+    assert [e["completed"] for e in steps] == [1, 2, 3]
+    assert steps[0]["mitre_observed"] == ["T1046"]
+    assert steps[2]["result"]["status"] == "skipped"
+    assert events[-1]["output"]["mitre_observed"] == ["T1046", "T1595"]
+    assert history == [("Test", orchestrator.run_id)]
+    assert scheduler._active_runs == 0
+
+
+def test_consumer_break_closes_run(tmp_path, history):
+    orchestrator = _FakeOrchestrator(tmp_path)
+    iterator = orchestrator.run_iter(_plan())
+    for event in iterator:
+        if event["event"] == "step":
+            assert scheduler._active_runs == 1
+            break
+    iterator.close()
+
+    assert scheduler._active_runs == 0
+    assert orchestrator.run_log._thread is None
+    assert history == []
+    types = _events(orchestrator.run_log.json_path)
+    assert types[-1] == "run_aborted" and "run_end" not in types
+
+
+def test_arun_iter_streams_events(tmp_path, history):
+    async def _collect():
+        return [e["event"] async for e in _FakeOrchestrator(tmp_path).arun_iter(_plan())]
+
+    assert asyncio.run(_collect()) == ["run_start", "step", "step", "step", "run_end"]
+
+
+def test_arun_iter_propagates_errors(tmp_path, history):
+    class _Broken(_FakeOrchestrator):
+        def _iter_steps(self, steps, workers):
+            raise RuntimeError("pool esaurito")
+            yield
+
+    async def _consume():
+        async for _ in _Broken(tmp_path).arun_iter(_plan()):
+            pass
+
+    with pytest.raises(RuntimeError, match="pool esaurito"):
+        asyncio.run(_consume())
+    assert scheduler._active_runs == 0
+
+    async def _invalid():
+        async for _ in _FakeOrchestrator(tmp_path).arun_iter({"steps": ["network.network.nope"]}):
+            pass
+
+    with pytest.raises(ValueError, match="Workflow non valido"):
+        asyncio.run(_invalid())
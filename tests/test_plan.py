@@ -0,0 +1,133 @@
+"""
+Test di compilazione e binding dei piani: target dal Context, step
+saltati per asset mancanti o esclusi, cache dei workflow compilati.
+"""
+import pytest
+from core import cache, plan
+from core.context import Context
+from core.orchestrator import Orchestrator
+from core.plan import ExecutionPlan, PlannedStep, as_plan, build_plan, compile_workflow
+
+WORKFLOW = {
+    "name": "Test",
+    "mitre_scope": ["Discovery"],
+    "steps": [
+        "network.network.discovery",
+        {"id": "pos.pos.pos_enum", "depends_on": ["network.network.discovery"]},
+        {"id": "pos.pos.pos_validation", "depends_on": ["pos.pos.pos_enum"]},
+        {"id": "web.web.web_enum", "depends_on": ["network.network.discovery"]},
+        {"id": "exploits.exploits.metasploit_check", "depends_on": ["network.network.discovery"]}
+    ]
+}
+
+
+def _context(**constraints):
+    return Context("Test", "negozio", assets={
+        "network": {"ranges": ["10.0.0.0/24"], "gateways": ["10.0.0.1"]},
+        "pos_systems": {"list": [
+            {"ip": "10.0.0.5", "vendor": "Ingenico"},
+            {"ip": "10.0.0.6"},
+            {"vendor": "senza ip"}
+        ]}
+    }, extra={"constraints": constraints})
+
+
+def _steps(execution_plan):
+    return {s.id: s for s in execution_plan.steps}
+
+
+def test_compile_workflow():
+    compiled = compile_workflow(WORKFLOW, source="test.yaml")
+    assert compiled["plan_version"] == plan.PLAN_VERSION
+    assert compiled["source"] == "test.yaml"
+    steps = {s["id"]: s for s in compiled["steps"]}
+    assert steps["pos.pos.pos_enum"]["requires"] == ["pos_list"]
+    assert steps["pos.pos.pos_validation"]["depends_on"] == ["pos.pos.pos_enum"]
+    assert steps["network.network.discovery"]["cacheable"] is False
+    assert steps["pos.pos.pos_enum"]["cacheable"] is True
+
+
+def test_compile_rejects_unknown_steps():
+    with pytest.raises(ValueError, match="Workflow non valido"):
+        compile_workflow({"steps": ["network.network.nope"]})
+
+
+def test_build_plan_targets_and_skips():
+    execution_plan = build_plan(compile_workflow(WORKFLOW), _context())
+    assert isinstance(execution_plan, ExecutionPlan)
+    assert execution_plan.name == "Test"
+    assert execution_plan.mitre_scope == ("Discovery",)
+
+    steps = _steps(execution_plan)
+    assert [s.id for s in execution_plan.steps] == [
+        "network.network.discovery", "pos.pos.pos_enum", "pos.pos.pos_validation",
+        "web.web.web_enum", "exploits.exploits.metasploit_check"
+    ]
+    assert steps["network.network.discovery"].targets == ("10.0.0.0/24",)
+    assert steps["pos.pos.pos_enum"].targets == ("10.0.0.5", "10.0.0.6")
+    assert steps["pos.pos.pos_validation"].depends_on == ("pos.pos.pos_enum",)
+    assert steps["web.web.web_enum"].skip == "Asset mancanti: web_domains"
+    assert not steps["web.web.web_enum"].runnable
+    assert steps["exploits.exploits.metasploit_check"].runnable
+    assert not steps["exploits.exploits.metasploit_check"].cacheable
+
+
+def test_build_plan_ignores_nameless_assets():
+    context = Context("Test", "negozio", assets={"pos_systems": {"list": [{"vendor": "x"}]}})
+    step = _steps(build_plan(compile_workflow(WORKFLOW), context))["pos.pos.pos_enum"]
+    assert step.skip == "Asset mancanti: pos_list"
+
+
+def test_build_plan_excluded_assets():
+    context = _context(excluded_assets=[{"ip": "10.0.0.1"}, {"ip": "10.0.0.5"}])
+    steps = _steps(build_plan(compile_workflow(WORKFLOW), context))
+    assert steps["exploits.exploits.metasploit_check"].skip == "Tutti i target sono in excluded_assets"
+    assert steps["pos.pos.pos_enum"].targets == ("10.0.0.6",)
+
+
+def test_context_without_excluded_assets():
+    context = _context(excluded_assets=[{"ip": "10.0.0.1"}, "10.0.0.5", {"name": "shop.example"}])
+    assert context.excluded_targets() == {"10.0.0.1", "10.0.0.5", "shop.example"}
+    scan = context.without_excluded()
+    assert scan.network_gateways() == []
+    assert scan.network_ranges() == ["10.0.0.0/24"]
+    assert scan.pos_list() == [{"ip": "10.0.0.6"}, {"vendor": "senza ip"}]
+    # Il contesto originale non cambia
+    assert len(context.pos_list()) == 3
+    assert _context().without_excluded().assets == _context().assets
+
+
+def test_steps_do_not_receive_excluded_assets(monkeypatch, tmp_path):
+    scanned = []
+    monkeypatch.setattr(cache, "_cache", cache.ResultCache(str(tmp_path / "cache"), enabled=False))
+    monkeypatch.setattr(PlannedStep, "func", property(
+        lambda self: lambda context: scanned.extend(p.get("ip") for p in context.pos_list()) or {}
+    ))
+    context = _context(excluded_assets=[{"ip": "10.0.0.5"}])
+    execution_plan = build_plan(compile_workflow({"steps": ["pos.pos.pos_enum"]}), context)
+    Orchestrator(context, log_folder=str(tmp_path), history_path=None).run(execution_plan)
+    assert scanned == ["10.0.0.6", None]
+
+
+def test_as_plan_accepts_every_form():
+    context = _context()
+    compiled = compile_workflow(WORKFLOW)
+    execution_plan = build_plan(compiled, context)
+    assert as_plan(execution_plan, context) is execution_plan
+    assert as_plan(compiled, context) == execution_plan
+    assert as_plan(WORKFLOW, context) == execution_plan
+
+
+def test_load_workflow_uses_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(plan, "PLAN_CACHE_DIR", str(tmp_path / "plans"))
+    path = tmp_path / "wf.yaml"
+    path.write_text("name: Cached\nsteps:\n - network.network.discovery\n")
+
+    first = plan.load_workflow(str(path))
+    monkeypatch.setattr(plan, "compile_workflow", lambda *a, **kw: pytest.fail("ricompilato"))
+    assert plan.load_workflow(str(path)) == first
+    assert first["name"] == "Cached" and first["source"] == str(path)
+
+    path.write_text("name: Changed\nsteps:\n - network.network.discovery\n")
+    with pytest.raises(pytest.fail.Exception):
+        plan.load_workflow(str(path))
@@ -0,0 +1,80 @@
+"""
+Test di pos_validation: record per terminale e status dai return code
+dei blocchi nmap.
+"""
+import pytest
+from core.context import Context
+from core.executor import CommandResult
+from modules.pos import pos
+
+XML = b"""<?xml version="1.0"?>
+<nmaprun>%s</nmaprun>
+"""
+HOST = (
+    '<host><status state="up"/><address addr="%s" addrtype="ipv4"/><ports>'
+    '<port protocol="tcp" portid="445"><state state="%s"/><service name="microsoft-ds"/></port>'
+    '<port protocol="tcp" portid="23"><state state="closed"/><service name="telnet"/></port>'
+    '</ports></host>'
+)
+
+
+class _FakeExecutor:
+
+    def __init__(self, returncodes):
+        self.returncodes = returncodes
+        self.batches = []
+
+    def run_many(self, commands, timeout=None, targets=None):
+        self.batches.extend(targets)
+        results = []
+        for argv, batch, rc in zip(commands, targets, self.returncodes):
+            hosts = b"".join(HOST.encode() % (ip.encode(), b"open" if ip.endswith(".1") else b"filtered")
+                             for ip in batch)
+            stdout = XML % hosts if rc == 0 else b""
+            stderr = b"" if rc == 0 else b"nmap: command not found"
+            results.append(CommandResult(argv, rc, stdout, stderr))
+        return results
+
+
+@pytest.fixture
+def context(monkeypatch):
+    monkeypatch.setattr(pos, "VALIDATION_BATCH_SIZE", 2)
+    return Context("Test", "negozio", assets={"pos_systems": {"list": [
+        {"ip": "10.0.0.1", "vendor": "Ingenico"},
+        {"ip": "10.0.0.2"},
+        {"ip": "10.0.0.3"},
+        {"vendor": "senza ip"}
+    ]}})
+
+
+def _run(monkeypatch, context, returncodes):
+    executor = _FakeExecutor(returncodes)
+    monkeypatch.setattr(pos, "get_executor", lambda: executor)
+    return pos.pos_validation(context), executor
+
+
+def test_success(monkeypatch, context):
+    result, executor = _run(monkeypatch, context, [0, 0])
+    assert executor.batches == [["10.0.0.1", "10.0.0.2"], ["10.0.0.3"]]
+    assert result["status"] == "success"
+    first, second, _ = result["raw"]
+    assert first["smb_port_open"] and first["open_sensitive_ports"] == [445]
+    assert first["stdout"] == "PORT STATE SERVICE\n445/tcp open microsoft-ds\n23/tcp closed telnet"
+    assert not second["smb_port_open"]
+    assert "1 con porte sensibili" in result["summary"]
+
+
+def test_partial_when_a_batch_fails(monkeypatch, context):
+    result, _ = _run(monkeypatch, context, [0, 1])
+    assert result["status"] == "partial"
+    assert result["raw"][2]["returncode"] == 1
+    assert result["raw"][2]["stdout"] == ""
+    assert "1/2 blocchi nmap falliti" in result["summary"]
+
+
+def test_error_when_nmap_is_missing(monkeypatch, context):
+    result, _ = _run(monkeypatch, context, [127, 127])
+    assert result["status"] == "error"
+    assert "nmap non installato" in result["summary"]
+    assert [r["returncode"] for r in result["raw"]] == [127, 127, 127]
+    assert result["raw"][0]["stderr"] == "nmap: command not found"
@@ -0,0 +1,107 @@
+"""
+Test del prober POS su listener locali (127.0.0.0/8): fallback ICMP → TCP,
+RST come host raggiungibile, porte filtrate come irraggiungibili.
+"""
+import asyncio
+import socket
+import pytest
+from modules.pos import prober
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(8)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+@pytest.fixture
+def closed_port():
+    """Porta senza listener: il kernel risponde con RST."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _icmp(reachable):
+    async def _probe(ip, timeout):
+        return reachable, "ping"
+    return _probe
+
+
+def _probe(ip, **kwargs):
+    return asyncio.run(prober.probe_host(ip, **kwargs))
+
+
+def test_icmp_success_skips_tcp(monkeypatch):
+    monkeypatch.setattr(prober, "_icmp_probe", _icmp(True))
+    result = _probe("127.0.0.1", tcp_ports=[9], timeout=1)
+    assert result["reachable"] and result["method"] == "icmp"
+    assert result["port"] is None
+    assert result["stdout"] == "ping"
+
+
+def test_icmp_failure_falls_back_to_tcp(monkeypatch, listener):
+    monkeypatch.setattr(prober, "_icmp_probe", _icmp(False))
+    result = _probe("127.0.0.2", tcp_ports=[listener], timeout=2)
+    assert result["reachable"] and result["method"] == "tcp"
+    assert result["port"] == listener
+    assert result["rtt_ms"] is not None
+
+
+def test_missing_ping_binary_falls_back_to_tcp(monkeypatch, listener):
+    monkeypatch.setattr(prober, "_ping_argv", lambda ip, timeout: ["cybertoolkit-no-ping", ip])
+    result = _probe("127.0.0.1", tcp_ports=[listener], timeout=2)
+    assert result["method"] == "tcp"
+    assert result["stdout"] == ""
+
+
+def test_rst_counts_as_reachable(closed_port):
+    result = _probe("127.0.0.1", tcp_ports=[closed_port], timeout=2, icmp=False)
+    assert result["reachable"] and result["port"] == closed_port
+
+
+def test_filtered_port_is_unreachable(monkeypatch):
+    async def _filtered(ip, port):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(prober.asyncio, "open_connection", _filtered)
+    result = _probe("127.0.0.1", tcp_ports=[80, 443], timeout=0.3, icmp=False)
+    assert result == {"reachable": False, "method": None, "port": None, "rtt_ms": None, "stdout": ""}
+
+
+def test_unreachable_network_error(monkeypatch):
+    async def _unreachable(ip, port):
+        raise OSError(113, "No route to host")
+
+    monkeypatch.setattr(prober.asyncio, "open_connection", _unreachable)
+    assert not _probe("127.0.0.1", tcp_ports=[80], timeout=1, icmp=False)["reachable"]
+
+
+def test_probe_fleet_keeps_order(listener):
+    results = prober.probe_fleet(["127.0.0.1", "127.0.0.3"], tcp_ports=[listener], timeout=2, icmp=False)
+    assert [r["reachable"] for r in results] == [True, True]
+
+
+def test_probe_fleet_inside_running_loop(listener):
+    async def _step():
+        return prober.probe_fleet(["127.0.0.1"], tcp_ports=[listener], timeout=2, icmp=False)
+
+    [result] = asyncio.run(_step())
+    assert result["method"] == "tcp" and result["port"] == listener
+
+
+def test_icmp_probes_bypass_executor_cap(monkeypatch, tmp_path):
+    """Con max_concurrency=1 i ping restano comunque paralleli (limite del prober)."""
+    from core import executor
+
+    monkeypatch.setattr(executor, "_executor", executor.Executor(max_concurrency=1))
+    script = f"touch {tmp_path}/$0; sleep 0.5; ls {tmp_path} | wc -l; exit 1"
+    monkeypatch.setattr(prober, "_ping_argv", lambda ip, timeout: ["sh", "-c", script, ip])
+    ips = ["127.0.0.1", "127.0.0.2", "127.0.0.3", "127.0.0.4"]
+    results = asyncio.run(prober.probe_many(ips, tcp_ports=[], timeout=5))
+    assert [int(r["stdout"]) for r in results] == [4, 4, 4, 4]
@@ -0,0 +1,69 @@
+"""
+Test del parsing del progresso di nmap (XML, testo, fine task) e del bus.
+"""
+import time
+from core.progress import ProgressBus, ProgressTracker, parse_progress
+
+
+def test_xml_taskprogress():
+    etc = 1700000000
+    line = (f'<taskprogress task="SYN Stealth Scan" time="1699999990" percent="45.50" '
+            f'remaining="6" etc="{etc}"/>')
+    assert parse_progress(line) == {
+        "task": "SYN Stealth Scan",
+        "percent": 45.5,
+        "remaining": 6,
+        "etc": time.strftime("%H:%M", time.localtime(etc))
+    }
+
+
+def test_xml_taskprogress_without_eta():
+    progress = parse_progress('<taskprogress task="Ping Scan" time="1" percent="3.00"/>')
+    assert progress == {"task": "Ping Scan", "percent": 3.0, "remaining": None, "etc": None}
+
+
+def test_text_timing():
+    line = "SYN Stealth Scan Timing: About 45.50% done; ETC: 14:32 (0:01:06 remaining)\n"
+    assert parse_progress(line) == {
+        "task": "SYN Stealth Scan",
+        "percent": 45.5,
+        "remaining": 66,
+        "etc": "14:32"
+    }
+
+
+def test_text_timing_without_eta():
+    progress = parse_progress("Service scan Timing: About 0.00% done")
+    assert progress["task"] == "Service scan"
+    assert progress["percent"] == 0.0
+    assert progress["remaining"] is None
+
+
+def test_task_end_xml_and_text():
+    xml = parse_progress('<taskend task="Ping Scan" time="1700000000" extrainfo="4 total hosts"/>')
+    text = parse_progress("Completed SYN Stealth Scan at 14:32, 6.02s elapsed (1000 total ports)")
+    assert xml == {"task": "Ping Scan", "percent": 100.0, "remaining": 0, "etc": None}
+    assert text["task"] == "SYN Stealth Scan"
+    assert text["percent"] == 100.0
+
+
+def test_unrelated_lines():
+    for line in ("", "Nmap scan report for 10.0.0.1", "22/tcp open  ssh",
+                 '<port protocol="tcp" portid="22"><state state="open"/></port>'):
+        assert parse_progress(line) is None
+
+
+def test_tracker_publishes_to_bus():
+    bus = ProgressBus()
+    events = []
+    bus.subscribe(events.append)
+    tracker = ProgressTracker("nmap 10.0.0.0/24", bus=bus)
+
+    tracker("Nmap scan report for 10.0.0.1")
+    tracker("Ping Scan Timing: About 50.00% done")
+    assert bus.overall() == 50.0
+
+    tracker.finish()
+    assert [e["done"] for e in events] == [False, True]
+    assert events[-1]["percent"] == 100.0
+    assert bus.overall() is None
@@ -0,0 +1,140 @@
+"""
+Test della reassessment incrementale: due run successivi confrontati
+tramite la baseline salvata nel RunStore.
+"""
+import pytest
+
+from core.baseline_engine import RunStore, diff_hosts
+from core.context import Context
+from core.executor import CommandResult
+from core.registry import get_registry
+from modules.network import network
+
+
+def _record(ip, ports):
+    return {
+        "address": ip, "status": "up", "hostnames": [], "mac": None, "os": [],
+        "ports": [
+            {"port": port, "protocol": "tcp", "state": "open",
+             "service": service, "product": product, "version": None}
+            for port, (service, product) in ports.items()
+        ]
+    }
+
+
+@pytest.fixture
+def fake_network(monkeypatch, tmp_path):
+    """Rete simulata: {ip: {porta: (servizio, prodotto)}} e fasi nmap registrate."""
+    monkeypatch.chdir(tmp_path)
+    state = {"hosts": {}, "scanned": [], "cached": []}
+
+    def _host_discovery(shards, cached=True, exclude=()):
+        state["cached"].append(cached)
+        state["exclude"] = list(exclude)
+        live = list(state["hosts"])
+        return live, {"live_hosts": live, "count": len(live)}, True
+
+    def _run_phases(phases, hosts, cached=True):
+        state["cached"].append(cached)
+        state["scanned"].append((tuple(phases), list(hosts)))
+        records = [_record(ip, state["hosts"][ip]) for ip in hosts]
+        return {phase: {"commands": [], "hosts": records} for phase in phases}, True
+
+    monkeypatch.setattr(network, "_host_discovery", _host_discovery)
+    monkeypatch.setattr(network, "_run_phases", _run_phases)
+    return state
+
+
+CONTEXT = Context("Acme", "pmi", assets={"network": {"ranges": ["10.0.0.0/24"]}})
+
+
+def test_second_run_diffs_against_stored_baseline(fake_network):
+    fake_network["hosts"] = {
+        "10.0.0.1": {22: ("ssh", "OpenSSH")},
+        "10.0.0.2": {80: ("http", "nginx")},
+        "10.0.0.3": {445: ("microsoft-ds", None)},
+    }
+    first = network.reassessment(CONTEXT)
+    assert sorted(first["raw"]["changes"]["new"]) == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+
+    # Secondo run: .2 cambia banner, .3 sparisce, .4 è nuovo
+    fake_network["hosts"] = {
+        "10.0.0.1": {22: ("ssh", "OpenSSH")},
+        "10.0.0.2": {80: ("http", "Apache")},
+        "10.0.0.4": {3389: ("ms-wbt-server", None)},
+    }
+    fake_network["scanned"].clear()
+    second = network.reassessment(CONTEXT)
+
+    changes = second["raw"]["changes"]
+    assert changes == {"new": ["10.0.0.4"], "changed": ["10.0.0.2"],
+                       "gone": ["10.0.0.3"], "unchanged": ["10.0.0.1"]}
+    # Enumerazione completa solo sugli host nuovi/cambiati
+    assert sorted(fake_network["scanned"][-1][1]) == ["10.0.0.2", "10.0.0.4"]
+    assert second["metadata"]["baseline_timestamp"] is not None
+
+    # La baseline riflette il secondo run (host invariati ripresi dalla precedente)
+    baseline = RunStore().load("Acme")["hosts"]
+    assert sorted(baseline) == ["10.0.0.1", "10.0.0.2", "10.0.0.4"]
+    assert baseline["10.0.0.2"]["fingerprint"] == {"tcp/80": "http Apache"}
+    assert not any(fake_network["cached"])
+
+
+def test_discovery_baseline_is_never_cached(fake_network):
+    fake_network["hosts"] = {"10.0.0.1": {22: ("ssh", "OpenSSH")}}
+    result = network.discovery(CONTEXT)
+    assert result["metadata"]["hosts_analyzed"] == ["10.0.0.1"]
+    assert fake_network["cached"] == [False, False]
+    assert RunStore().load("Acme")["hosts"]["10.0.0.1"]["fingerprint"] == {"tcp/22": "ssh OpenSSH"}
+
+
+def test_reassessment_diffs_against_fresh_discovery(fake_network):
+    fake_network["hosts"] = {"10.0.0.1": {22: ("ssh", "OpenSSH")}, "10.0.0.2": {80: ("http", "nginx")}}
+    network.discovery(CONTEXT)
+
+    fake_network["hosts"] = {"10.0.0.1": {22: ("ssh", "OpenSSH 9")}, "10.0.0.2": {80: ("http", "nginx")}}
+    changes = network.reassessment(CONTEXT)["raw"]["changes"]
+    assert changes == {"new": [], "changed": ["10.0.0.1"], "gone": [], "unchanged": ["10.0.0.2"]}
+    # Né la baseline né il confronto vengono dalla cache dei comandi
+    assert not any(fake_network["cached"])
+
+
+def _sn_xml(*ips):
+    hosts = "".join(f'<host><status state="up"/><address addr="{ip}" addrtype="ipv4"/></host>' for ip in ips)
+    return f"<nmaprun>{hosts}</nmaprun>".encode()
+
+
+def test_host_discovery_dedupes_in_order(monkeypatch):
+    outputs = [
+        CommandResult(["nmap"], 0, _sn_xml("10.0.1.7", "10.0.0.1")),
+        CommandResult(["nmap"], 0, _sn_xml("10.0.0.1", "10.0.2.3", "10.0.1.7"))
+    ]
+    monkeypatch.setattr(network, "run_batch_with_progress", lambda commands, desc, targets=None: outputs)
+    live, phase, ok = network._host_discovery(["10.0.1.0/24", "10.0.2.0/24"], cached=False)
+    assert live == ["10.0.1.7", "10.0.0.1", "10.0.2.3"]
+    assert phase["count"] == 3 and ok
+
+
+def test_discovery_excludes_excluded_assets(fake_network):
+    fake_network["hosts"] = {"10.0.0.1": {22: ("ssh", "OpenSSH")}}
+    context = Context("Acme", "pmi", assets={"network": {"ranges": ["10.0.0.0/24"]}}, extra={
+        "constraints": {"excluded_assets": [{"ip": "10.0.0.5"}, "10.0.0.9", {"name": "nas.local"}]}
+    })
+    network.discovery(context)
+    assert fake_network["exclude"] == ["--exclude", "10.0.0.5/32,10.0.0.9/32"]
+    network.reassessment(context)
+    assert fake_network["exclude"] == ["--exclude", "10.0.0.5/32,10.0.0.9/32"]
+
+
+def test_diff_hosts():
+    baseline = {"a": {"fingerprint": {"tcp/22": "ssh"}}, "b": {"fingerprint": {}}}
+    assert diff_hosts(baseline, {"a": {"tcp/22": "ssh"}, "c": {}}) == {
+        "new": ["c"], "changed": [], "gone": ["b"], "unchanged": ["a"]
+    }
+
+
+def test_stateful_network_steps_are_not_cacheable():
+    registry = get_registry()
+    assert registry.get("network.network.reassessment")["cacheable"] is False
+    assert registry.get("network.network.discovery")["cacheable"] is False
+    assert registry.get("network.network.portscan")["cacheable"] is True
@@ -0,0 +1,70 @@
+"""
+Test dell'export dei raw nei report: raw piccoli inline, artefatti solo
+sopra la soglia dello store, ArtifactRef decompressi accanto al report.
+"""
+import json
+import os
+import shutil
+from core.artifacts import SPILL_THRESHOLD, ArtifactStore
+from core.context import Context
+from core.report_engine import export_raw, write_reports
+
+
+def test_small_raw_stays_inline(tmp_path):
+    raw = "x" * 3000
+    path = str(tmp_path / "a" / "step.txt")
+    assert export_raw(raw, limit=100, artifact_path=path) == (raw, False, None)
+    assert not os.path.exists(path)
+    # Senza artifact_path resta la sola anteprima troncata
+    assert export_raw(raw, limit=100) == ("x" * 100, True, None)
+
+
+def test_large_raw_written(tmp_path):
+    raw = {"hosts": ["10.0.0.%d" % i for i in range(SPILL_THRESHOLD)]}
+    path = str(tmp_path / "a" / "step.json")
+    preview, truncated, written = export_raw(raw, limit=100, artifact_path=path)
+    assert truncated and written == path and len(preview) == 100
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == raw
+
+
+def test_artifact_ref_is_copied(tmp_path):
+    ref = ArtifactStore(str(tmp_path / "logs"), threshold=0).put("y" * 5000)
+    path = str(tmp_path / "a" / "step.txt")
+    preview, truncated, written = export_raw(ref, limit=100, artifact_path=path)
+    assert (preview, truncated, written) == ("y" * 100, True, path)
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "y" * 5000
+
+    os.remove(ref.path)
+    preview, truncated, linked = export_raw(ref, artifact_path=path)
+    assert "artefatto non disponibile" in preview and linked is None
+
+
+def test_write_reports_links(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ref_raw = {"hosts": ["z" * 5000]}
+    ref = ArtifactStore("logs/artifacts_1", threshold=0).put(ref_raw)
+    output = {
+        "results": {
+            "network.network.discovery": {"status": "success", "raw": "piccolo", "summary": "ok"},
+            "pos.pos.pos_enum": {"status": "success", "raw": ref, "summary": "ok"}
+        },
+        "mitre_observed": [],
+        "risk_score": {"score": 0, "level": "NONE", "breakdown": {}}
+    }
+    paths = write_reports(Context("Test", "pmi"), output, "reports", formats=("md", "json"), name="r")
+
+    assert os.listdir("reports/r_artifacts") == ["pos_pos_pos_enum.json"]
+    with open(paths["json"], encoding="utf-8") as f:
+        steps = json.load(f)["results"]
+    assert steps["network.network.discovery"]["raw"] == {"preview": "piccolo", "truncated": False, "artifact": None}
+    link = "r_artifacts/pos_pos_pos_enum.json"
+    assert steps["pos.pos.pos_enum"]["raw"]["artifact"] == link
+    with open(paths["md"], encoding="utf-8") as f:
+        assert f"[{link}]({link})" in f.read()
+
+    # Il report resta completo anche senza i log del run
+    shutil.rmtree("logs")
+    with open("reports/" + link, encoding="utf-8") as f:
+        assert json.load(f) == ref_raw
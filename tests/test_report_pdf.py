@@ -0,0 +1,53 @@
+"""
+Test del report PDF: grafici in timeout o in errore registrati nel run
+log, report scritto comunque.
+"""
+import json
+from concurrent.futures import Future
+from core import report_pdf
+from core.context import Context
+from core.report_engine import write_reports
+from core.run_log import RunLog
+
+OUTPUT = {
+    "results": {"network.network.discovery": {"status": "success", "raw": "", "summary": "ok"}},
+    "mitre_observed": ["T1046"],
+    "risk_score": {"score": 10, "level": "LOW", "breakdown": {"Discovery": 1}}
+}
+
+
+def test_chart_failures_in_run_log(monkeypatch, tmp_path):
+    monkeypatch.setattr(report_pdf, "CHART_TIMEOUT", 0.05)
+    failed = Future()
+    failed.set_exception(RuntimeError("matplotlib rotto"))
+    charts = {"risk_gauge": Future(), "tactics": failed}
+    run_log = RunLog(str(tmp_path / "logs"), "log_test")
+
+    paths = write_reports(
+        Context("Test", "pmi"), OUTPUT, str(tmp_path / "reports"),
+        formats=("pdf",), name="r", charts=charts, run_log=run_log
+    )
+    run_log.close()
+
+    assert (tmp_path / "reports" / "r.pdf").stat().st_size > 0
+    assert charts["risk_gauge"].cancelled()
+    with open(run_log.json_path, encoding="utf-8") as f:
+        events = {e["chart"]: e for e in map(json.loads, f) if e["type"] == "chart_error"}
+    assert events["risk_gauge"]["error"] == "timeout dopo 0.05s"
+    assert events["tactics"]["error"] == "RuntimeError: matplotlib rotto"
+    assert events["tactics"]["report"] == paths["pdf"]
+
+
+def test_artifacts_note_only_when_written(monkeypatch, tmp_path):
+    seen = []
+    monkeypatch.setattr(report_pdf, "write_pdf", lambda path, *a, artifacts_dir=None, **kw: seen.append(artifacts_dir))
+    big = dict(OUTPUT, results={"network.network.discovery": {"status": "success", "raw": "x" * 200_000}})
+    context = Context("Test", "pmi")
+
+    write_reports(context, big, str(tmp_path), formats=("pdf",), name="solo", charts={})
+    write_reports(context, OUTPUT, str(tmp_path), formats=("pdf", "md"), name="piccolo", charts={})
+    write_reports(context, big, str(tmp_path), formats=("pdf", "md"), name="grande", charts={})
+
+    assert seen[:2] == [None, None]
+    assert seen[2] == str(tmp_path / "grande_artifacts")
+    assert not (tmp_path / "solo_artifacts").exists()
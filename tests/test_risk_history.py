@@ -0,0 +1,81 @@
+"""
+Test delle query dello storico rischio: cronologia, finestra mobile,
+downsampling per periodo e trend per tattica.
+"""
+from datetime import datetime
+import pytest
+from core.risk_history import RiskHistory
+
+
+def _risk(score, breakdown=None):
+    return {"score": score, "level": "LOW", "breakdown": breakdown or {}}
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = RiskHistory(str(tmp_path / "history.db"))
+    store.record_many([
+        {"client": "Bar", "run_id": 1, "timestamp": datetime(2025, 1, 10), "risk_score": _risk(10)},
+        {"client": "Shop", "run_id": 1, "timestamp": datetime(2025, 1, 5),
+         "risk_score": _risk(20, {"Discovery": 2}), "techniques": ["T1046", "T1046", "T1595"]},
+        {"client": "Shop", "run_id": 2, "timestamp": datetime(2025, 2, 20),
+         "risk_score": _risk(40, {"Discovery": 3, "Execution": 1}), "host_score": 12.5},
+        {"client": "Shop", "run_id": 3, "timestamp": datetime(2025, 2, 1),
+         "risk_score": _risk(30, {"Discovery": 1})},
+        {"client": "Shop", "run_id": 4, "timestamp": datetime(2025, 4, 2), "risk_score": _risk(25)},
+    ])
+    yield store
+    store.close()
+
+
+def test_record_and_history(history):
+    assert history.clients() == ["Bar", "Shop"]
+    runs = history.history("Shop")
+    assert [r["run_id"] for r in runs] == ["1", "3", "2", "4"]
+    assert runs[2]["host_score"] == 12.5
+    assert history.techniques(runs[0]["id"]) == ["T1046", "T1595"]
+
+    window = history.history("Shop", since=datetime(2025, 2, 1), until=datetime(2025, 4, 2))
+    assert [r["score"] for r in window] == [30, 40]
+    assert len(history.history("Shop", limit=2)) == 2
+
+    aid = history.record("Bar", "x", _risk(5), timestamp=datetime(2025, 3, 1))
+    assert history.history("Bar")[-1]["id"] == aid
+
+
+def test_rolling_window(history):
+    stats = history.rolling("Shop", window_days=60, now=datetime(2025, 3, 1))
+    assert stats == {
+        "runs": 3, "min": 20, "max": 40, "avg": 30.0, "current": 40,
+        "first": datetime(2025, 1, 5), "last": datetime(2025, 2, 20)
+    }
+    empty = history.rolling("Shop", window_days=10, now=datetime(2024, 1, 1))
+    assert empty["runs"] == 0 and empty["avg"] is None and empty["current"] is None
+
+
+@pytest.mark.parametrize("bucket, expected", [
+    ("month", [("2025-01", 1, 20.0), ("2025-02", 2, 35.0), ("2025-04", 1, 25.0)]),
+    ("quarter", [("2025-Q1", 3, 30.0), ("2025-Q2", 1, 25.0)]),
+    ("year", [("2025", 4, 28.75)])
+])
+def test_downsample(history, bucket, expected):
+    rows = history.downsample("Shop", bucket=bucket)
+    assert [(r["period"], r["runs"], r["avg"]) for r in rows] == expected
+
+
+def test_downsample_filters_and_validation(history):
+    rows = history.downsample("Shop", bucket="month", since=datetime(2025, 2, 1), until=datetime(2025, 3, 1))
+    assert rows == [{"period": "2025-02", "runs": 2, "min": 30, "max": 40, "avg": 35.0}]
+    with pytest.raises(ValueError, match="Periodo non supportato"):
+        history.downsample("Shop", bucket="hour")
+
+
+def test_tactic_trend(history):
+    assert history.tactic_trend("Shop", "Discovery") == [
+        {"period": "2025-01", "count": 2},
+        {"period": "2025-02", "count": 4}
+    ]
+    assert history.tactic_trend("Shop", "Execution", bucket="quarter") == [{"period": "2025-Q1", "count": 1}]
+    assert history.tactic_trend("Shop", "Discovery", since=datetime(2025, 2, 10)) == [
+        {"period": "2025-02", "count": 3}
+    ]
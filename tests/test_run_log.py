@@ -0,0 +1,53 @@
+"""
+Test del run log: record JSONL nell'ordine di accodamento, campi comuni,
+flush a fine step e non sui record di progress.
+"""
+import json
+from core.artifacts import ArtifactStore
+from core.run_log import RunLog
+
+
+def _records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_jsonl_records_in_order(tmp_path):
+    run_log = RunLog(str(tmp_path), "log_test", fields={"run_id": "r1", "client": "Test"})
+    ref = ArtifactStore(str(tmp_path / "artifacts"), threshold=0).put("x" * 100)
+    run_log.write_event("run_start", workflow="wf")
+    run_log.write_step("a", {"status": "success", "raw": {"hosts": ["10.0.0.1"]}, "summary": "ok"})
+    run_log.write_event("progress", task="SYN Stealth Scan", percent=50.0)
+    run_log.write_step("b", {"status": "error", "raw": ref, "summary": "ko", "metadata": {"n": 1}})
+    run_log.write_event("run_end", risk_score={"score": 1})
+    run_log.close()
+
+    records = _records(run_log.json_path)
+    assert [r["type"] for r in records] == ["run_start", "step", "progress", "step", "run_end"]
+    assert all(r["run_id"] == "r1" and r["client"] == "Test" and r["timestamp"] for r in records)
+    assert records[1]["step"] == "a" and records[1]["raw"] == {"hosts": ["10.0.0.1"]}
+    assert records[2]["percent"] == 50.0
+    assert records[3]["status"] == "error" and records[3]["metadata"] == {"n": 1}
+    assert records[3]["raw"]["path"] == ref.path
+
+    with open(run_log.text_path, encoding="utf-8") as f:
+        text = f.read()
+    assert text.index("[STEP] a") < text.index("[STEP] b")
+    assert f"Raw output: {ref.path}" in text
+
+
+def test_progress_is_not_flushed_per_record(tmp_path):
+    run_log = RunLog(str(tmp_path), "log_test")
+    run_log.write_event("progress", percent=10.0)
+    run_log._queue.join()
+    assert _records(run_log.json_path) == []
+
+    # Il record dello step flusha anche i progress precedenti
+    run_log.write_step("a", {"status": "success", "raw": "", "summary": ""})
+    run_log._queue.join()
+    assert [r["type"] for r in _records(run_log.json_path)] == ["progress", "step"]
+
+    run_log.write_event("progress", percent=20.0)
+    run_log.flush()
+    assert _records(run_log.json_path)[-1]["percent"] == 20.0
+    run_log.close()
@@ -0,0 +1,142 @@
+"""
+Test dello scheduler: finestra oraria a cavallo della mezzanotte, quote
+nmap entro il budget e scheduler condiviso tra run concorrenti.
+"""
+import asyncio
+import threading
+from datetime import datetime
+import pytest
+from core import scheduler
+from core.context import Context
+from core.executor import Executor
+from core.scheduler import Scheduler
+
+
+def _at(hour, minute=0, day=15):
+    return datetime(2026, 3, day, hour, minute)
+
+
+@pytest.mark.parametrize("hour, minute, expected", [
+    (22, 0, True), (23, 59, True), (0, 0, True), (3, 30, True),
+    (5, 59, True), (6, 0, False), (12, 0, False), (21, 59, False)
+])
+def test_window_across_midnight(hour, minute, expected):
+    assert scheduler.TestingWindow("22:00", "06:00").is_open(_at(hour, minute)) is expected
+
+
+def test_window_next_open_across_midnight():
+    window = scheduler.TestingWindow("22:00", "06:00")
+    assert window.next_open(_at(12)) == _at(22)
+    assert window.next_open(_at(6, 30)) == _at(22)
+    assert window.next_open(_at(23)) == _at(23)
+    assert window.seconds_until_open(_at(21, 30)) == 1800
+    assert repr(window) == "22:00-06:00"
+
+
+def test_daytime_window_opens_next_day():
+    window = scheduler.TestingWindow("08:00", "18:00")
+    assert not window.is_open(_at(18))
+    assert window.next_open(_at(19)) == _at(8, day=16)
+    assert window.next_open(_at(7)) == _at(8)
+
+
+def test_window_always_open():
+    windows = [scheduler.TestingWindow(start, end) for start, end in ((None, None), ("10:00", None), ("10:00", "10:00"))]
+    for window in windows:
+        assert window.always_open
+        assert window.is_open(_at(3))
+        assert repr(window) == "sempre"
+
+
+def test_leases_never_exceed_rate():
+    limits = Scheduler(rate=500, slots=8)
+    shares = [limits.lease() for _ in range(8)]
+    assert shares == [55] * 8
+    assert sum(shares) + limits.bucket.rate <= 500
+    assert limits.bucket.rate >= limits.share
+
+    cancelled = threading.Event()
+    cancelled.set()
+    assert limits.lease(cancelled) is None
+
+
+def test_lease_waits_for_release():
+    limits = Scheduler(rate=10, slots=8)
+    shares = [limits.lease() for _ in range(9)]
+    assert sum(shares) + limits.bucket.rate == 10
+
+    waiter = []
+    thread = threading.Thread(target=lambda: waiter.append(limits.lease()))
+    thread.start()
+    thread.join(0.2)
+    assert thread.is_alive()
+
+    limits._release(shares.pop())
+    thread.join(2)
+    assert waiter == [1]
+    assert limits.bucket.rate == 1
+
+
+def test_minimum_rate():
+    with pytest.raises(ValueError):
+        Scheduler(rate=1)
+
+
+def test_cancelled_async_lease_is_returned():
+    limits = Scheduler(rate=4, slots=8)
+    shares = [limits.lease() for _ in range(3)]
+
+    async def _cancel():
+        task = asyncio.ensure_future(limits._lease())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(_cancel())
+    limits._release(shares.pop())
+    assert limits._leased == 2
+    assert limits.bucket.rate == 2
+
+
+def test_waiting_for_lease_does_not_hold_executor_slot(monkeypatch):
+    limits = Scheduler(rate=4, slots=8)
+    shares = [limits.lease() for _ in range(3)]
+    monkeypatch.setattr(scheduler, "_scheduler", limits)
+    executor = Executor(max_concurrency=1)
+    try:
+        scan = executor.submit(["/nonexistent/nmap", "-sn", "10.0.0.1"])
+        other = executor.submit(["sh", "-c", "exit 0"])
+        assert other.result(timeout=10).ok
+        assert not scan.done()
+
+        limits._release(shares.pop())
+        result = scan.result(timeout=10)
+        assert result.argv[1:3] == ["--max-rate", "1"]
+    finally:
+        executor.shutdown()
+
+
+def _context(start, rate):
+    return Context("Test", "pmi", extra={"constraints": {
+        "allowed_testing_hours": {"start": start, "end": "06:00"},
+        "rate_limit": {"packets_per_second": rate}
+    }})
+
+
+def test_concurrent_runs_share_scheduler(monkeypatch, capsys):
+    monkeypatch.setattr(scheduler, "_scheduler", scheduler._scheduler)
+    monkeypatch.setattr(scheduler, "_active_runs", 0)
+    monkeypatch.setattr(scheduler, "_options", {"enforce_window": True, "max_rate": None})
+
+    first = scheduler.for_context(_context("22:00", 300))
+    second = scheduler.for_context(_context("23:00", 100))
+    assert second is first is scheduler.get_scheduler()
+    assert first.rate == 300
+    assert "[WARN]" in capsys.readouterr().out
+
+    scheduler.release()
+    assert scheduler.get_scheduler() is first
+    scheduler.release()
+    assert scheduler.get_scheduler() is not first
+    assert scheduler.get_scheduler().rate is None
@@ -0,0 +1,165 @@
+"""
+Test dello scanner TLS contro un server TLS locale con certificato
+self-signed generato al volo (richiede cryptography).
+"""
+import datetime
+import hashlib
+import socket
+import ssl
+import threading
+import pytest
+from modules.web import tls_scan
+
+x509 = pytest.importorskip("cryptography.x509")
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+
+HOSTNAME = "tls.test"
+
+# TLS 1.0/1.1 vengono provati di proposito
+pytestmark = pytest.mark.filterwarnings("ignore:ssl.TLSVersion:DeprecationWarning")
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([
+        x509.NameAttribute(NameOID.COMMON_NAME, HOSTNAME),
+        x509.NameAttribute(NameOID.ORGANIZATION_NAME, "CyberToolkit Test")
+    ])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=10, hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName(HOSTNAME), x509.DNSName("www.tls.test")]),
+                       critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    directory = tmp_path_factory.mktemp("tls")
+    cert_path = directory / "cert.pem"
+    key_path = directory / "key.pem"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+        serialization.NoEncryption()
+    ))
+    return str(cert_path), str(key_path), cert.public_bytes(serialization.Encoding.DER)
+
+
+class _TlsServer:
+    """Server TLS minimale: handshake e chiusura per ogni connessione."""
+
+    def __init__(self, certificate, minimum, maximum, ciphers=None):
+        cert_path, key_path, _ = certificate
+        self.ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.ctx.load_cert_chain(cert_path, key_path)
+        self.ctx.minimum_version = minimum
+        self.ctx.maximum_version = maximum
+        if ciphers:
+            self.ctx.set_ciphers(f"{ciphers}:@SECLEVEL=0")
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            conn.settimeout(5)
+            try:
+                with self.ctx.wrap_socket(conn, server_side=True):
+                    pass
+            except (OSError, ssl.SSLError):
+                conn.close()
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def server(certificate):
+    srv = _TlsServer(certificate, ssl.TLSVersion.TLSv1_2, ssl.TLSVersion.TLSv1_2)
+    yield srv
+    srv.close()
+
+
+def test_decode_der_matches_getpeercert_format(certificate):
+    *_, der = certificate
+    info = tls_scan._decode_der(der)
+    assert info["subject"] == ((("commonName", HOSTNAME),), (("organizationName", "CyberToolkit Test"),))
+    assert info["subjectAltName"] == (("DNS", HOSTNAME), ("DNS", "www.tls.test"))
+    # Stesso formato data di getpeercert(): leggibile da ssl.cert_time_to_seconds
+    assert ssl.cert_time_to_seconds(info["notAfter"]) > ssl.cert_time_to_seconds(info["notBefore"])
+    assert tls_scan._decode_der(b"not a certificate") == {}
+
+
+def test_probe_certificate_self_signed(server, certificate):
+    *_, der = certificate
+    record = tls_scan.probe_certificate("127.0.0.1", server.port, timeout=5)
+    assert record["ip"] == "127.0.0.1"
+    assert record["negotiated"]["protocol"] == "TLSv1.2"
+    assert record["chain_verified"] is False
+    cert = record["certificate"]
+    assert cert["subject"] == f"commonName={HOSTNAME}, organizationName=CyberToolkit Test"
+    assert cert["issuer"] == cert["subject"]
+    assert cert["san"] == [HOSTNAME, "www.tls.test"]
+    assert cert["days_left"] == 10 and not cert["expired"]
+    assert cert["sha256"] == hashlib.sha256(der).hexdigest()
+
+
+def test_probe_protocol(server):
+    assert tls_scan.probe_protocol("127.0.0.1", server.port, HOSTNAME, "TLSv1.2") is True
+    assert tls_scan.probe_protocol("127.0.0.1", server.port, HOSTNAME, "TLSv1.3") is False
+
+
+def test_probe_protocol_network_errors_are_unknown():
+    silent = socket.create_server(("127.0.0.1", 0))
+    try:
+        port = silent.getsockname()[1]
+        assert tls_scan.probe_protocol("127.0.0.1", port, HOSTNAME, "TLSv1.2", timeout=0.3) is None
+    finally:
+        silent.close()
+    assert tls_scan.probe_protocol("127.0.0.1", port, HOSTNAME, "TLSv1.2", timeout=1) is None
+
+
+def test_probe_cipher_uses_probed_protocol(certificate):
+    try:
+        srv = _TlsServer(certificate, ssl.TLSVersion.TLSv1, ssl.TLSVersion.TLSv1, ciphers="AES128-SHA")
+    except (ValueError, ssl.SSLError):
+        pytest.skip("TLS 1.0 non disponibile nell'OpenSSL locale")
+    try:
+        if tls_scan.probe_protocol("127.0.0.1", srv.port, HOSTNAME, "TLSv1.0") is None:
+            pytest.skip("TLS 1.0 disabilitato dalla policy OpenSSL")
+        assert tls_scan.probe_protocol("127.0.0.1", srv.port, HOSTNAME, "TLSv1.0") is True
+        assert tls_scan.probe_cipher("127.0.0.1", srv.port, HOSTNAME, "AES128-SHA", "TLSv1.0")
+        assert not tls_scan.probe_cipher("127.0.0.1", srv.port, HOSTNAME, "AES128-SHA", "TLSv1.2")
+        assert "AES128-SHA" in tls_scan.legacy_ciphers("TLSv1.0")
+        assert "ECDHE-RSA-AES128-GCM-SHA256" not in tls_scan.legacy_ciphers("TLSv1.0")
+    finally:
+        srv.close()
+
+
+def test_scanner_groups_and_reports_issues(certificate):
+    srv = _TlsServer(certificate, ssl.TLSVersion.TLSv1_2, ssl.TLSVersion.TLSv1_2,
+                     ciphers="ECDHE-RSA-AES128-GCM-SHA256:AES128-SHA")
+    try:
+        scanner = tls_scan.TlsScanner(workers=8, timeout=5)
+        first, second = scanner.scan(["127.0.0.1", "localhost"], ports=[srv.port])
+    finally:
+        srv.close()
+    assert first["protocols"]["TLSv1.2"] is True
+    assert first["protocols"]["TLSv1.3"] is False
+    assert first["ciphers"] == first["ciphers_by_protocol"]["TLSv1.2"]
+    assert set(first["ciphers"]) == {"ECDHE-RSA-AES128-GCM-SHA256", "AES128-SHA"}
+    assert "Certificato in scadenza tra 10 giorni" in first["issues"]
+    assert any(i.startswith("Catena non verificata") for i in first["issues"])
+    if second.get("ip") == "127.0.0.1":
+        assert second["shared_with"] == "127.0.0.1"
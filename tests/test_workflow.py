@@ -0,0 +1,72 @@
+"""
+Test del grafo del workflow (depends_on / parallel) e dell'esecuzione
+concorrente degli step nell'Orchestrator.
+"""
+import threading
+
+import pytest
+
+from core.context import Context
+from core.orchestrator import Orchestrator
+from core.plan import ExecutionPlan, PlannedStep
+from core.workflow import max_workers, normalize_steps
+
+
+def test_steps_without_hints_are_sequential():
+    steps = normalize_steps({"steps": ["a", "b", "c"]})
+    assert [s["depends_on"] for s in steps] == [[], ["a"], ["b"]]
+
+
+def test_parallel_and_explicit_depends_on():
+    steps = normalize_steps({
+        "parallel": True,
+        "steps": ["a", "b", {"step": "c", "depends_on": ["a", "b"]}, {"id": "d", "depends_on": "c"}]
+    })
+    assert [s["depends_on"] for s in steps] == [[], [], ["a", "b"], ["c"]]
+
+
+@pytest.mark.parametrize("workflow, message", [
+    ({"steps": ["a", "a"]}, "duplicato"),
+    ({"steps": [{"step": "a", "depends_on": ["x"]}]}, "sconosciuta"),
+    ({"steps": [{"step": "a", "depends_on": ["b"]}, {"step": "b", "depends_on": ["a"]}]}, "cicliche"),
+])
+def test_invalid_graphs(workflow, message):
+    with pytest.raises(ValueError, match=message):
+        normalize_steps(workflow)
+
+
+def test_max_workers():
+    assert max_workers({}) == 4
+    assert max_workers({"max_workers": 0}) == 1
+
+
+class _FakeOrchestrator(Orchestrator):
+    """Step simulati: nessun modulo reale, solo sincronizzazione tra thread."""
+
+    def __init__(self, tmp_path, barrier):
+        super().__init__(Context("Test", "pmi"), log_folder=str(tmp_path), history_path=None)
+        self.barrier = barrier
+        self.started = []
+
+    def _execute_step(self, planned):
+        self.started.append(planned.id)
+        if planned.id in ("a", "b"):
+            # Entrambi devono essere in esecuzione insieme, altrimenti timeout
+            self.barrier.wait(timeout=5)
+        return {"status": "success", "raw": "", "summary": planned.id}, True
+
+
+def _planned(sid, depends_on=()):
+    return PlannedStep(sid, tuple(depends_on), "m", "f", (), (), (), (), None)
+
+
+def test_independent_steps_run_concurrently(tmp_path):
+    plan = ExecutionPlan("t", None, (), 4, (
+        _planned("a"), _planned("b"), _planned("c", ["a", "b"])
+    ))
+    orchestrator = _FakeOrchestrator(tmp_path, threading.Barrier(2))
+    output = orchestrator.run(plan)
+
+    assert list(output["results"]) == ["a", "b", "c"]
+    assert orchestrator.started[-1] == "c"
+    assert all(r["status"] == "success" for r in output["results"].values())